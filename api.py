@@ -0,0 +1,311 @@
+"""
+CineMatch Recommendation API
+
+A headless HTTP service over the same model store as the Streamlit app, for
+other clients and for load testing without a browser session.
+
+Endpoints:
+    GET  /recommend?movie_id=19995&k=10   recommendations for one movie
+    POST /recommend/batch                 {"movie_ids": [...], "k": 10}
+    POST /recommend/multi                 {"seeds": [...], "negatives": [...], "k": 10}
+    GET  /search?q=dark+knight&limit=10    typo-tolerant title search
+    GET  /facets                          filterable genres, languages, years, ratings
+    GET  /health                          model and backend information
+    GET  /metrics                         Prometheus metrics (METRICS_ENABLED=1)
+
+Every recommendation endpoint takes an optional `filter` expression such as
+"genre:Drama year>=2000 language:en" (see facets.py); it is applied before
+top-K selection, so filtered queries still return k results. `mmr_lambda`
+below 1 re-ranks the best DIVERSITY_POOL candidates for variety (MMR): 1 is
+pure similarity, lower values push near-duplicates such as sequels down.
+On a field-weighted model (`build_improved_model.py --fields`),
+`field_weights` re-weights genres, keywords, cast, crew and overview for
+one request, e.g. `field_weights=crew:2,overview:0.5` (a JSON object in POST
+bodies); /health lists the fields and their build weights.
+
+Each worker memory-maps the model arrays, so all workers on a host share one
+copy of the model in the page cache. A newly published model version is
+swapped in without a restart; requests in flight finish on the old one.
+
+Usage:
+    uvicorn api:app --workers 4 --host 0.0.0.0 --port 8000
+
+Configuration (environment variables):
+    MODEL_DIR            model directory (default: models/store)
+    RECOMMENDER_BACKEND  neighbors (default), sparse or ann
+    ANN_NPROBE           clusters probed by the ann backend
+    ANN_MIN_ITEMS        catalogs smaller than this use exact search
+    MODEL_CHECK_SECONDS  how often to look for a new model version (default: 5)
+    METRICS_ENABLED      record timing spans and counters (default: off)
+    METRICS_LOG_SECONDS  also log them as a JSON line this often (default: never)
+
+Metrics are per worker process; Prometheus scrapes each worker separately.
+"""
+
+import math
+import os
+from contextlib import asynccontextmanager
+from typing import Literal
+
+import numpy as np
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+import metrics
+import model_store
+from recommender import AGGREGATIONS, ANN_DEFAULT_NPROBE, ANN_MIN_ITEMS, DIVERSITY_POOL, aggregate, diversify
+
+MAX_K = 100
+MAX_BATCH = 1000
+MAX_SEEDS = 100
+MAX_FILTER = 500
+MAX_FIELD_WEIGHTS = 200
+
+
+class ServingState:
+    """Model, backend and lookup tables of one model version."""
+
+    def __init__(self, model_dir):
+        self.model = model_store.load_model(model_dir)
+        self.backend_name = os.environ.get('RECOMMENDER_BACKEND', 'neighbors')
+        self.recommender = self.model.recommender(
+            self.backend_name,
+            nprobe=int(os.environ.get('ANN_NPROBE', ANN_DEFAULT_NPROBE)),
+            ann_min_items=int(os.environ.get('ANN_MIN_ITEMS', ANN_MIN_ITEMS)),
+        )
+        if self.recommender is None:
+            raise model_store.ModelStoreError(
+                f"Model has no data for the '{self.backend_name}' backend"
+            )
+
+        movies = self.model.movies
+        self.movie_ids = movies['movie_id'].to_numpy()
+        self.titles = movies['title'].tolist()
+        self.posters = movies['poster_path'].tolist() if 'poster_path' in movies else None
+        self.index_of = {int(movie_id): idx for idx, movie_id in enumerate(self.movie_ids.tolist())}
+        self.title_index = self.model.title_index()
+
+    def close(self):
+        self.model.close()
+
+    def mask(self, expression):
+        """Boolean catalog mask of a filter expression (None without a filter)."""
+        if not expression:
+            return None
+        facets = self.model.facet_index()
+        if facets is None:
+            raise HTTPException(status_code=422, detail="This model has no facets to filter on")
+        try:
+            return facets.mask(expression)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    def backend(self, field_weights):
+        """The serving backend, re-weighted by `field_weights` ({field: weight}) if given."""
+        if not field_weights:
+            return self.recommender
+        try:
+            return self.model.recommender(self.backend_name, field_weights=field_weights)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    def lookup(self, movie_id):
+        idx = self.index_of.get(movie_id)
+        if idx is None:
+            raise HTTPException(status_code=404, detail=f"Unknown movie_id {movie_id}")
+        return idx
+
+    def movie(self, idx, score=None):
+        item = {'movie_id': int(self.movie_ids[idx]), 'title': self.titles[idx]}
+        if self.posters is not None:
+            item['poster_path'] = self.posters[idx] or None
+        if score is not None:
+            item['score'] = round(float(score), 6)
+        return item
+
+    def results(self, ids, scores):
+        """JSON items for one row of backend output, skipping padding."""
+        return [self.movie(idx, score) for idx, score in zip(ids.tolist(), scores.tolist()) if idx >= 0]
+
+
+def parse_field_weights(text):
+    """`crew:2,overview:0.5` as {field: weight} (None without weights)."""
+    if not text:
+        return None
+    weights = {}
+    for pair in text.split(','):
+        name, _, weight = pair.partition(':')
+        try:
+            weights[name.strip()] = float(weight)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Invalid field weight: {pair!r}")
+        if not math.isfinite(weights[name.strip()]):
+            raise HTTPException(status_code=422, detail=f"Field weight is not finite: {pair!r}")
+    return weights
+
+
+watcher = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global watcher
+    if os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes', 'on'):
+        metrics.configure(enabled=True)
+        if float(os.environ.get('METRICS_LOG_SECONDS', 0)) > 0:
+            metrics.start_log_reporter(float(os.environ['METRICS_LOG_SECONDS']))
+    watcher = model_store.ModelWatcher(
+        os.environ.get('MODEL_DIR', model_store.DEFAULT_MODEL_DIR),
+        check_interval=float(os.environ.get('MODEL_CHECK_SECONDS', model_store.DEFAULT_CHECK_INTERVAL)),
+        loader=ServingState,
+    )
+    yield
+
+
+def serving_state():
+    """The model version a request uses from start to finish."""
+    with watcher.lease() as state:
+        yield state
+
+
+app = FastAPI(title="CineMatch API", lifespan=lifespan)
+
+
+class BatchRequest(BaseModel):
+    movie_ids: list[int] = Field(min_length=1, max_length=MAX_BATCH)
+    k: int = Field(default=10, ge=1, le=MAX_K)
+    filter: str | None = Field(default=None, max_length=MAX_FILTER)
+    mmr_lambda: float = Field(default=1.0, ge=0, le=1)
+    field_weights: dict[str, float] | None = None
+
+
+class MultiRequest(BaseModel):
+    seeds: list[int] = Field(min_length=1, max_length=MAX_SEEDS)
+    weights: list[float] | None = None
+    negatives: list[int] = Field(default=[], max_length=MAX_SEEDS)
+    negative_weights: list[float] | None = None
+    exclude: list[int] = Field(default=[], max_length=MAX_BATCH)
+    method: Literal[AGGREGATIONS] = 'sum'
+    k: int = Field(default=10, ge=1, le=MAX_K)
+    filter: str | None = Field(default=None, max_length=MAX_FILTER)
+    mmr_lambda: float = Field(default=1.0, ge=0, le=1)
+    field_weights: dict[str, float] | None = None
+
+
+@app.get('/health')
+def health(state: ServingState = Depends(serving_state)):
+    return {
+        'status': 'ok',
+        'backend': type(state.recommender).__name__,
+        'n_items': state.model.n_items,
+        'model_version': os.path.basename(state.model.model_dir),
+        'model_created_at': state.model.manifest['created_at'],
+        'fields': {field['name']: field['weight'] for field in state.model.fields or []},
+    }
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Counters and span histograms of this worker in Prometheus text format."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type='text/plain; version=0.0.4')
+
+
+@app.get('/facets')
+def facets(state: ServingState = Depends(serving_state)):
+    """Values usable in `filter` expressions: categories, or [min, max] of numeric facets."""
+    facet_index = state.model.facet_index()
+    if facet_index is None:
+        return {'facets': {}}
+    return {'facets': {field: facet_index.values(field) for field in facet_index.fields}}
+
+
+@app.get('/search')
+def search(q: str = Query(min_length=1, max_length=200), limit: int = Query(10, ge=1, le=MAX_K),
+           state: ServingState = Depends(serving_state)):
+    """Title matches for incremental search: prefix matches first, then fuzzy ones."""
+    return {'results': [
+        {**state.movie(idx), 'label': state.title_index.label(idx)}
+        for idx in state.title_index.search(q, limit)
+    ]}
+
+
+@app.get('/recommend')
+def recommend(movie_id: int, k: int = Query(10, ge=1, le=MAX_K),
+              filter: str | None = Query(None, max_length=MAX_FILTER),
+              mmr_lambda: float = Query(1.0, ge=0, le=1),
+              field_weights: str | None = Query(None, max_length=MAX_FIELD_WEIGHTS),
+              state: ServingState = Depends(serving_state)):
+    idx = state.lookup(movie_id)
+    mask = state.mask(filter)
+    recommender = state.backend(parse_field_weights(field_weights))
+    with metrics.span('rank', mode='single'):
+        pool = DIVERSITY_POOL if mmr_lambda < 1 else k
+        ids, scores = recommender.query(idx, max(k, pool), exclude=idx, mask=mask)
+        ids, scores = diversify(recommender, ids, scores, k, mmr_lambda)
+    return {'movie': state.movie(idx), 'results': state.results(ids, scores)}
+
+
+@app.post('/recommend/batch')
+def recommend_batch(request: BatchRequest, state: ServingState = Depends(serving_state)):
+    """Score all seeds in one vectorized backend call; unknown ids get an error entry."""
+    indices = [state.index_of.get(movie_id) for movie_id in request.movie_ids]
+    known = np.array([idx for idx in indices if idx is not None], dtype=np.int64)
+    mask = state.mask(request.filter)
+    recommender = state.backend(request.field_weights)
+
+    rows = iter(())
+    if len(known):
+        diverse = request.mmr_lambda < 1
+        with metrics.span('rank', mode='batch'):
+            ids, scores = recommender.query_batch(
+                known, max(request.k, DIVERSITY_POOL) if diverse else request.k, mask=mask
+            )
+            if diverse:
+                ids, scores = zip(*(diversify(recommender, row_ids, row_scores, request.k,
+                                              request.mmr_lambda)
+                                    for row_ids, row_scores in zip(ids, scores)))
+        rows = zip(ids, scores)
+
+    items = []
+    for movie_id, idx in zip(request.movie_ids, indices):
+        if idx is None:
+            items.append({'movie_id': movie_id, 'error': 'unknown movie_id'})
+        else:
+            row_ids, row_scores = next(rows)
+            items.append({'movie': state.movie(idx), 'results': state.results(row_ids, row_scores)})
+    return {'k': request.k, 'results': items}
+
+
+@app.post('/recommend/multi')
+def recommend_multi(request: MultiRequest, state: ServingState = Depends(serving_state)):
+    """
+    Recommendations for several seed movies at once ("because you liked these").
+
+    Seeds (optionally weighted) pull results towards them, negatives push
+    away; seeds, negatives and `exclude` (e.g. already watched) are never
+    returned. Unknown ids in `exclude` are ignored.
+    """
+    for name, weights, ids in (('weights', request.weights, request.seeds),
+                               ('negative_weights', request.negative_weights, request.negatives)):
+        if weights is not None and len(weights) != len(ids):
+            raise HTTPException(status_code=422, detail=f"{name} must have one entry per movie")
+
+    seeds = [state.lookup(movie_id) for movie_id in request.seeds]
+    negatives = [state.lookup(movie_id) for movie_id in request.negatives]
+    exclude = [state.index_of[movie_id] for movie_id in request.exclude if movie_id in state.index_of]
+    mask = state.mask(request.filter)
+    recommender = state.backend(request.field_weights)
+    with metrics.span('rank', mode='multi'):
+        pool = DIVERSITY_POOL if request.mmr_lambda < 1 else request.k
+        ids, scores = aggregate(
+            recommender, seeds, max(request.k, pool),
+            weights=request.weights, negatives=negatives, negative_weights=request.negative_weights,
+            method=request.method, exclude=exclude, mask=mask,
+        )
+        ids, scores = diversify(recommender, ids, scores, request.k, request.mmr_lambda)
+    return {
+        'seeds': [state.movie(idx) for idx in seeds],
+        'method': request.method,
+        'results': state.results(ids, scores),
+    }
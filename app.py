@@ -1,8 +1,42 @@
 import streamlit as st
 import pandas as pd
 import pickle
-import requests
 import os
+import shlex
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+import metrics
+import model_store
+from metadata_cache import DEFAULT_CACHE_URL, DEFAULT_MAX_ENTRIES, DEFAULT_TTL, create_cache
+from recommender import ANN_DEFAULT_NPROBE, ANN_MIN_ITEMS, DIVERSITY_POOL, NeighborIndex, aggregate, diversify
+from title_index import TitleIndex, release_years
+from tmdb_client import TMDB_API_BASE, TMDBClient, poster_url
+
+# Concurrent TMDB lookups: shared pool size and per-page deadline
+TMDB_MAX_WORKERS = 16
+TMDB_DEADLINE_SECONDS = 3.0
+
+# Title matches offered per search, instead of shipping the whole catalog to the browser
+SEARCH_RESULTS = 20
+
+# Ways of blending several favorites into one list (see recommender.aggregate)
+BLEND_METHODS = {
+    'sum': "Overall similarity",
+    'max': "Closest to any favorite",
+    'rrf': "Rank fusion",
+}
+
+# Slider labels of the fields of a field-weighted model (see build_improved_model.py --fields)
+FIELD_LABELS = {
+    'genres': "🎭 Genres",
+    'keywords': "🔑 Keywords",
+    'cast': "👥 Cast",
+    'crew': "🎬 Director",
+    'overview': "📝 Plot",
+}
 
 # ─────────────────────────────────────────────────────────────────────────────
 # PAGE CONFIGURATION
@@ -212,26 +246,81 @@ st.markdown("""
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# API KEY MANAGEMENT
+# CONFIGURATION & API KEY MANAGEMENT
 # ─────────────────────────────────────────────────────────────────────────────
-def get_api_key():
-    """Get API key from Streamlit secrets or environment variable."""
+def get_setting(name, default=None):
+    """Get a setting from Streamlit secrets or environment variable."""
     # Try Streamlit secrets first (for cloud deployment)
-    if hasattr(st, 'secrets') and 'TMDB_API_KEY' in st.secrets:
-        return st.secrets['TMDB_API_KEY']
+    if hasattr(st, 'secrets') and name in st.secrets:
+        return st.secrets[name]
     # Fallback to environment variable (for local development)
-    api_key = os.environ.get('TMDB_API_KEY')
-    if api_key:
-        return api_key
-    return None
+    value = os.environ.get(name)
+    if value:
+        return value
+    return default
+
+
+def get_api_key():
+    """Get API key from Streamlit secrets or environment variable."""
+    return get_setting('TMDB_API_KEY')
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # DATA LOADING WITH CACHING
 # ─────────────────────────────────────────────────────────────────────────────
-@st.cache_data(show_spinner=False)
-def load_movies_data():
-    """Load and cache the movies dataframe."""
+@st.cache_resource(show_spinner=False)
+def setup_metrics():
+    """Enable instrumentation once per process if METRICS_ENABLED is set.
+    
+    Streamlit cannot serve a custom route, so metrics leave the process as
+    a JSON log line every METRICS_LOG_SECONDS (default 60) and, if
+    METRICS_PORT is set, as a Prometheus endpoint on that port.
+    """
+    if str(get_setting('METRICS_ENABLED', '')).lower() not in ('1', 'true', 'yes', 'on'):
+        return False
+    metrics.configure(enabled=True)
+    log_seconds = float(get_setting('METRICS_LOG_SECONDS', 60))
+    if log_seconds > 0:
+        metrics.start_log_reporter(log_seconds)
+    port = get_setting('METRICS_PORT')
+    if port:
+        metrics.start_http_server(int(port))
+    return True
+
+
+@st.cache_resource(show_spinner=False)
+def get_model_watcher():
+    """Load the published model once per process and watch for new versions.
+    
+    Returns None if the model store has not been built. A version published
+    by the builder is swapped in within MODEL_CHECK_SECONDS, without a restart.
+    """
+    try:
+        return model_store.ModelWatcher(
+            get_setting('MODEL_DIR', model_store.DEFAULT_MODEL_DIR),
+            check_interval=float(get_setting('MODEL_CHECK_SECONDS', model_store.DEFAULT_CHECK_INTERVAL)),
+        )
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        st.error(f"Error loading model: {str(e)}")
+        return None
+
+
+@contextmanager
+def lease_model():
+    """The model version used for one whole script run (None if there is no store)."""
+    watcher = get_model_watcher()
+    if watcher is None:
+        yield None
+        return
+    with watcher.lease() as model:
+        yield model
+
+
+@st.cache_resource(show_spinner=False)
+def load_legacy_movies():
+    """Load and cache the legacy `movies_dict.pkl` (only until the store has been built)."""
     try:
         movies_dict = pickle.load(open('models/movies_dict.pkl', 'rb'))
         return pd.DataFrame(movies_dict)
@@ -242,11 +331,57 @@ def load_movies_data():
         return None
 
 
+def load_movies_data(model):
+    """The movies dataframe of the leased model.
+    
+    Comes from the model store; the legacy `movies_dict.pkl` is only read
+    until the store has been built (`build_improved_model.py --export-legacy`).
+    """
+    if model is not None:
+        return model.movies
+    return load_legacy_movies()
+
+
 @st.cache_resource(show_spinner=False)
+def load_legacy_title_index():
+    """Build and cache the title index of the legacy movie data."""
+    movies_df = load_legacy_movies()
+    if movies_df is None:
+        return None
+    return TitleIndex(movies_df['title'], movies_df['movie_id'], release_years(movies_df))
+
+
+def load_title_index(model):
+    """The title lookup/search index (built once per model version)."""
+    if model is not None:
+        return model.title_index()
+    return load_legacy_title_index()
+
+
+def load_facet_index(model):
+    """Facet bitsets for filtered recommendations (None for legacy data or models without facets)."""
+    if model is not None:
+        return model.facet_index()
+    return None
+
+
 def load_similarity_matrix():
-    """Load and cache the similarity matrix."""
+    """Load the legacy dense similarity matrix (only used to build a missing index)."""
+    with open('models/similarity.pkl', 'rb') as f:
+        return pickle.load(f)
+
+
+@st.cache_resource(show_spinner=False)
+def load_neighbor_index():
+    """Derive and cache a top-K neighbor index from the legacy similarity matrix.
+    
+    Only used until the model store has been built; the dense matrix is
+    dropped right after so it does not stay resident.
+    """
     try:
-        return pickle.load(open('models/similarity.pkl', 'rb'))
+        from build_improved_model import build_neighbor_index
+        indices, scores = build_neighbor_index(load_similarity_matrix())
+        return NeighborIndex(indices, scores)
     except FileNotFoundError:
         return None
     except Exception as e:
@@ -254,80 +389,170 @@ def load_similarity_matrix():
         return None
 
 
+def load_recommender(model):
+    """The serving backend selected by RECOMMENDER_BACKEND.
+    
+    - `neighbors` (default): precomputed top-K neighbor index
+    - `sparse`: on-demand similarity from the sparse TF-IDF matrix
+    - `ann`: approximate IVF search; `ANN_NPROBE` trades recall for latency.
+      Small catalogs (or models built without `--ann`) use exact search.
+    """
+    if model is None:
+        return load_neighbor_index()
+    return model.recommender(
+        get_setting('RECOMMENDER_BACKEND', 'neighbors'),
+        nprobe=int(get_setting('ANN_NPROBE', ANN_DEFAULT_NPROBE)),
+        ann_min_items=int(get_setting('ANN_MIN_ITEMS', ANN_MIN_ITEMS)),
+    )
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # POSTER FETCHING WITH CACHING
 # ─────────────────────────────────────────────────────────────────────────────
+@st.cache_resource(show_spinner=False)
+def get_tmdb_client(api_key):
+    """Shared pooled TMDB client, reused by every session.
+    
+    Backed by the persistent metadata cache (`TMDB_CACHE_URL`, SQLite under
+    `models/` by default), so restarts and other replicas start warm.
+    """
+    cache = create_cache(
+        get_setting('TMDB_CACHE_URL', DEFAULT_CACHE_URL),
+        ttl=float(get_setting('TMDB_CACHE_TTL', DEFAULT_TTL)),
+        max_entries=int(get_setting('TMDB_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+    )
+    return TMDBClient(api_key, base_url=get_setting('TMDB_API_BASE', TMDB_API_BASE), cache=cache)
+
+
+# Set by fetch_movie_metadata when st.cache_data actually runs it (a cache miss)
+_metadata_miss = threading.local()
+
+
 @st.cache_data(ttl=86400, show_spinner=False)  # Cache for 24 hours
+def fetch_movie_metadata(movie_id, _api_key):
+    """Fetch and cache the TMDB payload of one movie, keyed by movie_id only.
+    
+    This is the single cache for everything TMDB knows about a movie; poster
+    URLs and details are projections of it. Request failures raise TMDBError,
+    so they are retried next time instead of being cached for a day.
+    """
+    _metadata_miss.value = True
+    if not _api_key:
+        return {}
+    return get_tmdb_client(_api_key).get_movie(movie_id) or {}
+
+
+def cached_metadata(movie_id, api_key, cache):
+    """fetch_movie_metadata, counting hits and misses of the `cache` it serves."""
+    if not metrics.enabled():
+        return fetch_movie_metadata(movie_id, api_key)
+    _metadata_miss.value = False
+    movie = fetch_movie_metadata(movie_id, api_key)
+    metrics.inc('cache_requests_total', cache=cache, result='miss' if _metadata_miss.value else 'hit')
+    return movie
+
+
 def fetch_poster(movie_id, api_key):
-    """Fetch movie poster from TMDB API with caching."""
-    if not api_key:
-        return None
-    
-    try:
-        response = requests.get(
-            f'https://api.themoviedb.org/3/movie/{movie_id}',
-            params={'api_key': api_key, 'language': 'en-US'},
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
-        
-        if data.get('poster_path'):
-            return f"https://image.tmdb.org/t/p/w500{data['poster_path']}"
-        return None
-    except requests.exceptions.RequestException:
-        return None
-    except Exception:
-        return None
+    """Poster URL of a movie, from the cached TMDB payload."""
+    return poster_url(cached_metadata(movie_id, api_key, 'poster'))
 
 
-@st.cache_data(ttl=86400, show_spinner=False)
 def fetch_movie_details(movie_id, api_key):
-    """Fetch additional movie details from TMDB API."""
-    if not api_key:
-        return {}
-    
+    """Additional movie details, from the cached TMDB payload."""
+    return cached_metadata(movie_id, api_key, 'details')
+
+
+@st.cache_resource(show_spinner=False)
+def get_tmdb_executor():
+    """Thread pool shared by all sessions for concurrent TMDB lookups."""
+    return ThreadPoolExecutor(max_workers=TMDB_MAX_WORKERS, thread_name_prefix='tmdb')
+
+
+def fetch_concurrently(fetch_fn, movie_ids, api_key, deadline=TMDB_DEADLINE_SECONDS):
+    """
+    Run `fetch_fn(movie_id, api_key)` for a whole result set in parallel.
+    
+    Yields `(movie_id, result)` pairs as they complete, so the caller can
+    render each one as soon as it arrives. All lookups share one deadline;
+    whatever has not arrived by then is skipped (and keeps its placeholder).
+    """
+    ctx = get_script_run_ctx()
+    
+    def run(movie_id):
+        # Give the worker thread the session context so st.cache_data works quietly
+        add_script_run_ctx(threading.current_thread(), ctx)
+        with metrics.span('tmdb_fetch'):
+            return movie_id, fetch_fn(movie_id, api_key)
+    
+    executor = get_tmdb_executor()
+    futures = [executor.submit(run, movie_id) for movie_id in dict.fromkeys(movie_ids)]
     try:
-        response = requests.get(
-            f'https://api.themoviedb.org/3/movie/{movie_id}',
-            params={'api_key': api_key, 'language': 'en-US'},
-            timeout=10
-        )
-        response.raise_for_status()
-        return response.json()
-    except Exception:
-        return {}
+        for future in as_completed(futures, timeout=deadline):
+            try:
+                yield future.result()
+            except Exception:
+                metrics.inc('tmdb_fetch_failures_total')
+                continue
+    except FuturesTimeout:
+        metrics.inc('tmdb_deadline_exceeded_total', sum(not future.done() for future in futures))
+        for future in futures:
+            future.cancel()
 
 
 # ─────────────────────────────────────────────────────────────────────────────
 # RECOMMENDATION ENGINE
 # ─────────────────────────────────────────────────────────────────────────────
-def get_recommendations(movie_title, movies_df, similarity_matrix, api_key, num_recommendations=5):
-    """Get movie recommendations based on similarity scores."""
+def recommendation_items(movies_df, neighbor_ids, neighbor_scores):
+    """Display dicts for ranked movie indices."""
+    recommendations = []
+    for idx, score in zip(neighbor_ids.tolist(), neighbor_scores.tolist()):
+        movie_data = movies_df.iloc[idx]
+        recommendations.append({
+            'title': movie_data.title,
+            'movie_id': int(movie_data.movie_id),
+            # Prefetched into the model when available, else fetched concurrently later
+            'poster': poster_url({'poster_path': movie_data.get('poster_path')}),
+            'similarity': round(score * 100, 1)
+        })
+    return recommendations
+
+
+def get_recommendations(movie_index, movies_df, recommender, api_key, num_recommendations=5, mask=None,
+                        mmr_lambda=1.0):
+    """Get movie recommendations from the loaded serving backend, only from `mask` if given.
+    
+    With `mmr_lambda` below 1 the best DIVERSITY_POOL neighbors are re-ranked
+    for variety (MMR), so near-duplicates such as sequels do not crowd the list.
+    """
     try:
-        movie_index = movies_df[movies_df['title'] == movie_title].index[0]
-        distances = similarity_matrix[movie_index]
-        movies_list = sorted(
-            list(enumerate(distances)), 
-            reverse=True, 
-            key=lambda x: x[1]
-        )[1:num_recommendations + 1]
-        
-        recommendations = []
-        for idx, score in movies_list:
-            movie_data = movies_df.iloc[idx]
-            poster_url = fetch_poster(movie_data.movie_id, api_key)
-            recommendations.append({
-                'title': movie_data.title,
-                'movie_id': movie_data.movie_id,
-                'poster': poster_url,
-                'similarity': round(score * 100, 1)
-            })
-        
-        return recommendations
-    except IndexError:
-        st.error("Movie not found in database.")
+        with metrics.span('rank', mode='single'):
+            pool = DIVERSITY_POOL if mmr_lambda < 1 else num_recommendations
+            neighbor_ids, neighbor_scores = recommender.query(
+                movie_index, pool, exclude=movie_index, mask=mask
+            )
+            neighbor_ids, neighbor_scores = diversify(
+                recommender, neighbor_ids, neighbor_scores, num_recommendations, mmr_lambda
+            )
+        return recommendation_items(movies_df, neighbor_ids, neighbor_scores)
+    except Exception as e:
+        st.error(f"Error generating recommendations: {str(e)}")
         return []
+
+
+def get_multi_recommendations(liked_movies, disliked_movies, movies_df, recommender,
+                              method='sum', num_recommendations=5, mask=None, mmr_lambda=1.0):
+    """Recommendations for several liked movies, steering away from disliked ones."""
+    try:
+        with metrics.span('rank', mode='multi'):
+            pool = DIVERSITY_POOL if mmr_lambda < 1 else num_recommendations
+            neighbor_ids, neighbor_scores = aggregate(
+                recommender, liked_movies, pool, negatives=disliked_movies,
+                method=method, mask=mask
+            )
+            neighbor_ids, neighbor_scores = diversify(
+                recommender, neighbor_ids, neighbor_scores, num_recommendations, mmr_lambda
+            )
+        return recommendation_items(movies_df, neighbor_ids, neighbor_scores)
     except Exception as e:
         st.error(f"Error generating recommendations: {str(e)}")
         return []
@@ -336,15 +561,15 @@ def get_recommendations(movie_title, movies_df, similarity_matrix, api_key, num_
 # ─────────────────────────────────────────────────────────────────────────────
 # UI COMPONENTS
 # ─────────────────────────────────────────────────────────────────────────────
-def render_movie_card(movie, show_similarity=True):
-    """Render a styled movie card."""
+def render_movie_card(movie, show_similarity=True, target=None):
+    """Render a styled movie card (into `target`, e.g. an st.empty placeholder)."""
     poster_url = movie['poster'] or "https://via.placeholder.com/500x750?text=No+Poster"
     
     similarity_badge = ""
     if show_similarity and movie.get('similarity'):
         similarity_badge = f'<div style="position:absolute;top:10px;right:10px;background:#E50914;color:white;padding:4px 8px;border-radius:8px;font-size:0.75rem;font-weight:600;">{movie["similarity"]}% Match</div>'
     
-    st.markdown(f"""
+    (target or st).markdown(f"""
         <div class="movie-card">
             <div style="position:relative;">
                 <img src="{poster_url}" class="movie-poster" alt="{movie['title']}" 
@@ -376,7 +601,7 @@ def render_sidebar(movies_df):
         
         st.markdown("### How It Works")
         st.markdown("""
-        1. **Select** a movie you enjoyed
+        1. **Search** for a movie you enjoyed
         2. **Click** Get Recommendations
         3. **Discover** similar movies
         """)
@@ -404,20 +629,93 @@ def render_sidebar(movies_df):
         """, unsafe_allow_html=True)
 
 
+def render_filters(facets):
+    """Facet filter widgets; returns a filter expression (empty when nothing is filtered)."""
+    terms = []
+    with st.expander("🎛️ Filters"):
+        if 'genre' in facets.fields:
+            genres = st.multiselect("Genres", facets.values('genre'), placeholder="Any genre")
+            if genres:
+                terms.append('genre:' + ','.join(genres))
+        if 'year' in facets.fields:
+            first, last = (int(year) for year in facets.values('year'))
+            if first < last:
+                years = st.slider("Released", first, last, (first, last))
+                if years != (first, last):
+                    terms.append(f'year:{years[0]}-{years[1]}')
+        if 'language' in facets.fields:
+            languages = st.multiselect("Original language", facets.values('language'), placeholder="Any language")
+            if languages:
+                terms.append('language:' + ','.join(languages))
+        if 'rating' in facets.fields:
+            min_rating = st.slider("Minimum rating", 0.0, 10.0, 0.0, 0.5)
+            if min_rating > 0:
+                terms.append(f'rating>={min_rating:g}')
+    return ' '.join(shlex.quote(term) for term in terms)
+
+
+def render_field_weights(fields):
+    """Per-field weight sliders; returns the weights, or None while they match the build."""
+    weights = {}
+    with st.expander("⚖️ Emphasis"):
+        for field in fields:
+            weights[field['name']] = st.slider(
+                FIELD_LABELS.get(field['name'], field['name']),
+                min_value=0.0, max_value=3.0, value=float(field['weight']), step=0.25
+            )
+    if all(weights[field['name']] == field['weight'] for field in fields) or not any(weights.values()):
+        return None
+    return weights
+
+
+def search_options(matches, selected):
+    """Search matches plus the already selected movies, which must stay valid options."""
+    selected = list(selected or [])
+    return selected + [idx for idx in matches if idx not in selected]
+
+
+def render_recommendations(recommendations, liked_titles, api_key):
+    """Render the results grid right away; missing posters fill in as they arrive."""
+    if not recommendations:
+        return
+    
+    st.markdown(f"""
+        <h3 style="font-family:'Outfit',sans-serif;color:#fff;text-align:center;margin-bottom:1.5rem;">
+            Because you liked <span style="color:#E50914;">{', '.join(liked_titles)}</span>
+        </h3>
+    """, unsafe_allow_html=True)
+    
+    with metrics.span('render_results'):
+        cols = st.columns(5)
+        slots = {}
+        for idx, movie in enumerate(recommendations):
+            slots[movie['movie_id']] = (movie, cols[idx].empty())
+            render_movie_card(movie, target=slots[movie['movie_id']][1])
+    
+    movie_ids = [movie['movie_id'] for movie in recommendations if not movie['poster']]
+    for movie_id, url in fetch_concurrently(fetch_poster, movie_ids, api_key):
+        movie, slot = slots[movie_id]
+        if url:
+            movie['poster'] = url
+            render_movie_card(movie, target=slot)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # MAIN APPLICATION
 # ─────────────────────────────────────────────────────────────────────────────
-def main():
+def render_page(model):
     # Get API key
     api_key = get_api_key()
     
     # Load data
     with st.spinner("Loading movie database..."):
-        movies_df = load_movies_data()
-        similarity_matrix = load_similarity_matrix()
+        movies_df = load_movies_data(model)
+        recommender = load_recommender(model)
+        title_index = load_title_index(model)
+        facets = load_facet_index(model)
     
     # Check if data loaded successfully
-    if movies_df is None or similarity_matrix is None:
+    if movies_df is None or recommender is None or title_index is None:
         st.error("⚠️ Could not load model files!")
         st.markdown("""
         ### Setup Required
@@ -463,11 +761,66 @@ def main():
     col1, col2, col3 = st.columns([1, 2, 1])
     
     with col2:
-        selected_movie = st.selectbox(
-            "🎬 Select a movie you enjoyed:",
-            options=movies_df['title'].values,
-            index=None,
-            placeholder="Type or select a movie..."
+        mode = st.radio(
+            "Recommend from",
+            options=["One movie", "Several favorites"],
+            horizontal=True,
+            label_visibility="collapsed"
+        )
+        
+        # Titles are searched server-side; only the best matches reach the browser
+        query = st.text_input(
+            "🎬 Search for a movie you enjoyed:",
+            placeholder="Start typing a title..."
+        )
+        matches = title_index.search(query, limit=SEARCH_RESULTS) if query else []
+        
+        if mode == "One movie":
+            selected_movie = st.selectbox(
+                "Matching movies",
+                options=matches,
+                index=0 if matches else None,
+                format_func=title_index.label,
+                placeholder="No matching movies" if query else "Search for a movie above...",
+                label_visibility="collapsed"
+            )
+        else:
+            # Keep earlier picks selectable while the search moves on
+            liked_movies = st.multiselect(
+                "👍 More like these:",
+                options=search_options(matches, st.session_state.get('liked_movies')),
+                format_func=title_index.label,
+                placeholder="Add movies from the search...",
+                key='liked_movies'
+            )
+            disliked_movies = st.multiselect(
+                "🚫 Less like these (optional):",
+                options=search_options(matches, st.session_state.get('disliked_movies')),
+                format_func=title_index.label,
+                placeholder="Movies to steer away from...",
+                key='disliked_movies'
+            )
+            blend = st.selectbox(
+                "Blend favorites by",
+                options=list(BLEND_METHODS),
+                format_func=BLEND_METHODS.get
+            )
+        
+        # Filters mask the catalog before ranking, so they never empty a short list
+        expression = render_filters(facets) if facets is not None else ''
+        mask = facets.mask(expression) if expression else None
+        
+        # Field weights re-weight the per-field similarities at query time
+        fields = model.fields if model is not None else None
+        if fields:
+            field_weights = render_field_weights(fields)
+            if field_weights:
+                recommender = model.recommender(field_weights=field_weights)
+        
+        variety = st.slider(
+            "🎲 Variety",
+            min_value=0.0, max_value=1.0, value=0.0, step=0.1,
+            help="Trade some similarity for variety, e.g. fewer sequels of the same franchise"
         )
         
         st.markdown("<br>", unsafe_allow_html=True)
@@ -481,27 +834,33 @@ def main():
     
     # Show recommendations
     if recommend_btn:
-        if selected_movie:
+        if mode == "One movie" and selected_movie is not None:
             with st.spinner("🔍 Finding similar movies..."):
                 recommendations = get_recommendations(
                     selected_movie, 
                     movies_df, 
-                    similarity_matrix, 
-                    api_key
+                    recommender, 
+                    api_key,
+                    mask=mask,
+                    mmr_lambda=1 - variety
                 )
-            
-            if recommendations:
-                st.markdown(f"""
-                    <h3 style="font-family:'Outfit',sans-serif;color:#fff;text-align:center;margin-bottom:1.5rem;">
-                        Because you liked <span style="color:#E50914;">{selected_movie}</span>
-                    </h3>
-                """, unsafe_allow_html=True)
-                
-                # Display recommendations in a grid
-                cols = st.columns(5)
-                for idx, movie in enumerate(recommendations):
-                    with cols[idx]:
-                        render_movie_card(movie)
+            if mask is not None and not recommendations:
+                st.info("No similar movies match these filters.")
+            render_recommendations(recommendations, [title_index.label(selected_movie)], api_key)
+        elif mode == "Several favorites" and liked_movies:
+            with st.spinner("🔍 Finding similar movies..."):
+                recommendations = get_multi_recommendations(
+                    liked_movies,
+                    disliked_movies,
+                    movies_df,
+                    recommender,
+                    method=blend,
+                    mask=mask,
+                    mmr_lambda=1 - variety
+                )
+            if mask is not None and not recommendations:
+                st.info("No similar movies match these filters.")
+            render_recommendations(recommendations, [title_index.label(idx) for idx in liked_movies], api_key)
         else:
             st.warning("👆 Please select a movie first!")
     
@@ -514,5 +873,12 @@ def main():
     """, unsafe_allow_html=True)
 
 
+def main():
+    setup_metrics()
+    # The whole run serves one model version, even if a new one is published meanwhile
+    with lease_model() as model, metrics.span('render_page'):
+        render_page(model)
+
+
 if __name__ == '__main__':
     main()
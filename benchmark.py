@@ -0,0 +1,448 @@
+"""
+Recommendation Benchmark / Latency Regression Suite
+
+Generates reproducible synthetic catalogs (5k, 50k and 500k movies by
+default) whose `tags` look like the real ones: a Zipf-distributed overview
+vocabulary, genres, keywords, cast and director names. For each catalog it
+measures:
+
+1. Build: wall time per stage and peak RSS of the model build (summed over
+   its worker processes)
+2. Per serving backend (neighbors, sparse, ann):
+   - cold load time in a fresh process (load + first query)
+   - p50/p99 latency of single recommendation queries
+   - throughput of concurrent queries from a thread pool, like Streamlit
+     sessions sharing one process
+
+Builds and cold loads run in fresh worker processes, so peak RSS and load
+times are not polluted by earlier runs. Results are written as JSON; with
+--baseline, any metric that regresses beyond --tolerance fails the run
+(exit code 1), so it can gate CI.
+
+Usage:
+    python benchmark.py --sizes 5000 50000 --output bench.json
+    python benchmark.py --sizes 5000 --baseline bench.json --tolerance 0.25
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+DEFAULT_SIZES = (5_000, 50_000, 500_000)
+BACKENDS = ('neighbors', 'sparse', 'ann')
+RECOMMENDATIONS = 5
+
+# Metrics compared against a baseline, and whether lower values are better
+METRICS = {
+    'build_seconds': True,
+    'peak_rss_mb': True,
+    'load_seconds': True,
+    'p50_ms': True,
+    'p99_ms': True,
+    'qps': False,
+}
+
+GENRES = [
+    'action', 'adventure', 'animation', 'comedy', 'crime', 'documentary', 'drama', 'family',
+    'fantasy', 'history', 'horror', 'music', 'mystery', 'romance', 'sciencefiction',
+    'thriller', 'war', 'western', 'tvmovie', 'foreign',
+]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# SYNTHETIC CATALOGS
+# ─────────────────────────────────────────────────────────────────────────────
+def _words(rng, count, syllables=(2, 4)):
+    """Pronounceable pseudo-words, e.g. 'kelomar'."""
+    parts = np.array([c + v for c in 'bcdfghjklmnprstvwz' for v in 'aeiou'])
+    lengths = rng.integers(syllables[0], syllables[1] + 1, size=count)
+    return [''.join(parts[rng.integers(0, len(parts), size=n)]) for n in lengths]
+
+
+def _zipf_choice(rng, vocabulary, size, a=1.2):
+    """Draw from `vocabulary` with Zipf-like frequencies (a few very common terms, a long tail)."""
+    ranks = rng.zipf(a, size=size) - 1
+    return vocabulary[ranks % len(vocabulary)]
+
+
+def synthetic_catalog(n_movies, seed=42):
+    """
+    A reproducible catalog of `n_movies` with movie_id, title and tags.
+
+    Tags mimic the preprocessed TMDB tags: 20-40 overview words, 1-3 genres,
+    3-8 keywords and 3 cast members plus a director as single tokens.
+    """
+    rng = np.random.default_rng(seed)
+    overview_words = np.array(_words(rng, 30_000))
+    keywords = np.array(_words(rng, 10_000, syllables=(3, 5)))
+    people = np.array([first + last for first, last in zip(_words(rng, 60_000), _words(rng, 60_000))])
+
+    n_overview = rng.integers(20, 41, size=n_movies)
+    n_genres = rng.integers(1, 4, size=n_movies)
+    n_keywords = rng.integers(3, 9, size=n_movies)
+    overview = _zipf_choice(rng, overview_words, int(n_overview.sum()))
+    genres = np.array(GENRES)[rng.integers(0, len(GENRES), size=int(n_genres.sum()))]
+    keyword_draws = _zipf_choice(rng, keywords, int(n_keywords.sum()), a=1.1)
+    cast = _zipf_choice(rng, people, n_movies * 4, a=1.05).reshape(n_movies, 4)
+
+    o, g, kw = np.cumsum(n_overview) - n_overview, np.cumsum(n_genres) - n_genres, np.cumsum(n_keywords) - n_keywords
+    tags = [
+        ' '.join([*overview[o[i]:o[i] + n_overview[i]], *genres[g[i]:g[i] + n_genres[i]],
+                  *keyword_draws[kw[i]:kw[i] + n_keywords[i]], *cast[i]])
+        for i in range(n_movies)
+    ]
+    titles = [' '.join(words).title() for words in
+              np.array(_words(rng, n_movies * 2)).reshape(n_movies, 2)]
+    return pd.DataFrame({'movie_id': np.arange(1, n_movies + 1), 'title': titles, 'tags': tags})
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MEASUREMENTS (run in fresh worker processes)
+# ─────────────────────────────────────────────────────────────────────────────
+def _peak_rss_mb():
+    """Peak RSS of this process in MB; None where unsupported."""
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB elsewhere
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / (1024 * 1024), 1)
+
+
+def _largest_rss_mb():
+    """Peak RSS of the largest single process among this one and its finished children, in MB."""
+    if resource is None:
+        return None
+    scale = 1 if sys.platform == 'darwin' else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak * scale / (1024 * 1024), 1)
+
+
+def tree_rss_bytes(pid):
+    """Current total RSS of a process and all its descendants, in bytes; None where unsupported."""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root, *root.children(recursive=True)]
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass  # exited since it was listed
+        return total
+    if not os.path.isdir('/proc'):
+        return None
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    children, rss = {}, {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', encoding='utf-8', errors='replace') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        fields = stat[stat.rindex(')') + 2:].split()  # fields after the command name, from `state`
+        children.setdefault(int(fields[1]), []).append(int(name))
+        rss[int(name)] = int(fields[21]) * page_size
+    if pid not in rss:
+        return None
+    total, stack = 0, [pid]
+    while stack:
+        process = stack.pop()
+        total += rss.get(process, 0)
+        stack.extend(children.get(process, ()))
+    return total
+
+
+class ProcessTreeRss:
+    """
+    Peak total RSS of this process and its descendants, sampled on a timer.
+
+    `ru_maxrss` is per process, so for a build that fans out to worker
+    processes it only reports the largest one. This sums the RSS of the
+    whole process tree every `interval` seconds (with psutil if installed,
+    else from /proc) and keeps the largest total:
+
+        with ProcessTreeRss() as rss:
+            build()
+        rss.peak_mb   # None where the process tree cannot be read
+    """
+
+    def __init__(self, interval=0.05):
+        self.pid = os.getpid()
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        total = tree_rss_bytes(self.pid)
+        if total is not None:
+            self.peak = total if self.peak is None else max(self.peak, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    @property
+    def peak_mb(self):
+        return None if self.peak is None else round(self.peak / (1024 * 1024), 1)
+
+
+def _timed(stages, name, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    stages[name] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def build_worker(n_movies, model_dir, seed, n_jobs, backends):
+    """
+    Generate a catalog and build its model store; returns timings and peak RSS.
+
+    The peak RSS is the largest total of the build process and its worker
+    processes (`peak_rss_scope` 'process tree'). Where the process tree
+    cannot be sampled it is only the largest single process ('largest process').
+    """
+    import build_improved_model as builder
+
+    stages = {}
+    with ProcessTreeRss() as rss:
+        df = _timed(stages, 'generate', synthetic_catalog, n_movies, seed)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            tfidf_matrix, tfidf = _timed(stages, 'tfidf', builder.build_tfidf_model, df)
+            neighbors = None
+            if 'neighbors' in backends:
+                neighbors, _ = _timed(stages, 'neighbors', builder.compute_neighbor_index_blockwise,
+                                      tfidf_matrix, n_jobs=n_jobs)
+            ann = None
+            if 'ann' in backends:
+                ann = _timed(stages, 'ann', builder.build_ann_index, tfidf_matrix)
+            _timed(stages, 'save', builder.save_model_store, df, tfidf_matrix=tfidf_matrix,
+                   neighbors=neighbors, ann=ann, model_dir=model_dir, vectorizer=tfidf)
+        build_seconds = round(time.perf_counter() - start, 3)
+
+    if rss.peak_mb is None:
+        peak_rss_mb, scope = _largest_rss_mb(), 'largest process'
+    else:
+        # Samples can miss a short spike; this process's own peak is exact
+        peak_rss_mb, scope = max(rss.peak_mb, _peak_rss_mb() or 0), 'process tree'
+    return {
+        'build_seconds': build_seconds,
+        'stages': stages,
+        'peak_rss_mb': peak_rss_mb,
+        'peak_rss_scope': scope,
+    }
+
+
+def load_worker(model_dir, backend):
+    """Cold start: load the model and answer a first query in a fresh process."""
+    import model_store
+
+    start = time.perf_counter()
+    model = model_store.load_model(model_dir)
+    recommender = model.recommender(backend, ann_min_items=0)
+    model.movies
+    recommender.query(0, RECOMMENDATIONS, exclude=0)
+    return {'load_seconds': round(time.perf_counter() - start, 4), 'peak_rss_mb': _peak_rss_mb()}
+
+
+def _in_fresh_process(fn, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def measure_queries(recommender, n_items, n_queries, threads, seed):
+    """Single-query latency percentiles, then throughput with `threads` concurrent callers."""
+    rng = np.random.default_rng(seed)
+    queries = rng.integers(0, n_items, size=n_queries)
+    for movie_index in queries[:20]:  # warm-up
+        recommender.query(movie_index, RECOMMENDATIONS, exclude=movie_index)
+
+    latencies = np.empty(n_queries)
+    for i, movie_index in enumerate(queries):
+        start = time.perf_counter()
+        recommender.query(movie_index, RECOMMENDATIONS, exclude=movie_index)
+        latencies[i] = time.perf_counter() - start
+
+    def run(chunk):
+        for movie_index in chunk:
+            recommender.query(movie_index, RECOMMENDATIONS, exclude=movie_index)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(run, np.array_split(queries, threads)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)) * 1000, 4),
+        'mean_ms': round(float(latencies.mean()) * 1000, 4),
+        'qps': round(n_queries / elapsed, 1),
+        'threads': threads,
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# RUN & COMPARE
+# ─────────────────────────────────────────────────────────────────────────────
+def run_benchmark(sizes, backends, work_dir, n_queries=2000, threads=8, n_jobs=None, seed=42):
+    """Run every measurement; returns a JSON-serializable results dict."""
+    import model_store
+
+    results = []
+    for n_movies in sizes:
+        model_dir = os.path.join(work_dir, f'catalog_{n_movies}')
+        print(f"\n[*] {n_movies:,} movies: building...")
+        build = _in_fresh_process(build_worker, n_movies, model_dir, seed, n_jobs, tuple(backends))
+        results.append({'size': n_movies, 'stage': 'build', **build})
+        print(f"    {build['build_seconds']:.1f}s, peak RSS {build['peak_rss_mb']} MB ({build['peak_rss_scope']}), "
+              f"stages {build['stages']}")
+
+        model = model_store.load_model(model_dir)
+        for backend in backends:
+            load = _in_fresh_process(load_worker, model_dir, backend)
+            recommender = model.recommender(backend, ann_min_items=0)
+            queries = measure_queries(recommender, model.n_items, n_queries, threads, seed)
+            results.append({'size': n_movies, 'stage': 'serve', 'backend': backend, **load, **queries})
+            print(f"    {backend:<10} load {load['load_seconds']:.3f}s  p50 {queries['p50_ms']:.3f}ms  "
+                  f"p99 {queries['p99_ms']:.3f}ms  {queries['qps']:,.0f} q/s ({threads} threads)")
+        model.close()
+
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {'sizes': list(sizes), 'backends': list(backends), 'queries': n_queries,
+                   'threads': threads, 'seed': seed},
+        'results': results,
+    }
+
+
+def _key(result):
+    return result['size'], result['stage'], result.get('backend')
+
+
+def compare(current, baseline, tolerance):
+    """List the metrics that got worse than the baseline by more than `tolerance` (a fraction)."""
+    previous = {_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = previous.get(_key(result))
+        if before is None:
+            continue
+        for metric, lower_is_better in METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None or old <= 0:
+                continue
+            if metric == 'peak_rss_mb' and before.get('peak_rss_scope') != result.get('peak_rss_scope'):
+                continue  # a process tree total and a single process are not comparable
+            change = new / old - 1
+            if (change if lower_is_better else -change) > tolerance:
+                label = '/'.join(str(part) for part in _key(result) if part is not None)
+                regressions.append(f"{label} {metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model build and serving backends.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="catalog sizes to generate (default: 5000 50000 500000)")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS),
+                        help="serving backends to measure (default: all)")
+    parser.add_argument('--queries', type=int, default=2000,
+                        help="queries per backend for latency and throughput (default: 2000)")
+    parser.add_argument('--threads', type=int, default=8,
+                        help="concurrent callers for the throughput test (default: 8)")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker processes for the neighbor build (default: CPU count)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--work-dir', default=None,
+                        help="where catalogs are built (default: a temporary directory, removed afterwards)")
+    parser.add_argument('--output', default=None, help="write results as JSON to this file")
+    parser.add_argument('--baseline', default=None, help="results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed relative regression per metric (default: 0.25)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("CINEMATCH BENCHMARK")
+    print("=" * 60)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='cinematch-bench-')
+    try:
+        report = run_benchmark(args.sizes, args.backends, work_dir, n_queries=args.queries,
+                               threads=args.threads, n_jobs=args.jobs, seed=args.seed)
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[*] Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n[FAIL] {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"    - {regression}")
+            sys.exit(1)
+        print(f"\n[OK] No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,20 +8,80 @@ This script rebuilds the recommendation model with several improvements:
 
 Usage:
     python build_improved_model.py
+    python build_improved_model.py --top-k 100 --score-dtype float16
+    python build_improved_model.py --jobs 4 --block-size 2048
+    python build_improved_model.py --sparse-only --ann
+    python build_improved_model.py --export-legacy
+    python build_improved_model.py --add new_movies.csv
 """
 
+import argparse
 import pickle
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+import evaluate
+import model_store
+from facets import FACET_COLUMNS
+from model_store import DEFAULT_MODEL_DIR
+from recommender import NeighborIndex, dequantize_scores, quantize_scores, top_k_rows
+from title_index import TitleIndex
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Fix Windows console encoding
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 
+# Number of neighbors kept per movie in the serving index
+NEIGHBOR_K = 50
+
+# Target size of one block of float32 scores in the blockwise build
+BLOCK_TARGET_BYTES = 64 * 1024 * 1024
+
+# Dimensionality of the SVD embeddings behind the ANN index
+ANN_COMPONENTS = 128
+
+# Movie columns the app needs at serving time (plus facet columns when the catalog has them)
+SERVING_COLUMNS = ['movie_id', 'title']
+
+# Incremental updates fall back to a full refit once new movies use this much
+# more out-of-vocabulary text than the fitted catalog did...
+DRIFT_THRESHOLD = 0.1
+
+# ...or once the catalog has grown by this fraction since the last fit (IDF goes stale)
+MAX_INCREMENTAL_GROWTH = 0.2
+
+# Documents sampled to measure the out-of-vocabulary rate of a fitted catalog
+OOV_SAMPLE_SIZE = 2000
+
+# Vectorizer settings of a full fit (see build_tfidf_model); `sweep.py` searches around them
+TFIDF_PARAMS = {'max_features': 5000, 'ngram_range': (1, 2), 'min_df': 2, 'max_df': 0.8, 'sublinear_tf': True}
+
+# Catalog fields a field-weighted build vectorizes separately, with their default
+# weights and TfidfVectorizer settings; list fields hold '|'-separated names
+FIELD_WEIGHTS = {'genres': 1.0, 'keywords': 1.0, 'cast': 1.0, 'crew': 1.0, 'overview': 1.0}
+FIELD_VECTORIZERS = {
+    'genres': {'token_pattern': r'[^|]+'},
+    'keywords': {'token_pattern': r'[^|]+', 'min_df': 2},
+    'cast': {'token_pattern': r'[^|]+', 'min_df': 2},
+    'crew': {'token_pattern': r'[^|]+', 'min_df': 2},
+    'overview': {'stop_words': 'english', 'ngram_range': (1, 2), 'min_df': 2, 'max_df': 0.8, 'max_features': 5000},
+}
+
+# Arrays of a stored IVF index (see build_ann_index)
+ANN_ARRAYS = ('embeddings', 'centroids', 'list_offsets', 'list_items', 'components')
+
+# Storage formats of neighbor scores: float32, float16, or uint8 codes + per-row scale
+SCORE_DTYPES = ('float32', 'float16', 'int8')
+
+# Movies sampled for the score precision report
+PRECISION_SAMPLE_SIZE = 1000
+
 
 def load_current_model():
     """Load the existing movie data."""
@@ -32,7 +92,7 @@ def load_current_model():
     return df
 
 
-def build_tfidf_model(df, max_features=5000, ngram_range=(1, 2)):
+def build_tfidf_model(df, max_features=5000, ngram_range=(1, 2), min_df=2, max_df=0.8, sublinear_tf=True):
     """
     Build improved similarity matrix using TF-IDF.
     
@@ -54,10 +114,15 @@ def build_tfidf_model(df, max_features=5000, ngram_range=(1, 2)):
     ngram_range : tuple
         (1, 2) means unigrams AND bigrams.
         Captures "science fiction" as a single feature, not just "science" + "fiction"
+    min_df, max_df : int or float
+        Document frequency bounds; floats are fractions of the catalog.
+    sublinear_tf : bool
+        Use 1 + log(tf) instead of raw term counts.
     """
     print("\n[*] Building TF-IDF model...")
     print(f"    Max features: {max_features}")
     print(f"    N-gram range: {ngram_range}")
+    print(f"    Document frequency: {min_df} to {max_df}, sublinear TF: {sublinear_tf}")
     
     # TF-IDF Vectorizer with optimized settings
     tfidf = TfidfVectorizer(
@@ -66,11 +131,11 @@ def build_tfidf_model(df, max_features=5000, ngram_range=(1, 2)):
         stop_words='english',
         # Sublinear TF: use log(1 + tf) instead of tf
         # Why? Diminishing returns - 10 occurrences isn't 10x more important than 1
-        sublinear_tf=True,
+        sublinear_tf=sublinear_tf,
         # Minimum document frequency - ignore very rare words (typos, etc.)
-        min_df=2,
+        min_df=min_df,
         # Maximum document frequency - ignore words in >80% of movies
-        max_df=0.8,
+        max_df=max_df,
     )
     
     print("    Fitting TF-IDF vectorizer...")
@@ -91,6 +156,57 @@ def build_tfidf_model(df, max_features=5000, ngram_range=(1, 2)):
     return tfidf_matrix, tfidf
 
 
+def build_field_model(df, weights=FIELD_WEIGHTS):
+    """
+    Build a field-weighted TF-IDF matrix: one vectorizer per catalog field.
+    
+    With a single `tags` string, a director's name and a plot word compete
+    for the same capped vocabulary. Here every field gets its own vocabulary
+    (names stay whole: "James Cameron" is one feature of `crew`). Each block
+    is L2-normalized and scaled by sqrt(weight), then the blocks are stacked
+    side by side, so the cosine similarity of two movies is the weighted
+    sum of their per-field similarities. Rows are normalized once more, so a
+    movie missing a field spreads that weight over the fields it has.
+    
+    The column range and weight of every block are returned (and stored in
+    the model), so the weights can be changed at query time without a
+    rebuild (see recommender.field_scale).
+    
+    Parameters:
+    -----------
+    weights : dict
+        Field name -> weight; fields weighted 0 or missing from the
+        catalog are left out.
+    
+    Returns:
+    --------
+    tfidf_matrix : (N, V) CSR float32 matrix
+    fields : list of dict with name, start, stop and weight
+    """
+    print("\n[*] Building field-weighted TF-IDF model...")
+    blocks, fields, start = [], [], 0
+    for name, weight in weights.items():
+        if weight <= 0 or name not in df:
+            continue
+        vectorizer = TfidfVectorizer(sublinear_tf=True, **FIELD_VECTORIZERS[name])
+        try:
+            block = vectorizer.fit_transform(df[name].fillna('').astype(str))
+        except ValueError:
+            print(f"    [!] Skipping {name}: no usable terms")
+            continue
+        blocks.append(normalize(block) * np.sqrt(weight))
+        fields.append({'name': name, 'start': start, 'stop': start + block.shape[1], 'weight': weight})
+        start += block.shape[1]
+        print(f"    {name:<10} weight {weight:g}, {block.shape[1]:,} features")
+    if not blocks:
+        raise ValueError("The catalog has none of the fields " + ', '.join(weights)
+                         + "; rebuild it with ingest_tmdb.py")
+    
+    tfidf_matrix = normalize(sparse.hstack(blocks, format='csr')).astype(np.float32)
+    print(f"    Matrix shape: {tfidf_matrix.shape}")
+    return tfidf_matrix, fields
+
+
 def compute_similarity(tfidf_matrix):
     """
     Compute cosine similarity matrix.
@@ -110,8 +226,532 @@ def compute_similarity(tfidf_matrix):
     return similarity
 
 
-def compare_models(df, old_similarity, new_similarity, test_movies=None):
-    """Compare old and new model recommendations."""
+def build_neighbor_index(similarity, k=NEIGHBOR_K, score_dtype=np.float32, chunk_size=1024):
+    """
+    Reduce a dense similarity matrix to a top-K neighbor index.
+    
+    The app only ever shows the first few neighbors of a movie, so there is
+    no need to ship the full N x N matrix. For each movie we keep the ids of
+    its K most similar movies (excluding itself) and their scores.
+    
+    Parameters:
+    -----------
+    k : int
+        Neighbors kept per movie. Must be >= the number of recommendations shown.
+    score_dtype : numpy dtype
+        float32 (default) or float16 for an even smaller index.
+    chunk_size : int
+        Rows processed at a time, bounds the temporary memory used.
+    
+    Returns:
+    --------
+    indices : (N, K) int32 array, neighbors sorted by descending score
+    scores : (N, K) array of score_dtype
+    """
+    n = similarity.shape[0]
+    k = min(k, n - 1)
+    print(f"\n[*] Building top-{k} neighbor index...")
+    
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=score_dtype)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        # Exclude each movie from its own neighbor list by index, not by position
+        top, top_scores = top_k_rows(similarity[start:stop], k, exclude=np.arange(start, stop))
+        indices[start:stop] = top
+        scores[start:stop] = top_scores
+    
+    print(f"    Shape: {indices.shape} ({indices.nbytes + scores.nbytes:,} bytes)")
+    return indices, scores
+
+
+# Worker-process state for the blockwise build (set once per worker by the pool initializer)
+_BLOCK_MATRIX = None
+_BLOCK_MATRIX_T = None
+
+
+def _init_block_worker(matrix):
+    global _BLOCK_MATRIX, _BLOCK_MATRIX_T
+    _BLOCK_MATRIX = matrix
+    _BLOCK_MATRIX_T = matrix.T.tocsr()
+
+
+def _release_block_worker():
+    global _BLOCK_MATRIX, _BLOCK_MATRIX_T
+    _BLOCK_MATRIX = _BLOCK_MATRIX_T = None
+
+
+def _similarity_block(start, stop, k):
+    """Similarities of rows [start, stop) against all movies, reduced to top-K and stats."""
+    block = (_BLOCK_MATRIX[start:stop] @ _BLOCK_MATRIX_T).toarray()
+    stats = (float(block.min()), float(block.max()), float(block.sum(dtype=np.float64)), block.size)
+    top, top_scores = top_k_rows(block, k, exclude=np.arange(start, stop))
+    return start, top, top_scores, stats
+
+
+def encode_scores(neighbors, score_dtype='float32'):
+    """
+    Convert float neighbor scores to their storage format.
+    
+    `int8` stores each score as a uint8 code plus a float32 scale per row
+    (see recommender.quantize_scores): 1 byte per score instead of 4, with
+    an error below half a percent of the row's best score.
+    
+    Returns (indices, scores) or (indices, codes, scale), as accepted by
+    NeighborIndex and model_store.write_model.
+    """
+    indices, scores = neighbors[:2]
+    if score_dtype == 'int8':
+        return (indices, *quantize_scores(scores))
+    return indices, np.asarray(scores).astype(score_dtype)
+
+
+def compare_score_precision(tfidf_matrix, neighbors, ks=(5, 10), sample_size=PRECISION_SAMPLE_SIZE,
+                            random_state=42):
+    """
+    Report how storing neighbor scores at lower precision changes rankings.
+    
+    For a sample of movies the exact top-k is computed in float64 and
+    compared with what each storage format serves:
+    
+    - `changed@k`: share of movies whose served top-k differs from float64
+      (the neighbor order itself is computed in float32 at build time)
+    - `reranked@k`: share whose top-k differs when re-sorted by the stored
+      scores (ties broken by movie id), as multi-seed blending does
+    - `display`: share of shown "% Match" values (one decimal) that change
+    - `max_error`: largest absolute score error
+    
+    Returns {dtype: metrics} and prints a table.
+    """
+    matrix = normalize(sparse.csr_matrix(tfidf_matrix, dtype=np.float64), norm='l2')
+    n = matrix.shape[0]
+    k = min(max(ks), neighbors[0].shape[1])
+    rng = np.random.default_rng(random_state)
+    sample = np.sort(rng.choice(n, min(n, sample_size), replace=False))
+    
+    # Exact float64 reference, in blocks of bounded size
+    block = max(1, BLOCK_TARGET_BYTES // (8 * n))
+    ref_ids, ref_scores = [], []
+    matrix_t = matrix.T.tocsr()
+    for start in range(0, len(sample), block):
+        rows = sample[start:start + block]
+        top, top_scores = top_k_rows((matrix[rows] @ matrix_t).toarray(), k, exclude=rows)
+        ref_ids.append(top)
+        ref_scores.append(top_scores)
+    ref_ids, ref_scores = np.vstack(ref_ids), np.vstack(ref_scores)
+    
+    print(f"\n[*] Score precision vs float64 ({len(sample)} movies)...")
+    header = '    ' + f"{'dtype':<9}{'bytes/movie':>12}" + ''.join(
+        f"{f'changed@{kk}':>12}{f'reranked@{kk}':>13}" for kk in ks) + f"{'display':>9}{'max_error':>11}"
+    print(header)
+    
+    report = {}
+    for score_dtype in SCORE_DTYPES:
+        stored = encode_scores(neighbors, score_dtype)
+        ids, scores = NeighborIndex(*stored).query_batch(sample, k)
+        reranked = np.take_along_axis(ids, np.lexsort((ids, -scores), axis=1), axis=1)
+        
+        metrics = {'bytes_per_movie': sum(array.nbytes for array in stored[1:]) // n}
+        for kk in ks:
+            metrics[f'changed@{kk}'] = float((ids[:, :kk] != ref_ids[:, :kk]).any(axis=1).mean())
+            metrics[f'reranked@{kk}'] = float((reranked[:, :kk] != ref_ids[:, :kk]).any(axis=1).mean())
+        # Score errors are measured where the served neighbor matches the reference
+        same = ids == ref_ids
+        shown = min(ks)
+        display_changed = np.round(scores.astype(np.float64) * 100, 1) != np.round(ref_scores * 100, 1)
+        metrics['display'] = float(display_changed[:, :shown][same[:, :shown]].mean()) if same.any() else 0.0
+        metrics['max_error'] = float(np.abs(scores[same] - ref_scores[same]).max()) if same.any() else 0.0
+        report[score_dtype] = metrics
+        
+        print('    ' + f"{score_dtype:<9}{metrics['bytes_per_movie']:>12,}" + ''.join(
+            f"{metrics[f'changed@{kk}']:>12.1%}{metrics[f'reranked@{kk}']:>13.1%}" for kk in ks)
+            + f"{metrics['display']:>9.1%}{metrics['max_error']:>11.5f}")
+    return report
+
+
+def compute_neighbor_index_blockwise(tfidf_matrix, k=NEIGHBOR_K, score_dtype=np.float32,
+                                     block_size=None, n_jobs=None):
+    """
+    Compute the top-K neighbor index without materializing the N x N matrix.
+    
+    Rows of the L2-normalized TF-IDF matrix are processed in blocks across a
+    process pool. Each block computes block x all cosine similarities, is
+    immediately reduced to its top-K per row, and contributes to streaming
+    min/max/mean statistics. Peak memory is bounded by the block size
+    (block_size x N scores per worker) instead of N².
+    
+    Parameters:
+    -----------
+    block_size : int, optional
+        Rows per block. Defaults to roughly BLOCK_TARGET_BYTES of float32 scores.
+    n_jobs : int, optional
+        Worker processes. Defaults to the CPU count; 1 runs in-process.
+    
+    Returns:
+    --------
+    (indices, scores) : top-K neighbor index, as from build_neighbor_index
+    stats : dict with min, max and mean similarity over the full matrix
+    """
+    matrix = normalize(sparse.csr_matrix(tfidf_matrix, dtype=np.float32), norm='l2')
+    n = matrix.shape[0]
+    k = min(k, n - 1)
+    if block_size is None:
+        block_size = max(1, BLOCK_TARGET_BYTES // (4 * n))
+    n_jobs = n_jobs or os.cpu_count() or 1
+    blocks = [(start, min(start + block_size, n)) for start in range(0, n, block_size)]
+    
+    print(f"\n[*] Computing top-{k} neighbors blockwise...")
+    print(f"    {len(blocks)} blocks of {block_size} rows, {n_jobs} worker(s)")
+    
+    indices = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=score_dtype)
+    sim_min, sim_max, sim_sum, sim_count = np.inf, -np.inf, 0.0, 0
+    
+    def collect(result):
+        nonlocal sim_min, sim_max, sim_sum, sim_count
+        start, top, top_scores, (b_min, b_max, b_sum, b_count) = result
+        indices[start:start + len(top)] = top
+        scores[start:start + len(top)] = top_scores
+        sim_min, sim_max = min(sim_min, b_min), max(sim_max, b_max)
+        sim_sum += b_sum
+        sim_count += b_count
+    
+    if n_jobs == 1:
+        # Serial builds run in this process, so drop the matrix copies when done
+        _init_block_worker(matrix)
+        try:
+            for start, stop in blocks:
+                collect(_similarity_block(start, stop, k))
+        finally:
+            _release_block_worker()
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_block_worker,
+                                 initargs=(matrix,)) as pool:
+            futures = [pool.submit(_similarity_block, start, stop, k) for start, stop in blocks]
+            for future in as_completed(futures):
+                collect(future.result())
+    
+    stats = {'min': sim_min, 'max': sim_max, 'mean': sim_sum / sim_count}
+    print(f"    Shape: {indices.shape} ({indices.nbytes + scores.nbytes:,} bytes)")
+    print(f"    Value range: [{stats['min']:.4f}, {stats['max']:.4f}]")
+    print(f"    Mean similarity: {stats['mean']:.4f}")
+    return (indices, scores), stats
+
+
+def serving_columns(df):
+    """SERVING_COLUMNS plus the facet columns (genres, year, ...) the catalog has."""
+    return SERVING_COLUMNS + [column for column in FACET_COLUMNS if column in df]
+
+
+def save_model_store(df, tfidf_matrix=None, neighbors=None, ann=None, model_dir=DEFAULT_MODEL_DIR,
+                     metadata=None, vectorizer=None, columns=None, fields=None):
+    """
+    Save the serving artifacts as a new, atomically published model version.
+    
+    Holds the movie metadata the app displays, the top-K neighbor index and
+    the L2-normalized sparse TF-IDF matrix (for on-demand similarity), all as
+    plain .npy arrays plus a JSON manifest - no pickle involved. Facet
+    bitsets for filtered recommendations are computed from the facet
+    columns. Running apps keep serving the previous version until this one
+    is complete.
+    """
+    print(f"\n[*] Saving model store to {model_dir}/...")
+    with model_store.new_version(model_dir) as version_dir:
+        manifest = model_store.write_model(
+            version_dir,
+            df[columns or serving_columns(df)],
+            neighbors=neighbors,
+            tfidf_matrix=tfidf_matrix,
+            ann=ann,
+            metadata=metadata,
+            vectorizer=vectorizer,
+            fields=fields,
+        )
+    total_size = sum(
+        os.path.getsize(os.path.join(version_dir, entry['file']))
+        for entry in manifest['arrays'].values()
+    ) / (1024 * 1024)
+    print(f"    Saved {len(manifest['arrays'])} arrays, total size: {total_size:.1f} MB")
+    if 'facets' in manifest:
+        print(f"    Facet bitsets: {len(manifest['facets'])}")
+    print(f"    Published version {os.path.basename(version_dir)}")
+
+
+def build_ann_index(tfidf_matrix, n_components=ANN_COMPONENTS, n_lists=None, random_state=42):
+    """
+    Build an IVF approximate nearest-neighbor index over SVD embeddings.
+    
+    1. Truncated SVD compresses the sparse TF-IDF vectors into dense
+       `n_components`-dimensional embeddings (rows re-normalized to unit length)
+    2. k-means splits the embeddings into `n_lists` clusters (~sqrt(N) by default)
+    3. Movies are grouped by cluster into one flat, contiguous inverted list
+    
+    At query time only the closest `nprobe` clusters are scanned. The SVD
+    components are returned too, so new movies can later be embedded and
+    assigned without retraining (see extend_ann_index).
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.decomposition import TruncatedSVD
+    
+    n = tfidf_matrix.shape[0]
+    n_components = min(n_components, tfidf_matrix.shape[1] - 1)
+    n_lists = n_lists or max(1, int(np.sqrt(n)))
+    print(f"\n[*] Building ANN index ({n_components}-d SVD, {n_lists} lists)...")
+    
+    svd = TruncatedSVD(n_components=n_components, random_state=random_state)
+    embeddings = normalize(svd.fit_transform(tfidf_matrix)).astype(np.float32)
+    print(f"    Explained variance: {svd.explained_variance_ratio_.sum():.1%}")
+    
+    kmeans = MiniBatchKMeans(n_clusters=n_lists, n_init=3, random_state=random_state)
+    assignments = kmeans.fit_predict(embeddings)
+    centroids = normalize(kmeans.cluster_centers_).astype(np.float32)
+    
+    list_items = np.argsort(assignments, kind='stable').astype(np.int32)
+    list_offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignments, minlength=n_lists), out=list_offsets[1:])
+    print(f"    Largest list: {np.diff(list_offsets).max()} movies")
+    
+    return {
+        'embeddings': embeddings,
+        'centroids': centroids,
+        'list_offsets': list_offsets,
+        'list_items': list_items,
+        'components': svd.components_.astype(np.float32),
+    }
+
+
+def extend_ann_index(ann, new_matrix):
+    """
+    Add new movies to an IVF index without retraining it.
+    
+    The new TF-IDF rows are projected with the stored SVD components and
+    each movie joins the list of its nearest existing centroid. Projection
+    and centroids stay those of the last full fit, which describe the
+    catalog less well as it grows; the model is refit once the growth
+    threshold trips (see update_model_incremental).
+    """
+    components = np.asarray(ann['components'])
+    centroids = np.asarray(ann['centroids'])
+    list_offsets = np.asarray(ann['list_offsets'])
+    n_old = len(ann['embeddings'])
+    new_embeddings = normalize(np.asarray(new_matrix @ components.T)).astype(np.float32)
+    
+    assignments = np.empty(n_old + new_matrix.shape[0], dtype=np.int64)
+    assignments[np.asarray(ann['list_items'])] = np.repeat(np.arange(len(centroids)), np.diff(list_offsets))
+    assignments[n_old:] = np.argmax(new_embeddings @ centroids.T, axis=1)
+    list_items = np.argsort(assignments, kind='stable').astype(np.int32)
+    list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignments, minlength=len(centroids)), out=list_offsets[1:])
+    
+    return {
+        'embeddings': np.vstack([np.asarray(ann['embeddings']), new_embeddings]),
+        'centroids': centroids,
+        'list_offsets': list_offsets,
+        'list_items': list_items,
+        'components': components,
+    }
+
+
+def oov_rate(vectorizer, docs):
+    """Fraction of the analyzed terms (n-grams) of `docs` missing from the vocabulary."""
+    analyze = vectorizer.build_analyzer()
+    total = missing = 0
+    for doc in docs:
+        terms = analyze(doc)
+        total += len(terms)
+        missing += sum(1 for term in terms if term not in vectorizer.vocabulary_)
+    return missing / total if total else 0.0
+
+
+def fit_metadata(df, vectorizer):
+    """Manifest metadata of a full fit: catalog size and baseline out-of-vocabulary rate."""
+    sample = df['tags'].sample(min(len(df), OOV_SAMPLE_SIZE), random_state=42)
+    return {'source': 'tfidf', 'fitted_items': len(df), 'oov_rate': oov_rate(vectorizer, sample)}
+
+
+def load_new_movies(path):
+    """Read movies to add from a CSV with movie_id, title and tags (and optional facet and field) columns."""
+    new_movies = pd.read_csv(path, keep_default_na=False, na_values={'vote_average': ['']})
+    missing = {'movie_id', 'title', 'tags'} - set(new_movies.columns)
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(sorted(missing))}")
+    optional = dict.fromkeys(FACET_COLUMNS + list(FIELD_WEIGHTS))
+    return new_movies[['movie_id', 'title', 'tags'] + [c for c in optional if c in new_movies]]
+
+
+def save_catalog(df, path='models/movies_dict.pkl'):
+    """Write the full catalog (with tags) back as the movies_dict.pkl the builder fits on."""
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(df.to_dict(), f)
+    os.replace(path + '.tmp', path)
+
+
+def append_movies(movies, new_movies):
+    """Append new movies to stored movie columns, filling columns the new rows lack."""
+    combined = pd.concat([movies, new_movies], ignore_index=True)
+    for column in movies.columns.difference(new_movies.columns):
+        dtype = movies[column].dtype
+        if dtype.kind in 'biu':
+            combined[column] = combined[column].fillna(0).astype(dtype)
+        elif dtype.kind == 'f':
+            combined[column] = combined[column].astype(dtype)
+        else:
+            combined[column] = combined[column].fillna('')
+    return combined
+
+
+def splice_neighbors(indices, scores, old_matrix, new_matrix, block_size=None):
+    """
+    Extend a top-K neighbor index with new movies without recomputing it.
+    
+    Only the new rows are scored, against the whole catalog. They give the
+    new movies' own neighbor lists, and, read column-wise, the candidates
+    that may enter the lists of existing movies. An existing movie's list
+    is re-ranked only if a new movie beats its current K-th neighbor.
+    
+    Returns:
+    --------
+    (indices, scores) : index over old + new movies, same K and dtypes
+    affected : number of existing movies whose neighbor list changed
+    """
+    n_old, k = indices.shape
+    n_new = new_matrix.shape[0]
+    all_matrix_t = sparse.vstack([old_matrix, new_matrix]).T.tocsr()
+    if block_size is None:
+        block_size = max(1, BLOCK_TARGET_BYTES // (4 * (n_old + n_new)))
+    
+    indices = np.concatenate([indices, np.empty((n_new, k), dtype=indices.dtype)])
+    scores = np.concatenate([scores, np.empty((n_new, k), dtype=scores.dtype)])
+    changed = np.zeros(n_old, dtype=bool)
+    
+    for start in range(0, n_new, block_size):
+        stop = min(start + block_size, n_new)
+        block = np.asarray((new_matrix[start:stop] @ all_matrix_t).todense(), dtype=np.float32)
+        rows = np.arange(n_old + start, n_old + stop)
+        top, top_scores = top_k_rows(block, k, exclude=rows)
+        indices[rows], scores[rows] = top, top_scores
+        
+        # Existing movies whose K-th neighbor is beaten by one of these new movies
+        candidates = block[:, :n_old].T
+        affected = np.flatnonzero(candidates.max(axis=1) > scores[:n_old, -1])
+        if len(affected) == 0:
+            continue
+        merged_ids = np.hstack([indices[affected], np.broadcast_to(rows, (len(affected), len(rows)))])
+        merged_scores = np.hstack([scores[affected].astype(np.float32), candidates[affected]])
+        top, top_scores = top_k_rows(merged_scores, k)
+        indices[affected] = np.take_along_axis(merged_ids, top, axis=1)
+        scores[affected] = top_scores
+        changed[affected] = True
+    
+    return (indices, scores), int(changed.sum())
+
+
+def update_model_incremental(model_dir, df, n_new, drift_threshold=DRIFT_THRESHOLD,
+                             max_growth=MAX_INCREMENTAL_GROWTH):
+    """
+    Add the last `n_new` movies of `df` to an existing model without a refit.
+    
+    The new movies are transformed with the stored vocabulary and IDF
+    weights, and only their similarity rows are computed (see
+    splice_neighbors); an ANN index gets them without retraining (see
+    extend_ann_index). Returns False, leaving the model untouched, when a
+    full rebuild is needed instead: the model lacks a stored vocabulary or
+    does not match the catalog, the new text drifts too far from the
+    vocabulary, or the catalog has outgrown its IDF weights.
+    """
+    print(f"\n[*] Adding {n_new} movies to {model_dir}/ incrementally...")
+    n_old = len(df) - n_new
+    try:
+        model = model_store.load_model(model_dir, mmap=False)
+    except (FileNotFoundError, model_store.ModelStoreError) as e:
+        print(f"    [!] No usable model to update ({e})")
+        return False
+    
+    vectorizer = model.vectorizer()
+    if vectorizer is None:
+        print("    [!] Field-weighted models are always refit" if model.fields
+              else "    [!] Model has no stored vocabulary")
+        return False
+    if model.n_items != n_old or not np.array_equal(model.movies['movie_id'], df['movie_id'][:n_old]):
+        print("    [!] Model does not match the current catalog")
+        return False
+    
+    metadata = model.manifest['metadata']
+    fitted_items = metadata.get('fitted_items', n_old)
+    growth = len(df) / fitted_items - 1
+    if growth > max_growth:
+        print(f"    [!] Catalog grew {growth:.0%} since the last fit (max {max_growth:.0%})")
+        return False
+    
+    new_tags = df['tags'][n_old:]
+    drift = oov_rate(vectorizer, new_tags) - metadata.get('oov_rate', 0.0)
+    print(f"    Vocabulary drift: {drift:+.1%} out-of-vocabulary terms")
+    if drift > drift_threshold:
+        print(f"    [!] Drift exceeds {drift_threshold:.0%}")
+        return False
+    
+    old_matrix = model.tfidf_matrix()
+    new_matrix = normalize(sparse.csr_matrix(vectorizer.transform(new_tags), dtype=np.float32), norm='l2')
+    tfidf_matrix = sparse.vstack([old_matrix, new_matrix]).tocsr()
+    
+    neighbors = None
+    if model.has('neighbors.indices'):
+        scores, scale = model.arrays['neighbors.scores'], model.arrays.get('neighbors.scale')
+        if scale is not None:
+            scores = dequantize_scores(scores, scale)
+        neighbors, affected = splice_neighbors(
+            model.arrays['neighbors.indices'], scores, old_matrix, new_matrix
+        )
+        if scale is not None:
+            neighbors = encode_scores(neighbors, 'int8')
+        print(f"    Updated the neighbor lists of {affected:,} existing movies")
+    
+    ann = None
+    if model.has('ann.components'):
+        ann = extend_ann_index({name: model.arrays[f'ann.{name}'] for name in ANN_ARRAYS}, new_matrix)
+        print(f"    Assigned the new movies to the {len(ann['centroids']):,} existing ANN lists")
+    elif model.has('ann.embeddings'):
+        # Built before the SVD components were stored: retrain once, later additions reuse it
+        ann = build_ann_index(tfidf_matrix, model.arrays['ann.embeddings'].shape[1],
+                              len(model.arrays['ann.centroids']))
+    
+    movies = append_movies(model.movies, df[serving_columns(df)][n_old:])
+    metadata = {**metadata, 'incremental_items': metadata.get('incremental_items', 0) + n_new}
+    # Keep display columns (e.g. prefetched posters) of the existing movies
+    save_model_store(movies, tfidf_matrix=tfidf_matrix, neighbors=neighbors, ann=ann,
+                     model_dir=model_dir, metadata=metadata, vectorizer=vectorizer,
+                     columns=list(movies.columns))
+    return True
+
+
+def load_previous_model(model_dir):
+    """
+    Load the currently deployed neighbor index for comparison, if there is one.
+    
+    Prefers the model store; falls back to the legacy similarity.pkl. Arrays
+    are read into memory (not memory-mapped) because the store is about to
+    be overwritten.
+    """
+    try:
+        model = model_store.load_model(model_dir, mmap=False)
+        if model.has('neighbors.indices'):
+            print(f"\n[*] Loaded current model from {model_dir}/ for comparison")
+            return model.neighbor_index()
+    except (FileNotFoundError, model_store.ModelStoreError):
+        pass
+    
+    try:
+        print("\n[*] Loading original similarity matrix for comparison...")
+        with open('models/similarity.pkl', 'rb') as f:
+            similarity = pickle.load(f)
+        return NeighborIndex(*build_neighbor_index(similarity, k=10))
+    except Exception as e:
+        print(f"    [!] No previous model to compare against ({e})")
+        return None
+
+
+def compare_models(df, old_neighbors, new_neighbors, test_movies=None):
+    """Compare old and new model recommendations from their neighbor indexes."""
     if test_movies is None:
         test_movies = ['Avatar', 'The Dark Knight', 'Titanic', 'The Matrix', 'Toy Story']
     
@@ -119,44 +759,197 @@ def compare_models(df, old_similarity, new_similarity, test_movies=None):
     print("MODEL COMPARISON")
     print("=" * 70)
     
+    titles = TitleIndex(df['title'], df['movie_id'])
     for movie_name in test_movies:
-        matches = df[df['title'].str.lower() == movie_name.lower()]
-        if len(matches) == 0:
+        idx = titles.lookup(movie_name)
+        if idx is None:
             print(f"\n[!] Movie not found: {movie_name}")
             continue
-            
-        idx = matches.index[0]
         
         print(f"\n### {movie_name} ###")
         print("-" * 50)
         
-        # Old model recommendations
-        old_scores = list(enumerate(old_similarity[idx]))
-        old_scores = sorted(old_scores, key=lambda x: x[1], reverse=True)[1:6]
-        
-        # New model recommendations
-        new_scores = list(enumerate(new_similarity[idx]))
-        new_scores = sorted(new_scores, key=lambda x: x[1], reverse=True)[1:6]
+        # Old and new model recommendations
+        old_ids, old_scores = old_neighbors.query(idx, 5, exclude=idx)
+        new_ids, new_scores = new_neighbors.query(idx, 5, exclude=idx)
         
         print(f"{'Rank':<5} {'OLD MODEL':<35} {'NEW MODEL (TF-IDF)':<35}")
         print("-" * 75)
         
-        for i, ((old_idx, old_score), (new_idx, new_score)) in enumerate(zip(old_scores, new_scores), 1):
+        rows = zip(old_ids.tolist(), old_scores.tolist(), new_ids.tolist(), new_scores.tolist())
+        for i, (old_idx, old_score, new_idx, new_score) in enumerate(rows, 1):
             old_title = df.iloc[old_idx]['title'][:30]
             new_title = df.iloc[new_idx]['title'][:30]
             print(f"{i:<5} {old_title:<30} ({old_score:.1%})  {new_title:<30} ({new_score:.1%})")
+    
+    # Agreement over the whole catalog, not just the titles above
+    if old_neighbors.n_items == len(df):
+        k = min(evaluate.DEFAULT_K, old_neighbors.k, new_neighbors.k)
+        overlap, jaccard, spearman = evaluate.catalog_agreement(
+            evaluate.top_k_lists(old_neighbors, len(df), k),
+            evaluate.top_k_lists(new_neighbors, len(df), k),
+        )
+        print(f"\nAll {len(df):,} movies, top-{k}: overlap {overlap.mean():.1%}, "
+              f"Jaccard {jaccard.mean():.3f}, Spearman {np.nanmean(spearman):.3f}")
+        print("Full report: python evaluate.py <old model dir> <new model dir>")
 
 
 def save_model(similarity, output_path='models/similarity_tfidf.pkl'):
     """Save the new similarity matrix."""
     print(f"\n[*] Saving improved model to {output_path}...")
-    with open(output_path, 'wb') as f:
+    with open(output_path + '.tmp', 'wb') as f:
         pickle.dump(similarity, f)
+    os.replace(output_path + '.tmp', output_path)
     file_size = os.path.getsize(output_path) / (1024 * 1024)
     print(f"    Saved! File size: {file_size:.1f} MB")
 
 
-def main():
+def field_weight(value):
+    """A NAME=WEIGHT command-line pair."""
+    name, _, weight = value.partition('=')
+    if name not in FIELD_WEIGHTS:
+        raise argparse.ArgumentTypeError(f"unknown field '{name}' (expected one of {', '.join(FIELD_WEIGHTS)})")
+    try:
+        return name, float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid weight in '{value}'") from None
+
+
+def build_features(df, args):
+    """TF-IDF matrix, vectorizer, field blocks and fit metadata of a full build."""
+    if args.fields or args.field_weight:
+        tfidf_matrix, fields = build_field_model(df, {**FIELD_WEIGHTS, **dict(args.field_weight)})
+        return tfidf_matrix, None, fields, {'source': 'fields', 'fitted_items': len(df)}
+    tfidf_matrix, tfidf = build_tfidf_model(df, **tfidf_params(args))
+    return tfidf_matrix, tfidf, None, fit_metadata(df, tfidf)
+
+
+def document_frequency(value):
+    """A min_df/max_df value as TfidfVectorizer reads it: '2' is a count, '0.8' a fraction."""
+    return float(value) if '.' in value else int(value)
+
+
+def tfidf_params(args):
+    """Vectorizer settings selected on the command line."""
+    return {'max_features': args.max_features, 'ngram_range': (1, args.ngram_max),
+            'min_df': args.min_df, 'max_df': args.max_df, 'sublinear_tf': args.sublinear_tf}
+
+
+def build_settings(args):
+    """The settings of a full build, recorded in the model so that `--add` can repeat the build."""
+    params = tfidf_params(args)
+    return {
+        'top_k': args.top_k,
+        'score_dtype': args.score_dtype,
+        'sparse_only': args.sparse_only,
+        'tfidf': {**params, 'ngram_range': list(params['ngram_range'])},
+        'field_weights': {**FIELD_WEIGHTS, **dict(args.field_weight)} if args.fields or args.field_weight else None,
+        'ann': {'components': args.ann_components, 'lists': args.ann_lists} if args.ann else None,
+    }
+
+
+def stored_build_settings(model_dir):
+    """
+    Build settings of the model in `model_dir` (see build_settings), or None without a model.
+    
+    Models built before the settings were recorded still give them when
+    they are field-weighted (the weights are in the manifest). Otherwise
+    ValueError is raised: their vocabulary settings are unknown. A model
+    exported from the legacy similarity.pkl has nothing to repeat (None).
+    """
+    try:
+        manifest = model_store.read_manifest(model_dir)
+    except (FileNotFoundError, model_store.ModelStoreError):
+        return None
+    metadata = manifest.get('metadata') or {}
+    if 'build' in metadata:
+        return metadata['build']
+    if metadata.get('source') == 'similarity.pkl':
+        return None
+    if not manifest.get('fields'):
+        raise ValueError(f"{model_dir} does not record the settings it was built with")
+    arrays = manifest['arrays']
+    built = {field['name']: field['weight'] for field in manifest['fields']}
+    return {
+        'top_k': arrays['neighbors.indices']['shape'][1] if 'neighbors.indices' in arrays else NEIGHBOR_K,
+        'score_dtype': metadata.get('score_dtype', 'float32'),
+        'sparse_only': 'neighbors.indices' not in arrays,
+        'tfidf': {**TFIDF_PARAMS, 'ngram_range': list(TFIDF_PARAMS['ngram_range'])},
+        'field_weights': {name: built.get(name, 0.0) for name in FIELD_WEIGHTS},
+        'ann': {'components': arrays['ann.embeddings']['shape'][1], 'lists': None} if 'ann.embeddings' in arrays else None,
+    }
+
+
+def apply_build_settings(args, settings):
+    """A copy of the command-line `args` with recorded build settings applied."""
+    args = argparse.Namespace(**vars(args))
+    args.top_k, args.score_dtype, args.sparse_only = settings['top_k'], settings['score_dtype'], settings['sparse_only']
+    tfidf = settings['tfidf']
+    args.max_features, args.ngram_max = tfidf['max_features'], tfidf['ngram_range'][1]
+    args.min_df, args.max_df, args.sublinear_tf = tfidf['min_df'], tfidf['max_df'], tfidf['sublinear_tf']
+    args.fields = settings['field_weights'] is not None
+    args.field_weight = list((settings['field_weights'] or {}).items())
+    args.ann = settings['ann'] is not None
+    if args.ann:
+        args.ann_components, args.ann_lists = settings['ann']['components'], settings['ann']['lists']
+    return args
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the CineMatch recommendation model.")
+    parser.add_argument('--top-k', type=int, default=NEIGHBOR_K,
+                        help=f"neighbors kept per movie in the serving index (default: {NEIGHBOR_K})")
+    parser.add_argument('--score-dtype', choices=SCORE_DTYPES, default='float32',
+                        help="storage precision of neighbor scores; int8 stores 8-bit codes "
+                             "with a per-row scale (default: float32)")
+    parser.add_argument('--sparse-only', action='store_true',
+                        help="only write the sparse TF-IDF matrix; skip the dense N x N similarity")
+    parser.add_argument('--export-legacy', action='store_true',
+                        help="convert the existing similarity.pkl into a model store without refitting")
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR,
+                        help=f"output model directory (default: {DEFAULT_MODEL_DIR})")
+    parser.add_argument('--block-size', type=int, default=None,
+                        help="rows per similarity block (default: ~64 MB of scores per block)")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker processes for the blockwise build (default: CPU count)")
+    parser.add_argument('--ann', action='store_true',
+                        help="also build an approximate nearest-neighbor (IVF) index")
+    parser.add_argument('--ann-components', type=int, default=ANN_COMPONENTS,
+                        help=f"SVD dimensions of the ANN embeddings (default: {ANN_COMPONENTS})")
+    parser.add_argument('--ann-lists', type=int, default=None,
+                        help="number of IVF clusters (default: sqrt of the catalog size)")
+    parser.add_argument('--dense', action='store_true',
+                        help="also write the legacy dense similarity.pkl")
+    parser.add_argument('--add', metavar='CSV',
+                        help="add the movies in CSV (movie_id, title, tags) to the catalog, "
+                             "updating the model incrementally when possible; a full rebuild "
+                             "repeats the settings the current model was built with")
+    parser.add_argument('--max-features', type=int, default=TFIDF_PARAMS['max_features'],
+                        help=f"TF-IDF vocabulary size (default: {TFIDF_PARAMS['max_features']})")
+    parser.add_argument('--ngram-max', type=int, default=TFIDF_PARAMS['ngram_range'][1],
+                        help=f"longest n-gram in the vocabulary (default: {TFIDF_PARAMS['ngram_range'][1]})")
+    parser.add_argument('--min-df', type=document_frequency, default=TFIDF_PARAMS['min_df'],
+                        help="ignore terms in fewer movies than this (count, or fraction if < 1; "
+                             f"default: {TFIDF_PARAMS['min_df']})")
+    parser.add_argument('--max-df', type=document_frequency, default=TFIDF_PARAMS['max_df'],
+                        help="ignore terms in more movies than this (count, or fraction if <= 1.0; "
+                             f"default: {TFIDF_PARAMS['max_df']})")
+    parser.add_argument('--no-sublinear-tf', dest='sublinear_tf', action='store_false',
+                        help="weight raw term counts instead of 1 + log(tf)")
+    parser.add_argument('--fields', action='store_true',
+                        help="vectorize genres, keywords, cast, crew and overview separately and stack "
+                             "them with per-field weights (catalogs from ingest_tmdb.py)")
+    parser.add_argument('--field-weight', type=field_weight, action='append', default=[], metavar='NAME=WEIGHT',
+                        help="weight of one field in a --fields build (default: 1 each; 0 drops the field)")
+    parser.add_argument('--drift-threshold', type=float, default=DRIFT_THRESHOLD,
+                        help="out-of-vocabulary increase that forces a full refit with --add "
+                             f"(default: {DRIFT_THRESHOLD})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    
     print("=" * 60)
     print("IMPROVED MODEL BUILDER")
     print("=" * 60)
@@ -164,32 +957,93 @@ def main():
     # Load data
     df = load_current_model()
     
-    # Load old similarity for comparison
-    print("\n[*] Loading original similarity matrix for comparison...")
-    old_similarity = pickle.load(open('models/similarity.pkl', 'rb'))
+    if args.add:
+        new_movies = load_new_movies(args.add)
+        new_movies = new_movies[~new_movies['movie_id'].isin(df['movie_id'])]
+        if len(new_movies) == 0:
+            print("\n[OK] All movies are already in the catalog.")
+            return
+        df = pd.concat([df, new_movies], ignore_index=True)
+        # Facet and field columns the new movies lack are unknown, not "nan"
+        df = df.fillna({column: '' for column in FACET_COLUMNS + list(FIELD_WEIGHTS)
+                        if column in df and not pd.api.types.is_numeric_dtype(df[column])})
+        updated = update_model_incremental(args.model_dir, df, len(new_movies),
+                                           drift_threshold=args.drift_threshold)
+        save_catalog(df)
+        if updated:
+            print(f"\n[OK] Added {len(new_movies)} movies without a full rebuild.")
+            return
+        try:
+            settings = stored_build_settings(args.model_dir)
+        except ValueError as e:
+            print(f"\n[FAIL] Cannot rebuild: {e}.")
+            print("    The new movies are in the catalog; rerun without --add, with the flags the model "
+                  "was built with (--top-k, --score-dtype, --max-features, --fields, ...).")
+            sys.exit(1)
+        print("\n[*] Falling back to a full rebuild...")
+        if settings is not None:
+            args = apply_build_settings(args, settings)
+            print(f"    Settings of the current model: {settings}")
+    
+    if args.export_legacy:
+        print("\n[*] Loading legacy similarity matrix...")
+        similarity = pickle.load(open('models/similarity.pkl', 'rb'))
+        neighbors = encode_scores(build_neighbor_index(similarity, k=args.top_k), args.score_dtype)
+        del similarity
+        save_model_store(df, neighbors=neighbors, model_dir=args.model_dir,
+                         metadata={'source': 'similarity.pkl'})
+        print("\n[OK] Legacy model exported.")
+        return
+    
+    if args.sparse_only:
+        tfidf_matrix, tfidf, fields, metadata = build_features(df, args)
+        ann = build_ann_index(tfidf_matrix, args.ann_components, args.ann_lists) if args.ann else None
+        save_model_store(df, tfidf_matrix=tfidf_matrix, ann=ann, model_dir=args.model_dir,
+                         metadata={**metadata, 'build': build_settings(args)}, vectorizer=tfidf, fields=fields)
+        print("\n[OK] Set RECOMMENDER_BACKEND=sparse to serve from the sparse matrix.")
+        return
+    
+    # Load the current model for comparison
+    old_neighbors = load_previous_model(args.model_dir)
     
     # Build new TF-IDF model
-    tfidf_matrix, tfidf = build_tfidf_model(df)
+    tfidf_matrix, tfidf, fields, metadata = build_features(df, args)
     
-    # Compute new similarity
-    new_similarity = compute_similarity(tfidf_matrix)
+    # Compute the neighbor index block by block
+    neighbors, stats = compute_neighbor_index_blockwise(
+        tfidf_matrix, k=args.top_k, block_size=args.block_size, n_jobs=args.jobs,
+    )
+    precision = compare_score_precision(tfidf_matrix, neighbors)
+    neighbors = encode_scores(neighbors, args.score_dtype)
     
     # Compare models
-    compare_models(df, old_similarity, new_similarity)
+    if old_neighbors is not None:
+        compare_models(df, old_neighbors, NeighborIndex(*neighbors))
     
-    # Save new model
-    save_model(new_similarity)
+    ann = build_ann_index(tfidf_matrix, args.ann_components, args.ann_lists) if args.ann else None
     
-    # Also save as the main model (backup old one first)
-    print("\n[*] Backing up original model...")
-    import shutil
-    if not os.path.exists('models/similarity_original.pkl'):
-        shutil.copy('models/similarity.pkl', 'models/similarity_original.pkl')
-        print("    Original model backed up to similarity_original.pkl")
+    # Save the model store the app serves from
+    save_model_store(df, tfidf_matrix=tfidf_matrix, neighbors=neighbors, ann=ann,
+                     model_dir=args.model_dir,
+                     metadata={**metadata, 'similarity': stats, 'score_dtype': args.score_dtype,
+                               'precision': precision[args.score_dtype], 'build': build_settings(args)},
+                     vectorizer=tfidf, fields=fields)
     
-    print("\n[*] Replacing main model with improved version...")
-    shutil.copy('models/similarity_tfidf.pkl', 'models/similarity.pkl')
-    print("    Done! The app will now use the improved model.")
+    if args.dense:
+        # Legacy dense matrix for deployments that still load similarity.pkl
+        save_model(compute_similarity(tfidf_matrix))
+        
+        print("\n[*] Backing up original model...")
+        import shutil
+        if not os.path.exists('models/similarity_original.pkl'):
+            shutil.copy('models/similarity.pkl', 'models/similarity_original.pkl')
+            print("    Original model backed up to similarity_original.pkl")
+        
+        print("\n[*] Replacing main model with improved version...")
+        # Copy aside and rename, so a reader never sees a half-written similarity.pkl
+        shutil.copy('models/similarity_tfidf.pkl', 'models/similarity.pkl.tmp')
+        os.replace('models/similarity.pkl.tmp', 'models/similarity.pkl')
+        print("    Done!")
     
     print("\n" + "=" * 60)
     print("IMPROVEMENT SUMMARY")
@@ -209,7 +1063,7 @@ def main():
     Result: More nuanced, discriminative recommendations!
     """)
     
-    print("[OK] Restart the Streamlit app to see improved recommendations!")
+    print("[OK] Running apps switch to the new model version within MODEL_CHECK_SECONDS.")
 
 
 if __name__ == "__main__":
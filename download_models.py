@@ -88,15 +88,25 @@ def download_models():
     print("=" * 50)
 
 def verify_models():
-    """Verify that model files exist and can be loaded."""
-    import pickle
+    """Verify that the model files exist and are usable, without unpickling them."""
+    import model_store
     
     models_dir = 'models'
-    required_files = ['similarity.pkl', 'movies_dict.pkl']
     
     print()
     print("[*] Verifying model files...")
     
+    # Preferred: memory-mapped model store (plain .npy arrays + manifest)
+    if os.path.exists(os.path.join(model_store.DEFAULT_MODEL_DIR, model_store.MANIFEST_FILE)):
+        problems = model_store.verify_model(model_store.DEFAULT_MODEL_DIR)
+        for problem in problems:
+            print(f"[FAIL] {problem}")
+        if not problems:
+            print(f"[OK] Valid: {model_store.DEFAULT_MODEL_DIR}")
+        return not problems
+    
+    # Legacy pickles: only check they are real files, never load them here
+    required_files = ['similarity.pkl', 'movies_dict.pkl']
     all_valid = True
     for filename in required_files:
         filepath = os.path.join(models_dir, filename)
@@ -106,13 +116,18 @@ def verify_models():
             all_valid = False
             continue
         
-        try:
-            with open(filepath, 'rb') as f:
-                pickle.load(f)
-            print(f"[OK] Valid: {filename}")
-        except Exception as e:
-            print(f"[FAIL] Corrupted: {filename} - {str(e)}")
+        with open(filepath, 'rb') as f:
+            header = f.read(64)
+        if header.startswith(b'version https://git-lfs'):
+            print(f"[FAIL] Git LFS pointer, not the actual file: {filename}")
             all_valid = False
+        else:
+            print(f"[OK] Found: {filename}")
+    
+    if all_valid:
+        print()
+        print("[*] Convert the legacy pickles into the memory-mapped model store with:")
+        print("   python build_improved_model.py --export-legacy")
     
     return all_valid
 
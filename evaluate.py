@@ -0,0 +1,372 @@
+"""
+Offline Evaluation of Model Variants
+
+Compares the recommendations of two model stores (or two versions of one)
+over the whole catalog, not just a handful of hand-picked titles:
+
+- agreement: top-K overlap, Jaccard similarity and Spearman rank
+  correlation of the movies both lists share
+- per model: catalog coverage, Gini coefficient of how often movies are
+  recommended, popularity percentile of the recommended movies (when the
+  catalog has `vote_count`) and intra-list diversity (1 - mean pairwise
+  cosine similarity within each list, measured with the baseline's TF-IDF)
+
+Top-K lists for all movies are computed with batched `query_batch` calls in
+parallel chunks; every metric is vectorized over a chunk of rows. Movies
+are matched across the two models by movie_id, so catalogs may differ.
+
+Usage:
+    python evaluate.py models/store.versions/<old> models/store
+    python evaluate.py old_store new_store --k 10 --backend sparse --output report.json --html report.html
+    python evaluate.py old_store new_store --min-overlap 0.6     # exit 1 below the gate
+"""
+
+import argparse
+import html
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+import model_store
+from recommender import ANN_DEFAULT_NPROBE
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+DEFAULT_K = 10
+
+# Movies per query_batch call
+CHUNK_SIZE = 512
+
+# Movies with the least overlap listed in the report
+EXAMPLES = 10
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# TOP-K LISTS
+# ─────────────────────────────────────────────────────────────────────────────
+def top_k_lists(backend, n_items, k=DEFAULT_K, chunk_size=CHUNK_SIZE, n_jobs=None):
+    """
+    Top-k recommendations of every movie, (N, k) int64, padded with -1.
+
+    Chunks of rows go through `query_batch` on a thread pool; the heavy
+    parts (sparse products, argpartition) run in NumPy/SciPy without the GIL.
+    """
+    ids = np.full((n_items, k), -1, dtype=np.int64)
+    chunks = [np.arange(start, min(start + chunk_size, n_items)) for start in range(0, n_items, chunk_size)]
+
+    def run(rows):
+        chunk_ids, _ = backend.query_batch(rows, k)
+        ids[rows[0]:rows[-1] + 1] = chunk_ids
+
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count() or 1) as pool:
+        list(pool.map(run, chunks))
+    return ids
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# METRICS
+# ─────────────────────────────────────────────────────────────────────────────
+def agreement(ids_a, ids_b):
+    """
+    Per-row agreement of two sets of top-k lists over the same movies.
+
+    Returns:
+    --------
+    overlap : (R,) fraction of list A's movies that are also in list B
+    jaccard : (R,) |A & B| / |A | B|
+    spearman : (R,) rank correlation of the shared movies (NaN if fewer than 2)
+    """
+    ids_a, ids_b = np.asarray(ids_a), np.asarray(ids_b)
+    match = (ids_a[:, :, None] == ids_b[:, None, :]) & (ids_a[:, :, None] >= 0)
+    shared = match.sum(axis=(1, 2))
+    size_a, size_b = (ids_a >= 0).sum(axis=1), (ids_b >= 0).sum(axis=1)
+    overlap = shared / np.maximum(size_a, 1)
+    jaccard = shared / np.maximum(size_a + size_b - shared, 1)
+
+    # Ranks of the shared movies within each list, then 1 - 6 * sum(d^2) / (n (n^2 - 1))
+    rank_a = np.cumsum(match.any(axis=2), axis=1)
+    rank_b = np.cumsum(match.any(axis=1), axis=1)
+    cross = (match * rank_a[:, :, None] * rank_b[:, None, :]).sum(axis=(1, 2))
+    n = shared.astype(np.float64)
+    squares = n * (n + 1) * (2 * n + 1) / 6
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spearman = np.where(n >= 2, 1 - 6 * (2 * squares - 2 * cross) / (n * (n * n - 1)), np.nan)
+    return overlap, jaccard, spearman
+
+
+def catalog_agreement(ids_a, ids_b, chunk_size=CHUNK_SIZE):
+    """`agreement` over any number of rows, a chunk at a time to bound the (R, k, k) temporaries."""
+    parts = [agreement(ids_a[start:start + chunk_size], ids_b[start:start + chunk_size])
+             for start in range(0, len(ids_a), chunk_size)]
+    if not parts:
+        return tuple(np.empty(0) for _ in range(3))
+    return tuple(np.concatenate(part) for part in zip(*parts))
+
+
+def intra_list_similarity(ids, matrix):
+    """
+    Mean pairwise cosine similarity within each list, (R,), NaN for lists under 2 movies.
+
+    With L2-normalized rows, the pairwise similarities of a list sum to
+    (|sum of its rows|^2 - n) / 2, so one sparse selection product per
+    chunk gives every list at once.
+    """
+    ids = np.asarray(ids)
+    valid = ids >= 0
+    counts = valid.sum(axis=1)
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    select = sparse.csr_matrix((np.ones(indptr[-1], dtype=np.float32), ids[valid], indptr),
+                               shape=(len(ids), matrix.shape[0]))
+    sums = select @ matrix
+    norms = np.asarray(sums.multiply(sums).sum(axis=1)).ravel()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts >= 2, (norms - counts) / (counts * (counts - 1)), np.nan)
+
+
+def gini(counts):
+    """Gini coefficient of non-negative counts: 0 = perfectly even, 1 = all on one."""
+    counts = np.sort(np.asarray(counts, dtype=np.float64))
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    n = len(counts)
+    return float((2 * np.arange(1, n + 1) - n - 1) @ counts / (n * total))
+
+
+def popularity_percentiles(popularity):
+    """Percentile (0-1) of each movie's popularity within the catalog."""
+    order = np.argsort(popularity, kind='stable')
+    percentiles = np.empty(len(order), dtype=np.float64)
+    percentiles[order] = np.arange(len(order)) / max(len(order) - 1, 1)
+    return percentiles
+
+
+def _mean(values):
+    """Mean of the finite values, or None if there are none (the report stays valid JSON)."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    return float(values.mean()) if len(values) else None
+
+
+def list_metrics(ids, n_items, matrix=None, popularity=None, chunk_size=CHUNK_SIZE):
+    """
+    Coverage, exposure Gini, popularity and intra-list diversity of one set of top-k lists.
+
+    Metrics without any defined value (e.g. diversity when no list has two
+    movies) are None.
+    """
+    ids = np.asarray(ids)
+    valid = ids[ids >= 0]
+    exposure = np.bincount(valid, minlength=n_items)
+    metrics = {
+        'coverage': float(np.count_nonzero(exposure) / n_items),
+        'exposure_gini': gini(exposure),
+        'mean_list_length': _mean((ids >= 0).sum(axis=1)),
+    }
+    if popularity is not None:
+        metrics['popularity_percentile'] = _mean(popularity_percentiles(popularity)[valid])
+    if matrix is not None:
+        similarity = [intra_list_similarity(ids[start:start + chunk_size], matrix)
+                      for start in range(0, len(ids), chunk_size)]
+        mean_similarity = _mean(np.concatenate(similarity)) if similarity else None
+        metrics['intra_list_diversity'] = None if mean_similarity is None else 1 - mean_similarity
+    return metrics
+
+
+def summarize(values):
+    """Mean and quantiles of a per-movie metric, ignoring NaN."""
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    p10, median, p90 = np.quantile(values, [0.1, 0.5, 0.9])
+    return {'mean': float(values.mean()), 'p10': float(p10), 'median': float(median), 'p90': float(p90)}
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# COMPARISON
+# ─────────────────────────────────────────────────────────────────────────────
+def _remap(ids, mapping):
+    """Translate padded index lists through `mapping`; unknown movies become -1."""
+    return np.where(ids >= 0, mapping[np.maximum(ids, 0)], -1)
+
+
+def compare(model_a, model_b, backend='neighbors', k=DEFAULT_K, n_jobs=None, chunk_size=CHUNK_SIZE,
+            nprobe=ANN_DEFAULT_NPROBE):
+    """
+    Evaluate two loaded models against each other.
+
+    Returns the report dict; model A is the baseline, whose catalog order,
+    TF-IDF matrix and popularity the shared metrics are expressed in.
+    """
+    started = time.perf_counter()
+    movies_a, movies_b = model_a.movies, model_b.movies
+    lists = {}
+    for name, model in (('a', model_a), ('b', model_b)):
+        recommender = model.recommender(backend, nprobe=nprobe)
+        if recommender is None:
+            raise model_store.ModelStoreError(f"{model.model_dir} has no data for the '{backend}' backend")
+        lists[name] = top_k_lists(recommender, model.n_items, k, chunk_size, n_jobs)
+
+    # B's index -> A's index (and back) by movie_id
+    index_a = {movie_id: idx for idx, movie_id in enumerate(movies_a['movie_id'].tolist())}
+    b_to_a = np.array([index_a.get(movie_id, -1) for movie_id in movies_b['movie_id'].tolist()], dtype=np.int64)
+    common_b = np.flatnonzero(b_to_a >= 0)
+    common_a = b_to_a[common_b]
+    ids_a = lists['a'][common_a]
+    ids_b = _remap(lists['b'][common_b], b_to_a)
+
+    overlap, jaccard, spearman = catalog_agreement(ids_a, ids_b, chunk_size)
+
+    matrix = model_a.tfidf_matrix()
+    popularity = movies_a['vote_count'].to_numpy() if 'vote_count' in movies_a else None
+    report = {
+        'k': k,
+        'backend': backend,
+        'models': {name: {'path': model.model_dir, 'version': os.path.basename(os.path.realpath(model.model_dir)),
+                          'n_items': model.n_items}
+                   for name, model in (('a', model_a), ('b', model_b))},
+        'evaluated_movies': int(len(common_a)),
+        'agreement': {
+            'overlap_at_k': summarize(overlap),
+            'jaccard': summarize(jaccard),
+            'spearman': summarize(spearman),
+            'identical_lists': float(np.mean(np.all(ids_a == ids_b, axis=1))) if len(ids_a) else None,
+        },
+        # Both sets of lists in A's catalog, so diversity and popularity use the same yardstick
+        'a': list_metrics(ids_a, model_a.n_items, matrix, popularity, chunk_size),
+        'b': list_metrics(ids_b, model_a.n_items, matrix, popularity, chunk_size),
+    }
+    report['b']['coverage'] = list_metrics(lists['b'], model_b.n_items)['coverage']
+
+    titles = movies_a['title'].tolist()
+    report['most_changed'] = [
+        {
+            'movie_id': int(movies_a['movie_id'].iloc[common_a[row]]),
+            'title': titles[common_a[row]],
+            'jaccard': float(jaccard[row]),
+            'a': [titles[idx] for idx in ids_a[row] if idx >= 0],
+            'b': [titles[idx] if idx >= 0 else '(new movie)' for idx in ids_b[row]],
+        }
+        for row in np.argsort(jaccard, kind='stable')[:EXAMPLES]
+    ]
+    report['seconds'] = round(time.perf_counter() - started, 2)
+    return report
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# REPORTS
+# ─────────────────────────────────────────────────────────────────────────────
+def _fmt(value):
+    if value is None:
+        return '-'
+    if isinstance(value, dict):
+        return f"{value['mean']:.3f} (p10 {value['p10']:.3f}, median {value['median']:.3f})"
+    return f'{value:.3f}' if isinstance(value, float) else str(value)
+
+
+def print_report(report):
+    models = report['models']
+    print(f"\n    A: {models['a']['path']} ({models['a']['version']}, {models['a']['n_items']:,} movies)")
+    print(f"    B: {models['b']['path']} ({models['b']['version']}, {models['b']['n_items']:,} movies)")
+    print(f"    top-{report['k']} of {report['evaluated_movies']:,} shared movies, "
+          f"{report['backend']} backend, {report['seconds']}s")
+    print("\n    Agreement")
+    for name, value in report['agreement'].items():
+        print(f"      {name:<24} {_fmt(value)}")
+    print(f"\n    {'Metric':<24} {'A':>10} {'B':>10}")
+    for name in report['a']:
+        print(f"      {name:<22} {_fmt(report['a'].get(name)):>10} {_fmt(report['b'].get(name)):>10}")
+
+
+def write_html(report, path):
+    """A self-contained HTML version of the report."""
+    esc = html.escape
+    rows = ''.join(f'<tr><td>{esc(name)}</td><td>{esc(_fmt(value))}</td></tr>'
+                   for name, value in report['agreement'].items())
+    model_rows = ''.join(f"<tr><td>{esc(name)}</td><td>{esc(_fmt(report['a'].get(name)))}</td>"
+                         f"<td>{esc(_fmt(report['b'].get(name)))}</td></tr>" for name in report['a'])
+    examples = ''.join(
+        f"<tr><td>{esc(item['title'])}</td><td>{item['jaccard']:.2f}</td>"
+        f"<td>{esc(', '.join(item['a']))}</td><td>{esc(', '.join(item['b']))}</td></tr>"
+        for item in report['most_changed']
+    )
+    models = report['models']
+    document = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>CineMatch model evaluation</title>
+<style>
+  body {{ font-family: sans-serif; margin: 2rem; }}
+  table {{ border-collapse: collapse; margin-bottom: 2rem; }}
+  td, th {{ border: 1px solid #ccc; padding: 0.3rem 0.6rem; text-align: left; vertical-align: top; }}
+</style></head><body>
+<h1>Model evaluation: top-{report['k']}</h1>
+<p>A: {esc(models['a']['path'])} ({esc(models['a']['version'])}, {models['a']['n_items']:,} movies)<br>
+B: {esc(models['b']['path'])} ({esc(models['b']['version'])}, {models['b']['n_items']:,} movies)<br>
+{report['evaluated_movies']:,} shared movies, {esc(report['backend'])} backend, {report['seconds']}s</p>
+<h2>Agreement</h2><table>{rows}</table>
+<h2>Per model</h2><table><tr><th>Metric</th><th>A</th><th>B</th></tr>{model_rows}</table>
+<h2>Most changed</h2>
+<table><tr><th>Movie</th><th>Jaccard</th><th>A</th><th>B</th></tr>{examples}</table>
+</body></html>
+"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(document)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the recommendations of two model stores.")
+    parser.add_argument('baseline', help="model directory A (e.g. an older version)")
+    parser.add_argument('candidate', help="model directory B")
+    parser.add_argument('--k', type=int, default=DEFAULT_K,
+                        help=f"list length evaluated (default: {DEFAULT_K})")
+    parser.add_argument('--backend', choices=('neighbors', 'sparse', 'ann'), default='neighbors',
+                        help="serving backend whose lists are compared (default: neighbors)")
+    parser.add_argument('--nprobe', type=int, default=ANN_DEFAULT_NPROBE,
+                        help="clusters probed by the ann backend")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker threads (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f"movies per batched query (default: {CHUNK_SIZE})")
+    parser.add_argument('--output', help="write the report as JSON")
+    parser.add_argument('--html', help="write the report as HTML")
+    parser.add_argument('--min-overlap', type=float, default=None,
+                        help="exit with status 1 if the mean top-k overlap is below this")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("MODEL EVALUATION")
+    print("=" * 60)
+
+    model_a = model_store.load_model(args.baseline)
+    model_b = model_store.load_model(args.candidate)
+    print(f"\n[*] Computing top-{args.k} lists for {model_a.n_items:,} + {model_b.n_items:,} movies...")
+    report = compare(model_a, model_b, backend=args.backend, k=args.k, n_jobs=args.jobs,
+                     chunk_size=args.chunk_size, nprobe=args.nprobe)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, allow_nan=False)
+        print(f"\n[OK] Wrote {args.output}")
+    if args.html:
+        write_html(report, args.html)
+        print(f"[OK] Wrote {args.html}")
+
+    overlap = report['agreement']['overlap_at_k']
+    if args.min_overlap is not None and (overlap is None or overlap['mean'] < args.min_overlap):
+        print(f"\n[FAIL] Mean top-{args.k} overlap {_fmt(overlap)} is below {args.min_overlap}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
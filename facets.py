@@ -0,0 +1,230 @@
+"""
+Facet Filters - precomputed bitsets for filtered recommendations
+
+"Similar movies, but only post-2000 dramas" cannot be answered by filtering
+a finished top-5 list: usually nothing survives. Filters are instead turned
+into a boolean mask over the catalog that removes non-matching movies from
+the similarity row *before* top-K selection.
+
+Facets are computed once at build time and stored as packed bitsets (one
+bit per movie, `np.packbits`), one row per facet value:
+
+- `genre=Drama`, `language=en`: one bitset per category value
+- `year<=2009`, `rating<=7.5`: range-encoded numeric facets. There is one
+  bitset per distinct value, with a bit set if the movie's value is at most
+  that value. Any range is then the difference of two bitsets.
+
+A filter expression combines bitsets with byte-wise AND/OR/NOT over N/8
+bytes and is unpacked to a boolean mask once. Masks are cached per
+expression, so a repeated filter costs one `np.where` on the score row,
+the same order of work as scoring it.
+
+Expression syntax (terms are ANDed, values of one term are ORed):
+
+    genre:Drama                    genre:Drama,Comedy      genre:"Science Fiction"
+    language:en                    -genre:Horror           (negation)
+    year>=2000   year<2010         year:1990-1999          year:2009
+    rating>=7
+
+Usage:
+    facets = FacetIndex.from_movies(movies_df)
+    mask = facets.mask('genre:Drama year>=2000 language:en')
+    recommender.query(idx, 10, exclude=idx, mask=mask)
+"""
+
+import re
+import shlex
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+import numpy as np
+
+# Facet name -> (movie column, kind)
+FACET_FIELDS = {
+    'genre': ('genres', 'categorical'),
+    'language': ('original_language', 'categorical'),
+    'year': ('release_date', 'numeric'),
+    'rating': ('vote_average', 'numeric'),
+}
+
+# Movie columns facets are computed from
+FACET_COLUMNS = [column for column, _ in FACET_FIELDS.values()]
+
+# Distinct filter expressions whose masks are kept per model
+MASK_CACHE_SIZE = 256
+
+_TERM = re.compile(r'^(-|!)?([a-z_]+)\s*(>=|<=|>|<|:|=)\s*(.+)$', re.IGNORECASE)
+_RANGE = re.compile(r'^(-?\d+(?:\.\d+)?)\s*-\s*(-?\d+(?:\.\d+)?)$')
+
+
+def _facet_values(movies_df, field):
+    """Per-movie values of a facet: sets of categories, or floats (NaN when unknown)."""
+    column, kind = FACET_FIELDS[field]
+    values = movies_df[column].tolist()
+    if field == 'genre':
+        return [{genre for genre in str(value).split('|') if genre} for value in values]
+    if field == 'year':
+        return [float(str(value)[:4]) if str(value)[:4].isdigit() else np.nan for value in values]
+    if field == 'rating':
+        # A rating of 0 means "no votes yet" on TMDB, not a terrible movie
+        values = np.round(np.asarray(values, dtype=np.float64), 1)
+        return np.where(values > 0, values, np.nan).tolist()
+    return [{str(value)} if value else set() for value in values]
+
+
+def build_facets(movies_df):
+    """
+    Packed facet bitsets of a catalog.
+
+    Returns:
+    --------
+    names : list of str
+        One name per bitset, e.g. 'genre=Drama' or 'year<=2009'.
+    bits : (F, ceil(N / 8)) uint8 array
+        Row f has bit i set if movie i has facet value f.
+    """
+    n_items = len(movies_df)
+    names, rows = [], []
+    for field, (column, kind) in FACET_FIELDS.items():
+        if column not in movies_df:
+            continue
+        values = _facet_values(movies_df, field)
+        if kind == 'categorical':
+            members = {}
+            for idx, categories in enumerate(values):
+                for category in categories:
+                    members.setdefault(category, []).append(idx)
+            for category in sorted(members):
+                mask = np.zeros(n_items, dtype=bool)
+                mask[members[category]] = True
+                names.append(f'{field}={category}')
+                rows.append(np.packbits(mask))
+        else:
+            values = np.asarray(values, dtype=np.float64)
+            known = ~np.isnan(values)
+            for threshold in np.unique(values[known]):
+                names.append(f'{field}<={threshold:g}')
+                rows.append(np.packbits(known & (values <= threshold)))
+    bits = np.array(rows, dtype=np.uint8).reshape(len(rows), (n_items + 7) // 8)
+    return names, bits
+
+
+class FacetIndex:
+    """
+    Facet bitsets of a catalog and the filter expressions over them.
+
+    Parameters:
+    -----------
+    names : list of str
+        Bitset names as returned by build_facets.
+    bits : (F, ceil(N / 8)) uint8 array
+        Packed bitsets, one row per name.
+    n_items : int
+        Number of movies (the bitsets are padded to whole bytes).
+    """
+
+    def __init__(self, names, bits, n_items):
+        self.names = list(names)
+        self.bits = bits
+        self.n_items = n_items
+        self.categories = {}
+        self.thresholds = {}
+        for row, name in enumerate(self.names):
+            if '<=' in name:
+                field, value = name.split('<=', 1)
+                self.thresholds.setdefault(field, ([], []))
+                self.thresholds[field][0].append(float(value))
+                self.thresholds[field][1].append(row)
+            else:
+                field, value = name.split('=', 1)
+                self.categories.setdefault(field, {})[value.casefold()] = row
+        self.mask = lru_cache(maxsize=MASK_CACHE_SIZE)(self._mask)
+
+    @classmethod
+    def from_movies(cls, movies_df):
+        names, bits = build_facets(movies_df)
+        return cls(names, bits, len(movies_df))
+
+    @property
+    def fields(self):
+        return sorted({*self.categories, *self.thresholds})
+
+    def values(self, field):
+        """Category values of a categorical facet, or the (min, max) of a numeric one."""
+        if field in self.thresholds:
+            values = self.thresholds[field][0]
+            return values[0], values[-1]
+        rows = self.categories.get(field, {}).values()
+        return [self.names[row].split('=', 1)[1] for row in sorted(rows)]
+
+    def _none(self):
+        return np.zeros(self.bits.shape[1], dtype=np.uint8)
+
+    def _all(self):
+        return np.full(self.bits.shape[1], 0xFF, dtype=np.uint8)
+
+    def _at_most(self, field, value, inclusive=True):
+        """Packed mask of movies whose `field` is <= value (or < value)."""
+        values, rows = self.thresholds[field]
+        position = (bisect_right if inclusive else bisect_left)(values, value) - 1
+        return self.bits[rows[position]] if position >= 0 else self._none()
+
+    def _known(self, field):
+        return self.bits[self.thresholds[field][1][-1]] if self.thresholds[field][1] else self._none()
+
+    def _numeric(self, field, operator, value):
+        if field not in self.thresholds:
+            return self._none()
+        if operator in (':', '='):
+            match = _RANGE.match(value)
+            low, high = (float(match.group(1)), float(match.group(2))) if match else (float(value),) * 2
+            return self._at_most(field, high) & ~self._at_most(field, low, inclusive=False)
+        value = float(value)
+        if operator == '<=':
+            return self._at_most(field, value)
+        if operator == '<':
+            return self._at_most(field, value, inclusive=False)
+        if operator == '>=':
+            return self._known(field) & ~self._at_most(field, value, inclusive=False)
+        return self._known(field) & ~self._at_most(field, value)
+
+    def _categorical(self, field, operator, value):
+        if operator not in (':', '='):
+            raise ValueError(f"Facet '{field}' only supports ':' (e.g. {field}:value)")
+        packed = self._none()
+        categories = self.categories.get(field, {})
+        for category in value.split(','):
+            row = categories.get(category.strip().casefold())
+            if row is not None:
+                packed |= self.bits[row]
+        return packed
+
+    def packed(self, expression):
+        """Packed (ceil(N / 8),) uint8 mask of the movies matching `expression`."""
+        packed = self._all()
+        for term in shlex.split(expression):
+            match = _TERM.match(term)
+            if match is None:
+                raise ValueError(f"Invalid filter term: {term!r}")
+            negate, field, operator, value = match.groups()
+            field = field.lower()
+            if field not in FACET_FIELDS:
+                raise ValueError(f"Unknown facet '{field}' (expected one of {', '.join(FACET_FIELDS)})")
+            try:
+                if FACET_FIELDS[field][1] == 'numeric':
+                    term_bits = self._numeric(field, operator, value)
+                else:
+                    term_bits = self._categorical(field, operator, value)
+            except ValueError as e:
+                raise ValueError(f"Invalid filter term: {term!r} ({e})") from None
+            packed &= ~term_bits if negate else term_bits
+        return packed
+
+    def _mask(self, expression):
+        mask = np.unpackbits(self.packed(expression), count=self.n_items).view(bool)
+        mask.flags.writeable = False
+        return mask
+
+    def count(self, expression):
+        """Number of movies matching `expression`."""
+        return int(np.count_nonzero(self.mask(expression)))
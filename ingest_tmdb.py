@@ -0,0 +1,293 @@
+"""
+TMDB Catalog Ingestion
+
+Builds the catalog the model builder fits on (`models/movies_dict.pkl`, one
+column per field) from the raw TMDB dumps:
+
+- movies:  id, title, overview, genres, keywords, release_date, ... (one row per movie)
+- credits: movie_id, cast, crew (one row per movie)
+
+Genres, keywords, cast and crew are JSON columns. They are parsed and turned
+into tags the same way the original catalog was built: overview words plus
+genre and keyword names, the top-billed cast and the director, with spaces
+removed from names ("James Cameron" -> "jamescameron") and lowercased.
+The fields are also kept as separate columns (names '|'-separated) for a
+field-weighted build (`build_improved_model.py --fields`).
+
+Both files are streamed in chunks and parsed in parallel, with a bounded
+number of chunks in flight, in input order. Credits are reduced to their few
+cast and director names per movie as they are parsed. Memory therefore holds
+a few raw chunks plus the compact output columns, whatever the size of the
+dumps. The raw cast and crew JSON, which
+dominates the dumps, never stays resident.
+
+Usage:
+    python ingest_tmdb.py --movies tmdb_5000_movies.csv --credits tmdb_5000_credits.csv
+    python ingest_tmdb.py --movies movies.csv --credits credits.csv --jobs 8 --chunk-size 5000
+    python build_improved_model.py
+"""
+
+import argparse
+import ast
+import json
+import os
+import pickle
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain, islice
+
+import pandas as pd
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+DEFAULT_OUTPUT = os.path.join('models', 'movies_dict.pkl')
+
+# Raw rows parsed per task
+CHUNK_SIZE = 2000
+
+# Top-billed cast members that become tags
+CAST_LIMIT = 3
+
+# Columns read from each dump; everything else (budget, homepage, ...) is skipped
+MOVIE_COLUMNS = ['id', 'title', 'overview', 'genres', 'keywords',
+                 'release_date', 'original_language', 'vote_average', 'vote_count']
+CREDIT_COLUMNS = ['movie_id', 'cast', 'crew']
+
+# Catalog columns written, in order
+CATALOG_COLUMNS = ['movie_id', 'title', 'tags', 'genres', 'release_date',
+                   'original_language', 'vote_average', 'vote_count',
+                   'overview', 'keywords', 'cast', 'crew']
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PARSING
+# ─────────────────────────────────────────────────────────────────────────────
+def parse_list(raw):
+    """A JSON list column value; Python-literal dumps and missing values are tolerated."""
+    if not isinstance(raw, str) or not raw:
+        return []
+    try:
+        return json.loads(raw)
+    except ValueError:
+        try:
+            return ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            return []
+
+
+def names(items, limit=None):
+    """Names of parsed JSON entries, in order."""
+    return islice((item['name'] for item in items if item.get('name')), limit)
+
+
+def directors(crew):
+    return (member['name'] for member in crew if member.get('job') == 'Director' and member.get('name'))
+
+
+def squash(name):
+    """Make a multi-word name a single tag: 'Science Fiction' -> 'ScienceFiction'."""
+    return name.replace(' ', '')
+
+
+def credit_names(cast, crew, cast_limit=CAST_LIMIT):
+    """Top-billed cast and directors of one movie, each as a '|'-separated string."""
+    return '|'.join(names(parse_list(cast), cast_limit)), '|'.join(directors(parse_list(crew)))
+
+
+def credit_tokens(cast, crew):
+    """Tag tokens contributed by the credits (as returned by credit_names)."""
+    return ' '.join(squash(name) for name in chain(cast.split('|'), crew.split('|')) if name)
+
+
+def movie_tags(overview, genres, keywords):
+    """Tags from the movies dump: overview words plus squashed genre and keyword names."""
+    overview = overview if isinstance(overview, str) else ''
+    return ' '.join(chain(overview.split(), (squash(name) for name in chain(genres, keywords)))).lower()
+
+
+def read_chunks(path, columns, chunk_size=CHUNK_SIZE, required=()):
+    """Stream a CSV in DataFrame chunks of `columns`; optional columns it lacks come back empty."""
+    available = set(pd.read_csv(path, nrows=0).columns)
+    missing = set(required) - available
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(sorted(missing))}")
+    chunks = pd.read_csv(path, usecols=[c for c in columns if c in available], chunksize=chunk_size,
+                         dtype=str, keep_default_na=False)
+    for chunk in chunks:
+        yield chunk.reindex(columns=columns, fill_value='')
+
+
+def _number(value, cast):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return cast(0)
+
+
+def parse_credits_chunk(rows, cast_limit=CAST_LIMIT):
+    """(movie_id, (cast, crew)) pairs of one credits chunk."""
+    return [(_number(movie_id, int), credit_names(cast, crew, cast_limit))
+            for movie_id, cast, crew in rows]
+
+
+def parse_movies_chunk(rows):
+    """Catalog rows (without cast and crew) of one movies chunk; rows without an id or title are dropped."""
+    parsed = []
+    for movie_id, title, overview, genres, keywords, release_date, language, vote_average, vote_count in rows:
+        movie_id = _number(movie_id, int)
+        if not movie_id or not title:
+            continue
+        genre_names = list(names(parse_list(genres)))
+        keyword_names = list(names(parse_list(keywords)))
+        parsed.append((
+            movie_id,
+            title,
+            movie_tags(overview, genre_names, keyword_names),
+            '|'.join(genre_names),
+            release_date,
+            language,
+            _number(vote_average, float),
+            _number(vote_count, int),
+            overview if isinstance(overview, str) else '',
+            '|'.join(keyword_names),
+        ))
+    return parsed
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PARALLEL STREAMING
+# ─────────────────────────────────────────────────────────────────────────────
+def row_chunks(path, columns, chunk_size, required=()):
+    """Chunks of a CSV as lists of plain tuples (cheap to send to a worker)."""
+    for chunk in read_chunks(path, columns, chunk_size, required):
+        yield list(chunk.itertuples(index=False, name=None))
+
+
+def ordered_map(fn, chunks, pool=None, max_pending=1):
+    """Map `fn` over a lazy iterable of chunks, in order, with at most `max_pending` in flight."""
+    if pool is None:
+        yield from map(fn, chunks)
+        return
+    pending = deque()
+    for chunk in chunks:
+        pending.append(pool.submit(fn, chunk))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def ingest(movies_path, credits_path=None, chunk_size=CHUNK_SIZE, n_jobs=None, cast_limit=CAST_LIMIT):
+    """
+    Parse the raw TMDB dumps into catalog columns.
+
+    Both dumps are parsed chunk by chunk across a process pool. Credits are
+    reduced to the cast and director names and joined to the matching movie
+    at the end, so workers never need the other file.
+
+    Parameters:
+    -----------
+    credits_path : str, optional
+        Credits dump; without it, tags come from the movies dump alone.
+    chunk_size : int
+        Raw rows parsed per task.
+    n_jobs : int, optional
+        Worker processes. Defaults to the CPU count; 1 parses in-process.
+
+    Returns:
+    --------
+    dict of column name -> list, in input order; duplicate movie ids keep
+    their first row.
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else None
+    max_pending = 2 * n_jobs
+    credits = {}
+    columns = {name: [] for name in CATALOG_COLUMNS}
+    seen = set()
+    try:
+        if credits_path:
+            chunks = row_chunks(credits_path, CREDIT_COLUMNS, chunk_size, required=CREDIT_COLUMNS)
+            for parsed in ordered_map(partial(parse_credits_chunk, cast_limit=cast_limit), chunks,
+                                      pool, max_pending):
+                credits.update(parsed)
+            print(f"    Credits: {len(credits):,} movies")
+
+        chunks = row_chunks(movies_path, MOVIE_COLUMNS, chunk_size, required=('id', 'title'))
+        for parsed in ordered_map(parse_movies_chunk, chunks, pool, max_pending):
+            for row in parsed:
+                if row[0] in seen:
+                    continue
+                seen.add(row[0])
+                for column, value in zip(columns.values(), row):
+                    column.append(value)
+            print(f"    Parsed {len(seen):,} movies", end='\r')
+        print()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    people = [credits.get(movie_id, ('', '')) for movie_id in columns['movie_id']]
+    columns['cast'] = [cast for cast, _ in people]
+    columns['crew'] = [crew for _, crew in people]
+    if credits:
+        columns['tags'] = [' '.join(filter(None, (tags, credit_tokens(cast, crew).lower())))
+                           for tags, (cast, crew) in zip(columns['tags'], people)]
+    return columns
+
+
+def write_catalog(columns, path=DEFAULT_OUTPUT):
+    """Write the catalog as the column dict `build_improved_model.py` loads (atomically)."""
+    catalog = {name: dict(enumerate(values)) for name, values in columns.items()}
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(catalog, f)
+    os.replace(path + '.tmp', path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the movie catalog from raw TMDB dumps.")
+    parser.add_argument('--movies', required=True,
+                        help="TMDB movies CSV (id, title, overview, genres, keywords, ...)")
+    parser.add_argument('--credits',
+                        help="TMDB credits CSV (movie_id, cast, crew)")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help=f"catalog to write (default: {DEFAULT_OUTPUT})")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f"raw rows parsed per task (default: {CHUNK_SIZE})")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--cast-limit', type=int, default=CAST_LIMIT,
+                        help=f"top-billed cast members used as tags (default: {CAST_LIMIT})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("TMDB CATALOG INGESTION")
+    print("=" * 60)
+
+    print(f"\n[*] Streaming {args.movies}" + (f" and {args.credits}" if args.credits else "") + "...")
+    columns = ingest(args.movies, args.credits, chunk_size=args.chunk_size,
+                     n_jobs=args.jobs, cast_limit=args.cast_limit)
+    if not columns['movie_id']:
+        print("\n[FAIL] No movies found.")
+        sys.exit(1)
+
+    empty = sum(not tags for tags in columns['tags'])
+    if empty:
+        print(f"[WARN] {empty:,} movies have no tags")
+
+    write_catalog(columns, args.output)
+    print(f"\n[OK] Wrote {len(columns['movie_id']):,} movies to {args.output}")
+    print("     Rebuild the model with: python build_improved_model.py")
+
+
+if __name__ == '__main__':
+    main()
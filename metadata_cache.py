@@ -0,0 +1,245 @@
+"""
+Persistent TMDB Metadata Cache
+
+A key-value cache for TMDB payloads that survives redeploys and is shared by
+every process on a host, so a warm restart serves posters without a single
+network call.
+
+Backends share one small interface (`get`, `set`, `delete`, `stats`):
+
+- SQLiteCache  - default; one file (WAL mode) safe for concurrent processes
+- MemoryCache  - in-process only, useful for tests and single-process runs
+- RedisCache   - any Redis-protocol server (optional `redis` package)
+
+All backends support a TTL and size-bounded LRU eviction, count
+hits/misses, and store values as JSON (never pickle).
+
+Usage:
+    cache = create_cache('sqlite:///models/tmdb_cache.sqlite3', ttl=86400)
+    cache = create_cache('redis://localhost:6379/0')
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+DEFAULT_CACHE_URL = 'sqlite:///' + os.path.join('models', 'tmdb_cache.sqlite3')
+DEFAULT_TTL = 86400  # 24 hours
+DEFAULT_MAX_ENTRIES = 100_000
+
+
+class CacheBackend:
+    """Interface of a metadata cache backend."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or an expired entry."""
+        raise NotImplementedError
+
+    def set(self, key, value):
+        """Store a JSON-serializable value under `key`."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def _count(self, value):
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        metrics.inc('cache_requests_total', cache='tmdb_persistent', result='miss' if value is None else 'hit')
+        return value
+
+    def stats(self):
+        """Hit/miss/eviction counters of this process, plus the current size."""
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self).__name__,
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        pass
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache with TTL."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        super().__init__(ttl, max_entries)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self._data[key]
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+            return self._count(None if entry is None else json.loads(entry[1]))
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, json.dumps(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Disk-backed cache in a single SQLite file.
+
+    WAL journaling lets several app processes read and write the same file
+    concurrently. Each hit refreshes the entry's access time; once the table
+    grows past `max_entries`, the least recently used ~10% are evicted in one
+    statement, so eviction cost is amortized over many inserts.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        super().__init__(ttl, max_entries)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' expires_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)')
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return self._count(None)
+            if row[1] < now:
+                self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                return self._count(None)
+            self._conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+        return self._count(json.loads(row[0]))
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            self._evict()
+
+    def _evict(self):
+        count = 'SELECT COUNT(*) FROM entries'
+        if self._conn.execute(count).fetchone()[0] <= self.max_entries:
+            return
+        self._conn.execute('DELETE FROM entries WHERE expires_at < ?', (time.time(),))
+        size = self._conn.execute(count).fetchone()[0]
+        if size <= self.max_entries:
+            return
+        excess = size - self.max_entries + self.max_entries // 10
+        cursor = self._conn.execute(
+            'DELETE FROM entries WHERE key IN '
+            '(SELECT key FROM entries ORDER BY accessed_at LIMIT ?)', (excess,)
+        )
+        self.evictions += cursor.rowcount
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache on a Redis-protocol server.
+
+    TTL maps to Redis key expiry; size-bounded LRU eviction is left to the
+    server's `maxmemory-policy allkeys-lru`.
+    """
+
+    def __init__(self, url, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, prefix='cinematch:'):
+        super().__init__(ttl, max_entries)
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("RedisCache needs the redis package: pip install redis") from e
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return self._count(None if raw is None else json.loads(raw))
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, json.dumps(value), ex=int(self.ttl))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + '*'))
+
+    def close(self):
+        self._client.close()
+
+
+def create_cache(url=DEFAULT_CACHE_URL, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    Create a cache backend from a URL.
+
+    - `sqlite:///relative/path.sqlite3` or `sqlite:////absolute/path.sqlite3`
+    - `memory://`
+    - `redis://host:port/db`
+    """
+    if url.startswith('sqlite:///'):
+        return SQLiteCache(url[len('sqlite:///'):], ttl=ttl, max_entries=max_entries)
+    if url.startswith('memory://'):
+        return MemoryCache(ttl=ttl, max_entries=max_entries)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url, ttl=ttl, max_entries=max_entries)
+    raise ValueError(f"Unsupported cache URL: {url}")
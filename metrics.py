@@ -0,0 +1,199 @@
+"""
+Hot-Path Instrumentation
+
+Timing spans and counters for the stages a recommendation passes through
+(model load, ranking, TMDB calls, rendering), plus cache and TMDB error
+counters, with two ways out:
+
+- `render_prometheus()`: Prometheus text exposition format, served by the
+  API at /metrics or by `start_http_server(port)` next to the Streamlit app
+- `start_log_reporter(interval)`: one structured JSON log line every
+  `interval` seconds
+
+Metrics are off by default. While disabled, `span()` returns a shared no-op
+context manager and `inc()` returns after one flag check, so instrumented
+code pays next to nothing.
+
+Usage:
+    metrics.configure(enabled=True)
+    with metrics.span('rank'):
+        ...
+    metrics.inc('tmdb_errors_total', kind='timeout')
+"""
+
+import bisect
+import contextlib
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = 'cinematch_'
+
+# Upper bounds (seconds) of the span histogram buckets
+SPAN_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NOOP = contextlib.nullcontext()
+
+_enabled = False
+_lock = threading.Lock()
+_counters = {}
+_spans = {}
+
+
+def configure(enabled=True):
+    """Turn collection on or off (existing values are kept)."""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _spans.clear()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """Add `value` to a counter."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+class _Span:
+    """Histogram of one span's durations: bucket counts, count, sum and max."""
+
+    __slots__ = ('buckets', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.buckets = [0] * (len(SPAN_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(SPAN_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+def observe(name, seconds, **labels):
+    """Record one duration of span `name`."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        span_ = _spans.get(key)
+        if span_ is None:
+            span_ = _spans[key] = _Span()
+        span_.observe(seconds)
+
+
+@contextlib.contextmanager
+def _timing(name, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def span(name, **labels):
+    """Time a block: `with span('rank'): ...` (a shared no-op while disabled)."""
+    if not _enabled:
+        return _NOOP
+    return _timing(name, labels)
+
+
+def snapshot():
+    """Counters and span summaries as plain data."""
+    with _lock:
+        counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(_counters.items())]
+        spans = [{'name': name, 'labels': dict(labels), 'count': s.count,
+                  'sum': round(s.total, 6), 'max': round(s.max, 6)}
+                 for (name, labels), s in sorted(_spans.items())]
+    return {'counters': counters, 'spans': spans}
+
+
+def _labels_text(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+               for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        counters = sorted(_counters.items())
+        spans = sorted((key, (list(s.buckets), s.count, s.total)) for key, s in _spans.items())
+
+    lines = []
+    for name in sorted({name for (name, _), _ in counters}):
+        lines.append(f'# TYPE {PREFIX}{name} counter')
+        lines.extend(f'{PREFIX}{name}{_labels_text(labels)} {value}'
+                     for (counter, labels), value in counters if counter == name)
+
+    if spans:
+        metric = f'{PREFIX}span_seconds'
+        lines.append(f'# TYPE {metric} histogram')
+        for (name, labels), (buckets, count, total) in spans:
+            labels = (('span', name), *labels)
+            cumulative = 0
+            for bound, bucket in zip((*SPAN_BUCKETS, '+Inf'), buckets):
+                cumulative += bucket
+                lines.append(f'{metric}_bucket{_labels_text(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{metric}_sum{_labels_text(labels)} {total}')
+            lines.append(f'{metric}_count{_labels_text(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def start_log_reporter(interval=60.0, stream=None):
+    """Print one JSON line with all metrics every `interval` seconds (daemon thread)."""
+    def report():
+        while True:
+            time.sleep(interval)
+            line = {'event': 'metrics', 'ts': round(time.time(), 3), **snapshot()}
+            print(json.dumps(line), file=stream or sys.stderr, flush=True)
+
+    thread = threading.Thread(target=report, name='metrics-reporter', daemon=True)
+    thread.start()
+    return thread
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host='0.0.0.0'):
+    """Serve GET /metrics on `port` from a daemon thread (for processes without their own server)."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
@@ -0,0 +1,705 @@
+"""
+Model Store - versioned, memory-mapped model artifacts
+
+The model is written as a directory of plain `.npy` arrays plus a small JSON
+manifest instead of pickles:
+
+    models/store/
+    ├── manifest.json              # format version, shapes, dtypes, columns
+    ├── neighbors.indices.npy      # (N, K) int32 neighbor ids
+    ├── neighbors.scores.npy       # (N, K) float32/float16 scores, or uint8 codes...
+    ├── neighbors.scale.npy        # ...with a float32 scale per row
+    ├── tfidf.data.npy             # CSR parts of the L2-normalized TF-IDF matrix
+    ├── tfidf.indices.npy
+    ├── tfidf.indptr.npy
+    ├── tfidf.field_norms.npy      # field-weighted models: squared norm of each field block per
+                                   # movie (the manifest's `fields` give the block columns)
+    ├── tfidf.vocabulary.*.npy     # fitted vocabulary (term order) and IDF weights,
+    ├── tfidf.idf.npy              # for transforming new movies without a refit
+    ├── ann.*.npy                  # optional IVF index over SVD embeddings (+ SVD components)
+    └── movies.<column>.npy        # columnar movie metadata
+
+Strings are stored Arrow-style as one UTF-8 byte buffer plus an int64
+offsets array (`movies.title.data.npy` / `movies.title.offsets.npy`).
+
+Everything is loaded with `np.load(mmap_mode='r', allow_pickle=False)`:
+several app/server processes on one host share the same page-cache pages,
+startup does not copy the arrays into each heap, and loading a downloaded
+model can never execute code the way unpickling can.
+
+Versions
+--------
+Builders never modify a served model in place. Each build is written to
+its own immutable directory under `<model root>.versions/`, with the
+SHA-256 of every array recorded in the manifest, and published by
+atomically replacing the `models/store` symlink:
+
+    models/store -> store.versions/20240101T120000Z-3f2a9c1b
+    models/store.versions/
+    ├── 20231231T120000Z-9b8e7d6c/      # previous versions, pruned to KEEP_VERSIONS
+    └── 20240101T120000Z-3f2a9c1b/
+
+A reader opening `models/store` sees either the old or the new version,
+never a mix. `ModelWatcher` notices a publish and hot-swaps the new version
+into a running server; the old one is released once no request uses it.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import metrics
+from facets import FACET_COLUMNS, FacetIndex, build_facets
+from recommender import (ANN_DEFAULT_NPROBE, ANN_MIN_ITEMS, AnnIndex, NeighborIndex, SparseSimilarity, field_norms,
+                         field_scale)
+from title_index import TitleIndex, release_years
+
+FORMAT_NAME = 'cinematch-model'
+FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+DEFAULT_MODEL_DIR = os.path.join('models', 'store')
+
+# Published versions kept on disk (the current one included) for rollback
+KEEP_VERSIONS = 3
+
+# Seconds between checks of a ModelWatcher for a newly published version
+DEFAULT_CHECK_INTERVAL = 5.0
+
+# Field weightings whose re-weighted backends are kept per model
+FIELD_WEIGHTS_CACHE_SIZE = 32
+
+
+class ModelStoreError(Exception):
+    """Raised when a model directory is missing pieces or has an unknown format."""
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# WRITING
+# ─────────────────────────────────────────────────────────────────────────────
+class _HashingWriter:
+    """File wrapper that hashes everything written through it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.f.write(data)
+
+
+def _save_array(model_dir, name, array, entries):
+    """Save one array as `<name>.npy` and record it (with its checksum) in the manifest entries."""
+    array = np.ascontiguousarray(array)
+    filename = f'{name}.npy'
+    path = os.path.join(model_dir, filename)
+    # Write aside and rename, so a reader that has the old file mapped keeps a consistent copy
+    with open(path + '.tmp', 'wb') as f:
+        writer = _HashingWriter(f)
+        np.save(writer, array, allow_pickle=False)
+    os.replace(path + '.tmp', path)
+    entries[name] = {
+        'file': filename,
+        'dtype': array.dtype.str,
+        'shape': list(array.shape),
+        'sha256': writer.sha256.hexdigest(),
+    }
+
+
+def file_checksum(path):
+    """SHA-256 of a file, read in chunks."""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def encode_strings(values):
+    """Encode a sequence of strings into (UTF-8 byte buffer, int64 offsets)."""
+    encoded = [str(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return data, offsets
+
+
+def decode_strings(data, offsets):
+    """Decode an Arrow-style (byte buffer, offsets) pair back into a list of str."""
+    raw = memoryview(np.asarray(data))
+    bounds = np.asarray(offsets).tolist()
+    return [bytes(raw[start:stop]).decode('utf-8') for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def _save_columns(model_dir, df, arrays, columns):
+    """Save DataFrame columns: numeric as plain arrays, the rest as UTF-8 strings."""
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if values.dtype.kind in 'biuf':
+            _save_array(model_dir, f'movies.{column}', values, arrays)
+            columns[column] = {'kind': 'numeric', 'array': f'movies.{column}'}
+        else:
+            data, offsets = encode_strings(values)
+            _save_array(model_dir, f'movies.{column}.data', data, arrays)
+            _save_array(model_dir, f'movies.{column}.offsets', offsets, arrays)
+            columns[column] = {
+                'kind': 'string',
+                'data': f'movies.{column}.data',
+                'offsets': f'movies.{column}.offsets',
+            }
+
+
+def _save_facets(model_dir, movies_df, manifest):
+    """Precompute the facet bitsets of a catalog, if it has any facet columns."""
+    if not any(column in movies_df for column in FACET_COLUMNS):
+        return
+    names, bits = build_facets(movies_df)
+    _save_array(model_dir, 'facets.bits', bits, manifest['arrays'])
+    manifest['facets'] = names
+
+
+def _write_manifest(model_dir, manifest):
+    """Atomically replace the manifest of a model directory."""
+    manifest_path = os.path.join(model_dir, MANIFEST_FILE)
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+# TfidfVectorizer parameters recorded with the vocabulary to rebuild the same transform
+VECTORIZER_PARAMS = ('ngram_range', 'stop_words', 'sublinear_tf', 'lowercase', 'norm', 'use_idf', 'smooth_idf')
+
+
+def write_model(model_dir, movies_df, neighbors=None, tfidf_matrix=None, ann=None, metadata=None,
+                vectorizer=None, fields=None):
+    """
+    Write a model directory.
+
+    Parameters:
+    -----------
+    model_dir : str
+        Output directory (created if needed, files are overwritten).
+    movies_df : DataFrame
+        Movie metadata; every column is stored. Numeric columns become
+        plain arrays, everything else is stored as UTF-8 strings.
+    neighbors : (indices, scores) or (indices, codes, scale), optional
+        Top-K neighbor index; 8-bit codes come with a per-row scale.
+    tfidf_matrix : sparse matrix, optional
+        TF-IDF matrix; rows are L2-normalized before saving.
+    ann : dict, optional
+        IVF index arrays: embeddings, centroids, list_offsets, list_items,
+        and optionally the SVD `components` that embed new movies.
+    metadata : dict, optional
+        Free-form build information recorded in the manifest.
+    vectorizer : fitted TfidfVectorizer, optional
+        Its vocabulary, IDF weights and parameters are stored so new movies
+        can later be transformed without refitting (see `Model.vectorizer`).
+    fields : list of dict, optional
+        For a field-weighted TF-IDF matrix: `name`, column range `start`/`stop`
+        and build `weight` of each field block, so the fields can be
+        re-weighted at query time (see `Model.sparse_similarity`).
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    arrays = {}
+    columns = {}
+    _save_columns(model_dir, movies_df, arrays, columns)
+
+    if neighbors is not None:
+        indices, scores = neighbors[:2]
+        _save_array(model_dir, 'neighbors.indices', np.asarray(indices, dtype=np.int32), arrays)
+        _save_array(model_dir, 'neighbors.scores', scores, arrays)
+        if len(neighbors) > 2:
+            _save_array(model_dir, 'neighbors.scale', np.asarray(neighbors[2], dtype=np.float32), arrays)
+
+    if tfidf_matrix is not None:
+        from sklearn.preprocessing import normalize
+        matrix = normalize(sparse.csr_matrix(tfidf_matrix, dtype=np.float32), norm='l2')
+        matrix.sort_indices()
+        _save_array(model_dir, 'tfidf.data', matrix.data, arrays)
+        _save_array(model_dir, 'tfidf.indices', matrix.indices.astype(np.int32), arrays)
+        _save_array(model_dir, 'tfidf.indptr', matrix.indptr.astype(np.int64), arrays)
+        if fields is not None:
+            _save_array(model_dir, 'tfidf.field_norms', field_norms(matrix, fields), arrays)
+
+    if ann is not None:
+        for name in ('embeddings', 'centroids', 'list_offsets', 'list_items', 'components'):
+            if name in ann:
+                _save_array(model_dir, f'ann.{name}', ann[name], arrays)
+
+    vectorizer_params = None
+    if vectorizer is not None:
+        terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+        data, offsets = encode_strings(terms)
+        _save_array(model_dir, 'tfidf.vocabulary.data', data, arrays)
+        _save_array(model_dir, 'tfidf.vocabulary.offsets', offsets, arrays)
+        _save_array(model_dir, 'tfidf.idf', np.asarray(vectorizer.idf_, dtype=np.float64), arrays)
+        params = vectorizer.get_params()
+        vectorizer_params = {name: params[name] for name in VECTORIZER_PARAMS}
+        vectorizer_params['ngram_range'] = list(vectorizer_params['ngram_range'])
+
+    manifest = {
+        'format': FORMAT_NAME,
+        'format_version': FORMAT_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'n_items': int(len(movies_df)),
+        'columns': columns,
+        'arrays': arrays,
+        'metadata': metadata or {},
+    }
+    if tfidf_matrix is not None:
+        manifest['tfidf_shape'] = list(tfidf_matrix.shape)
+    if vectorizer_params is not None:
+        manifest['vectorizer'] = vectorizer_params
+    if fields is not None:
+        manifest['fields'] = fields
+    _save_facets(model_dir, movies_df, manifest)
+
+    # Manifest goes last: a directory without one is never considered complete
+    _write_manifest(model_dir, manifest)
+    return manifest
+
+
+def add_columns(model_dir, columns_df):
+    """
+    Add (or replace) movie metadata columns of a model, as a new version.
+
+    `columns_df` must have one row per movie, in catalog order. Used to
+    enrich a built model with display fields such as poster paths. Facet
+    bitsets are rebuilt when facet columns change.
+    """
+    manifest = read_manifest(model_dir)
+    if len(columns_df) != manifest['n_items']:
+        raise ModelStoreError(
+            f"Expected {manifest['n_items']} rows, got {len(columns_df)}"
+        )
+    with new_version(model_dir, base=True) as version_dir:
+        _save_columns(version_dir, columns_df, manifest['arrays'], manifest['columns'])
+        _write_manifest(version_dir, manifest)
+        if any(column in columns_df for column in FACET_COLUMNS):
+            _save_facets(version_dir, load_model(version_dir).movies, manifest)
+            _write_manifest(version_dir, manifest)
+    return manifest
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# VERSIONS
+# ─────────────────────────────────────────────────────────────────────────────
+def versions_dir(model_root):
+    """Directory holding the published versions of a model root."""
+    return os.path.normpath(model_root) + '.versions'
+
+
+def current_version(model_root):
+    """Resolved directory of the version a model root currently points to."""
+    return os.path.realpath(model_root)
+
+
+def _new_version_id():
+    return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ') + '-' + os.urandom(4).hex()
+
+
+def _link(model_root, version_dir):
+    """Point the `model_root` symlink at `version_dir` with one atomic rename."""
+    link = model_root + '.tmp-link'
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.relpath(version_dir, os.path.dirname(os.path.abspath(model_root))), link)
+    os.replace(link, model_root)
+
+
+def _adopt_unversioned(model_root):
+    """Move a pre-versioning model directory into the versions directory, as its oldest version."""
+    if os.path.isdir(model_root) and not os.path.islink(model_root):
+        version_dir = os.path.join(versions_dir(model_root), _new_version_id())
+        os.makedirs(versions_dir(model_root), exist_ok=True)
+        os.replace(model_root, version_dir)
+        _link(model_root, version_dir)
+
+
+def publish(model_root, version_dir, keep=KEEP_VERSIONS):
+    """
+    Atomically point `model_root` at a complete version directory.
+
+    The symlink is created aside and renamed over the old one, so readers
+    resolve either the previous or the new version. Old versions beyond
+    `keep` are deleted; processes that still have their files mapped keep
+    reading them until they let go.
+    """
+    read_manifest(version_dir)  # refuse to publish an incomplete directory
+    _adopt_unversioned(model_root)
+    _link(model_root, version_dir)
+    prune_versions(model_root, keep)
+
+
+def prune_versions(model_root, keep=KEEP_VERSIONS):
+    """Delete all but the `keep` newest versions (never the current one)."""
+    root = versions_dir(model_root)
+    current = current_version(model_root)
+    names = sorted(os.listdir(root), reverse=True) if os.path.isdir(root) else []
+    for name in names[keep:]:
+        path = os.path.join(root, name)
+        if os.path.realpath(path) != current:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+@contextmanager
+def new_version(model_root=DEFAULT_MODEL_DIR, base=False, keep=KEEP_VERSIONS):
+    """
+    Stage a new model version and publish it when the block succeeds.
+
+    Yields an empty directory to write the version into; with `base=True`
+    it starts as a copy of the current version (files are hard-linked, and
+    writers replace rather than modify them, so the published version is
+    never touched). If the block raises, the staged directory is removed
+    and the current version stays published.
+
+        with new_version(model_dir) as version_dir:
+            write_model(version_dir, movies_df, neighbors=neighbors)
+    """
+    _adopt_unversioned(model_root)
+    root = versions_dir(model_root)
+    os.makedirs(root, exist_ok=True)
+    version_dir = os.path.join(root, _new_version_id())
+    os.makedirs(version_dir)
+    try:
+        if base:
+            source = current_version(model_root)
+            for name in os.listdir(source):
+                try:
+                    os.link(os.path.join(source, name), os.path.join(version_dir, name))
+                except OSError:
+                    shutil.copy2(os.path.join(source, name), os.path.join(version_dir, name))
+        yield version_dir
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+    publish(model_root, version_dir, keep)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# READING
+# ─────────────────────────────────────────────────────────────────────────────
+def read_manifest(model_dir):
+    """Read and validate a model manifest."""
+    with open(os.path.join(model_dir, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_NAME:
+        raise ModelStoreError(f"{model_dir} is not a {FORMAT_NAME} directory")
+    if manifest.get('format_version', 0) > FORMAT_VERSION:
+        raise ModelStoreError(
+            f"Model format v{manifest['format_version']} is newer than supported v{FORMAT_VERSION}"
+        )
+    return manifest
+
+
+class Model:
+    """A loaded model directory; arrays are memory-mapped read-only."""
+
+    def __init__(self, model_dir, manifest, arrays):
+        self.model_dir = model_dir
+        self.manifest = manifest
+        self.arrays = arrays
+        self._movies = None
+        self._title_index = None
+        self._facets = None
+        self._backends = {}
+        self._field_backends = lru_cache(maxsize=FIELD_WEIGHTS_CACHE_SIZE)(self._field_similarity)
+
+    @property
+    def n_items(self):
+        return self.manifest['n_items']
+
+    def close(self):
+        """Drop the mapped arrays and everything derived from them."""
+        self.arrays = {}
+        self._movies = None
+        self._title_index = None
+        self._facets = None
+        self._backends = {}
+        self._field_backends.cache_clear()
+
+    def has(self, name):
+        return name in self.arrays
+
+    @property
+    def movies(self):
+        """Movie metadata as a DataFrame (string columns are decoded once)."""
+        if self._movies is None:
+            data = {}
+            for column, spec in self.manifest['columns'].items():
+                if spec['kind'] == 'numeric':
+                    data[column] = self.arrays[spec['array']]
+                else:
+                    data[column] = decode_strings(self.arrays[spec['data']],
+                                                  self.arrays[spec['offsets']])
+            self._movies = pd.DataFrame(data)
+        return self._movies
+
+    def title_index(self):
+        """Exact and fuzzy title lookup over the catalog, built on first use."""
+        if self._title_index is None:
+            movies = self.movies
+            self._title_index = TitleIndex(movies['title'], movies['movie_id'], release_years(movies))
+        return self._title_index
+
+    def facet_index(self):
+        """Facet bitsets for filtered recommendations, or None if the model has none."""
+        if self._facets is None and self.has('facets.bits'):
+            self._facets = FacetIndex(self.manifest['facets'], self.arrays['facets.bits'], self.n_items)
+        return self._facets
+
+    def neighbor_index(self):
+        """The top-K neighbor index, or None if the model has none."""
+        if not self.has('neighbors.indices'):
+            return None
+        return NeighborIndex(self.arrays['neighbors.indices'], self.arrays['neighbors.scores'],
+                             self.arrays.get('neighbors.scale'), exact=self.sparse_similarity())
+
+    def tfidf_matrix(self):
+        """The L2-normalized TF-IDF matrix as CSR over the mapped arrays, or None."""
+        if not self.has('tfidf.data'):
+            return None
+        return sparse.csr_matrix(
+            (self.arrays['tfidf.data'], self.arrays['tfidf.indices'], self.arrays['tfidf.indptr']),
+            shape=tuple(self.manifest['tfidf_shape']),
+        )
+
+    def vectorizer(self):
+        """
+        The fitted TfidfVectorizer rebuilt from the stored vocabulary and IDF
+        weights, or None if the model was written without them.
+        """
+        if not self.has('tfidf.idf'):
+            return None
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        params = dict(self.manifest['vectorizer'])
+        params['ngram_range'] = tuple(params['ngram_range'])
+        terms = decode_strings(self.arrays['tfidf.vocabulary.data'], self.arrays['tfidf.vocabulary.offsets'])
+        vectorizer = TfidfVectorizer(vocabulary={term: i for i, term in enumerate(terms)}, **params)
+        vectorizer.idf_ = np.asarray(self.arrays['tfidf.idf'])
+        return vectorizer
+
+    @property
+    def fields(self):
+        """Field blocks of a field-weighted TF-IDF matrix (name, start, stop, weight), or None."""
+        return self.manifest.get('fields')
+
+    def sparse_similarity(self, field_weights=None):
+        """
+        On-demand sparse similarity backend, or None if the model has no TF-IDF matrix.
+
+        `field_weights` ({field: weight}) re-weights the fields of a
+        field-weighted model at query time; other models reject it. The
+        backends of recent weightings are cached.
+        """
+        if field_weights:
+            return self._field_backends(tuple(sorted(field_weights.items())))
+        matrix = self.tfidf_matrix()
+        return SparseSimilarity(matrix) if matrix is not None else None
+
+    def _field_similarity(self, field_weights):
+        if not self.fields:
+            raise ValueError("This model was not built with per-field weights")
+        matrix = self.tfidf_matrix()
+        if matrix is None:
+            return None
+        column_scale, row_scale = field_scale(self.fields, dict(field_weights), self.arrays['tfidf.field_norms'])
+        return SparseSimilarity(matrix, column_scale=column_scale, row_scale=row_scale)
+
+    def ann_index(self, nprobe=ANN_DEFAULT_NPROBE):
+        """Approximate nearest-neighbor backend, or None if the model has no IVF index."""
+        if not self.has('ann.embeddings'):
+            return None
+        return AnnIndex(
+            self.arrays['ann.embeddings'],
+            self.arrays['ann.centroids'],
+            self.arrays['ann.list_offsets'],
+            self.arrays['ann.list_items'],
+            nprobe=nprobe,
+            exact=self.sparse_similarity(),
+        )
+
+    def recommender(self, backend='neighbors', nprobe=ANN_DEFAULT_NPROBE, ann_min_items=ANN_MIN_ITEMS,
+                    field_weights=None):
+        """
+        Serving backend by name: `neighbors`, `sparse` or `ann`.
+
+        `ann` falls back to exact search for catalogs smaller than
+        `ann_min_items` or models built without an ANN index. Backends are
+        cached on the model, so they are released together with it.
+
+        Field weights other than the build weights are served by the sparse
+        backend with re-weighted queries, whatever `backend` is: the stored
+        neighbor lists and ANN embeddings only know the build weights.
+        """
+        if field_weights:
+            weighted = self.sparse_similarity(field_weights)
+            if weighted is None or weighted.column_scale is not None:
+                return weighted
+        key = (backend, nprobe, ann_min_items)
+        if key not in self._backends:
+            self._backends[key] = self._recommender(backend, nprobe, ann_min_items)
+        return self._backends[key]
+
+    def _recommender(self, backend, nprobe, ann_min_items):
+        if backend == 'ann':
+            if self.n_items >= ann_min_items and self.has('ann.embeddings'):
+                return self.ann_index(nprobe=nprobe)
+            return self.neighbor_index() or self.sparse_similarity()
+        if backend == 'sparse':
+            return self.sparse_similarity()
+        if backend == 'neighbors':
+            return self.neighbor_index()
+        raise ValueError(f"Unknown backend: {backend}")
+
+
+def load_model(model_dir=DEFAULT_MODEL_DIR, mmap=True):
+    """
+    Load a model directory without unpickling anything.
+
+    Raises FileNotFoundError if the directory has no manifest and
+    ModelStoreError if an array does not match its manifest entry.
+    """
+    manifest = read_manifest(model_dir)
+    mmap_mode = 'r' if mmap else None
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        array = np.load(os.path.join(model_dir, entry['file']),
+                        mmap_mode=mmap_mode, allow_pickle=False)
+        if list(array.shape) != entry['shape'] or array.dtype.str != entry['dtype']:
+            raise ModelStoreError(f"{entry['file']} does not match the manifest")
+        arrays[name] = array
+    return Model(model_dir, manifest, arrays)
+
+
+def verify_model(model_dir=DEFAULT_MODEL_DIR):
+    """Return a list of problems with a model directory (empty if it is valid)."""
+    try:
+        model = load_model(model_dir)
+    except FileNotFoundError as e:
+        return [f"Missing: {e.filename}"]
+    except (ModelStoreError, ValueError, KeyError) as e:
+        return [str(e)]
+    return [
+        f"Checksum mismatch: {entry['file']}"
+        for entry in model.manifest['arrays'].values()
+        if 'sha256' in entry and file_checksum(os.path.join(model_dir, entry['file'])) != entry['sha256']
+    ]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# HOT SWAP
+# ─────────────────────────────────────────────────────────────────────────────
+class _Loaded:
+    """One loaded version and the number of requests currently using it."""
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.refs = 0
+        self.retired = False
+
+
+class ModelWatcher:
+    """
+    Serve the currently published version of a model root, swapping in new
+    versions under live traffic.
+
+    Every request holds a `lease` on the version it started with, so it
+    sees one consistent model even if a swap happens meanwhile. At most
+    every `check_interval` seconds a request checks whether the root points
+    to a new version (or, for an unversioned directory, whether its
+    manifest was replaced) and loads it; later requests get the new
+    version. The old version is released (and its arrays unmapped) as soon
+    as its last lease ends. If a new version fails to load, the current one
+    keeps serving and the load is retried at the next check.
+
+    Parameters:
+    -----------
+    loader : callable
+        Turns a version directory into the served object (default:
+        load_model). If that object has a `close` method, it is called on
+        release.
+    """
+
+    def __init__(self, model_root=DEFAULT_MODEL_DIR, check_interval=DEFAULT_CHECK_INTERVAL, loader=None):
+        self.model_root = model_root
+        self.check_interval = check_interval
+        self.loader = loader or load_model
+        self.swaps = 0
+        self._lock = threading.Lock()
+        self._loading = threading.Lock()
+        self._checked = time.monotonic()
+        key = self._version_key()
+        with metrics.span('model_load'):
+            self._current = _Loaded(key, self.loader(key[0]))
+
+    def _version_key(self):
+        path = current_version(self.model_root)
+        return path, os.stat(os.path.join(path, MANIFEST_FILE)).st_mtime_ns
+
+    @property
+    def version(self):
+        return os.path.basename(self._current.key[0])
+
+    def _maybe_swap(self):
+        """Load a newly published version; only one thread loads, the others keep serving."""
+        if not self._loading.acquire(blocking=False):
+            return
+        try:
+            key = self._version_key()
+            if key == self._current.key:
+                return
+            with metrics.span('model_load'):
+                loaded = _Loaded(key, self.loader(key[0]))
+        except Exception as e:
+            metrics.inc('model_load_errors_total')
+            print(f"[WARN] Keeping model {self.version}: could not load new version ({e})")
+            return
+        finally:
+            self._checked = time.monotonic()
+            self._loading.release()
+
+        with self._lock:
+            old, self._current = self._current, loaded
+            old.retired = True
+            self.swaps += 1
+            idle = old.refs == 0
+        metrics.inc('model_swaps_total')
+        if idle:
+            self._release(old)
+
+    @staticmethod
+    def _release(loaded):
+        close = getattr(loaded.value, 'close', None)
+        if close is not None:
+            close()
+        loaded.value = None
+
+    @contextmanager
+    def lease(self):
+        """Use the current version for the duration of one request."""
+        if time.monotonic() - self._checked >= self.check_interval:
+            self._maybe_swap()
+        with self._lock:
+            loaded = self._current
+            loaded.refs += 1
+        try:
+            yield loaded.value
+        finally:
+            with self._lock:
+                loaded.refs -= 1
+                idle = loaded.retired and loaded.refs == 0
+            if idle:
+                self._release(loaded)
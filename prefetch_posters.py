@@ -0,0 +1,216 @@
+"""
+Offline Poster Prefetch / Catalog Enrichment
+
+Walks every movie in the model store, fetches its TMDB metadata with bounded
+concurrency and stores the display fields (poster path, release date,
+rating, ...) as extra columns of the model. The app then renders posters
+straight from the model and normally makes no TMDB calls at all.
+
+The run is resumable: every fetched movie is appended to a JSONL checkpoint
+as soon as it arrives, and a rerun only fetches movies missing from it.
+Failed lookups (any error, including malformed payloads) are not
+checkpointed, so they are retried on the next run; a movie TMDB does not
+know (404) is checkpointed and never retried. Fields TMDB has no value for
+keep the catalog's existing values.
+
+Usage:
+    TMDB_API_KEY=... python prefetch_posters.py
+    python prefetch_posters.py --workers 16 --api-key KEY
+    python prefetch_posters.py --api-base http://localhost:8000/3   # fake TMDB server
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+import model_store
+from model_store import DEFAULT_MODEL_DIR
+from tmdb_client import TMDB_API_BASE, TMDBClient
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+DEFAULT_CHECKPOINT = os.path.join('models', 'prefetch_checkpoint.jsonl')
+
+# TMDB fields stored as movie columns, with the value used when TMDB has none
+DISPLAY_FIELDS = {
+    'poster_path': '',
+    'release_date': '',
+    'original_language': '',
+    'genres': '',
+    'vote_average': float('nan'),
+    'vote_count': 0,
+    'runtime': 0,
+}
+
+
+def display_fields(movie):
+    """Project a TMDB movie payload onto DISPLAY_FIELDS."""
+    movie = movie or {}
+    fields = {}
+    for name, default in DISPLAY_FIELDS.items():
+        value = movie.get(name)
+        if name == 'genres' and value is not None:
+            value = '|'.join(genre['name'] for genre in value)
+        fields[name] = default if value is None else value
+    return fields
+
+
+def load_checkpoint(path):
+    """Read the fields of every movie already fetched, keyed by movie_id."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a torn last line from an interrupted run
+            done[record['movie_id']] = record['fields']
+    return done
+
+
+def _end_torn_line(path):
+    """Terminate a torn last line, so the next record starts on a line of its own."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, 'rb+') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            f.write(b'\n')
+
+
+def prefetch(client, movie_ids, checkpoint_path, workers=8):
+    """
+    Fetch display fields for `movie_ids`, skipping those already checkpointed.
+
+    At most `workers * 2` requests are queued at any time, so memory stays
+    flat however large the catalog is. Returns the checkpointed fields of
+    every movie fetched so far, keyed by movie_id.
+    """
+    done = load_checkpoint(checkpoint_path)
+    todo = [movie_id for movie_id in movie_ids if movie_id not in done]
+    print(f"    {len(done):,} already fetched, {len(todo):,} to go")
+
+    failed = 0
+    _end_torn_line(checkpoint_path)
+    with open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        queue = iter(todo)
+        while True:
+            for movie_id in queue:
+                pending[pool.submit(client.get_movie, movie_id)] = movie_id
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                movie_id = pending.pop(future)
+                try:
+                    fields = display_fields(future.result())
+                except Exception as e:  # TMDBError, a failing cache, a malformed payload, ...
+                    failed += 1
+                    print(f"    [!] {movie_id}: {e}")
+                    continue
+                done[movie_id] = fields
+                checkpoint.write(json.dumps({'movie_id': movie_id, 'fields': fields}) + '\n')
+                checkpoint.flush()
+                if len(done) % 500 == 0:
+                    print(f"    {len(done):,}/{len(movie_ids):,} movies")
+
+    if failed:
+        print(f"    [WARN] {failed} lookups failed; rerun to retry them")
+    return done
+
+
+def _missing(value, default):
+    """Whether a fetched display field is empty (TMDB had no value for it)."""
+    if value is None:
+        return True
+    if isinstance(default, float) and math.isnan(default):
+        return isinstance(value, float) and math.isnan(value)
+    return value == default
+
+
+def enrich_model(model_dir, movie_ids, fields_by_id):
+    """
+    Store the fetched display fields as movie columns of the model.
+
+    Only fields TMDB actually returned are written: movies whose lookup
+    failed or found nothing, and fields TMDB left empty, keep the value the
+    model already has, so the catalog's facet columns are never blanked.
+    """
+    movies = model_store.load_model(model_dir).movies
+    columns = pd.DataFrame(index=pd.RangeIndex(len(movie_ids)))
+    for name, default in DISPLAY_FIELDS.items():
+        values = movies[name].tolist() if name in movies else [default] * len(movie_ids)
+        for row, movie_id in enumerate(movie_ids):
+            fields = fields_by_id.get(movie_id)
+            if fields and not _missing(fields.get(name), default):
+                values[row] = fields[name]
+        columns[name] = values
+    columns['vote_average'] = columns['vote_average'].astype('float32')
+    columns['vote_count'] = columns['vote_count'].astype('int32')
+    columns['runtime'] = columns['runtime'].astype('int32')
+    model_store.add_columns(model_dir, columns)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prefetch TMDB posters into the model store.")
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR,
+                        help=f"model directory to enrich (default: {DEFAULT_MODEL_DIR})")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT,
+                        help=f"resumable progress file (default: {DEFAULT_CHECKPOINT})")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="concurrent TMDB requests (default: 8)")
+    parser.add_argument('--rate', type=float, default=20.0,
+                        help="maximum TMDB requests per second (default: 20)")
+    parser.add_argument('--api-key', default=os.environ.get('TMDB_API_KEY'),
+                        help="TMDB API key (default: $TMDB_API_KEY)")
+    parser.add_argument('--api-base', default=os.environ.get('TMDB_API_BASE', TMDB_API_BASE),
+                        help="TMDB API root, e.g. a local fake server for tests")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.api_key:
+        print("[FAIL] No TMDB API key: set TMDB_API_KEY or pass --api-key")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("POSTER PREFETCH")
+    print("=" * 60)
+
+    print(f"\n[*] Loading catalog from {args.model_dir}/...")
+    model = model_store.load_model(args.model_dir)
+    movie_ids = [int(movie_id) for movie_id in model.movies['movie_id']]
+    print(f"    Loaded {len(movie_ids):,} movies")
+    del model
+
+    print(f"\n[*] Fetching TMDB metadata ({args.workers} workers)...")
+    client = TMDBClient(args.api_key, base_url=args.api_base, pool_size=args.workers,
+                        rate=args.rate, burst=args.rate)
+    fields_by_id = prefetch(client, movie_ids, args.checkpoint, workers=args.workers)
+    client.close()
+
+    print(f"\n[*] Writing display fields into {args.model_dir}/...")
+    enrich_model(args.model_dir, movie_ids, fields_by_id)
+    with_poster = sum(1 for fields in fields_by_id.values() if fields['poster_path'])
+    print(f"    {with_poster:,}/{len(movie_ids):,} movies have a poster")
+
+    print("\n[OK] Catalog enriched. The app now serves these posters without TMDB calls.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,620 @@
+"""
+Recommendation Ranking Core
+
+Vectorized top-K selection shared by the Streamlit app and the model builder.
+
+Instead of sorting a whole similarity row with Python's `sorted`, we use
+`np.argpartition` to pull out the K best candidates in O(N) and only sort
+those K. Scores and indices stay NumPy arrays throughout, and the query
+movie is excluded by its index (not by dropping position 0), so ties at a
+similarity of 1.0 can neither leak the query movie into the results nor
+push a real recommendation out.
+
+Every backend also takes an optional boolean `mask` over the catalog (see
+facets.py): movies outside it are removed before top-K selection, so a
+filtered query still returns k results whenever k movies match.
+"""
+
+import numpy as np
+from scipy import sparse
+
+# Catalogs smaller than this are served with exact search even if ANN is selected
+ANN_MIN_ITEMS = 50_000
+ANN_DEFAULT_NPROBE = 8
+
+
+def top_k(scores, k, exclude=None, mask=None):
+    """
+    Select the k highest scores of a 1-D row, best first.
+
+    Parameters:
+    -----------
+    scores : 1-D array
+        One similarity row.
+    k : int
+        Number of results wanted.
+    exclude : int or array of int, optional
+        Indices that must never be returned (e.g. the query movie).
+    mask : 1-D bool array, optional
+        Only indices where the mask is True may be returned.
+
+    Returns:
+    --------
+    indices : 1-D int64 array
+    scores : 1-D array of the selected scores
+    """
+    scores = np.asarray(scores)
+    n_valid = scores.shape[0]
+    if mask is not None:
+        scores = np.where(mask, scores, -np.inf).astype(np.result_type(scores.dtype, np.float32), copy=False)
+        n_valid = int(np.count_nonzero(mask))
+    if exclude is not None:
+        exclude = np.unique(np.atleast_1d(np.asarray(exclude, dtype=np.int64)))
+        if mask is None:
+            scores = scores.astype(np.result_type(scores.dtype, np.float32), copy=True)
+        n_valid -= exclude.shape[0] if mask is None else int(np.count_nonzero(mask[exclude]))
+        scores[exclude] = -np.inf
+
+    k = max(0, min(k, n_valid))
+    if k == 0:
+        return np.empty(0, dtype=np.int64), scores[:0]
+
+    if k < scores.shape[0]:
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(scores.shape[0])
+    order = np.argsort(-scores[top], kind='stable')
+    top = top[order]
+    return top.astype(np.int64, copy=False), scores[top]
+
+
+def top_k_rows(matrix, k, exclude=None):
+    """
+    Row-wise top-K of a dense 2-D block, best first.
+
+    Parameters:
+    -----------
+    matrix : (R, N) array
+    k : int
+    exclude : (R,) array of int, optional
+        One column per row to exclude, typically each row's own movie.
+
+    Returns:
+    --------
+    indices : (R, k) int64 array
+    scores : (R, k) array
+    """
+    matrix = np.asarray(matrix)
+    n_rows, n_cols = matrix.shape
+    if exclude is not None:
+        matrix = matrix.astype(np.result_type(matrix.dtype, np.float32), copy=True)
+        matrix[np.arange(n_rows), np.asarray(exclude)] = -np.inf
+        k = min(k, n_cols - 1)
+    else:
+        k = min(k, n_cols)
+
+    if k <= 0:
+        return np.empty((n_rows, 0), dtype=np.int64), matrix[:, :0]
+
+    if k < n_cols:
+        top = np.argpartition(-matrix, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(n_cols), (n_rows, n_cols)).copy()
+    top_scores = np.take_along_axis(matrix, top, axis=1)
+    # Equal scores keep their column order, so results do not depend on argpartition internals
+    order = np.lexsort((top, -top_scores), axis=1)
+    return (np.take_along_axis(top, order, axis=1).astype(np.int64, copy=False),
+            np.take_along_axis(top_scores, order, axis=1))
+
+
+def _pad(ids, scores, k):
+    """Pad (B, <=k) results to exactly k columns with -1 / -inf."""
+    missing = k - ids.shape[1]
+    if missing <= 0:
+        return ids, scores
+    return (np.pad(ids, ((0, 0), (0, missing)), constant_values=-1),
+            np.pad(scores, ((0, 0), (0, missing)), constant_values=-np.inf))
+
+
+def quantize_scores(scores):
+    """
+    Quantize non-negative similarity rows to uint8 codes with a per-row scale.
+
+    Each row is scaled so its best score maps to 255; `codes * scale` gives
+    the scores back to within half a step (best / 510) of the original.
+    """
+    scores = np.asarray(scores, dtype=np.float32)
+    scale = np.maximum(scores.max(axis=1), 0) / 255
+    safe = np.where(scale > 0, scale, 1)
+    codes = np.rint(np.clip(scores, 0, None) / safe[:, None])
+    return codes.astype(np.uint8), scale.astype(np.float32)
+
+
+def dequantize_scores(codes, scale):
+    """float32 scores from uint8 codes and their per-row scale."""
+    return np.asarray(codes, dtype=np.float32) * np.asarray(scale, dtype=np.float32)[:, None]
+
+
+class NeighborIndex:
+    """
+    Precomputed top-K neighbors for every movie.
+
+    Row i of `indices` holds the ids of movie i's most similar movies,
+    sorted by descending score; `scores` holds the matching similarities,
+    as floats or, with a per-row `scale`, as 8-bit codes (see
+    quantize_scores). The order of a row is fixed at build time, so
+    storing scores at lower precision never changes it.
+
+    A masked query keeps the stored neighbors inside the mask, which are
+    exactly the best matching movies. If fewer than k of them match and an
+    `exact` backend (SparseSimilarity) is given, that query is answered from
+    the full similarity row instead.
+    """
+
+    def __init__(self, indices, scores, scale=None, exact=None):
+        self.indices = indices
+        self.scores = scores
+        self.scale = scale
+        self.exact = exact
+
+    def _scores(self, movie_indices, width=None):
+        """float32 scores of some rows (optionally only the first `width` columns)."""
+        scores = self.scores[movie_indices] if width is None else self.scores[movie_indices, :width]
+        scores = np.asarray(scores, dtype=np.float32)
+        if self.scale is not None:
+            scores = scores * np.asarray(self.scale[movie_indices], dtype=np.float32)[..., None]
+        return scores
+
+    @property
+    def n_items(self):
+        return self.indices.shape[0]
+
+    @property
+    def k(self):
+        return self.indices.shape[1]
+
+    def query(self, movie_index, k, exclude=None, mask=None):
+        """Return the k best (indices, scores) for one movie, skipping `exclude` and unmasked movies."""
+        ids = np.asarray(self.indices[movie_index], dtype=np.int64)
+        scores = self._scores(movie_index)
+        keep = None
+        if exclude is not None:
+            keep = ~np.isin(ids, exclude)
+        if mask is not None:
+            keep = mask[ids] if keep is None else keep & mask[ids]
+        if keep is not None:
+            ids, scores = ids[keep], scores[keep]
+        if mask is not None and len(ids) < k and self.exact is not None:
+            return self.exact.query(movie_index, k, exclude=exclude, mask=mask)
+        return ids[:k], scores[:k]
+
+    def rows(self, movie_indices):
+        """
+        Similarity rows of several movies, (B, N) dense.
+
+        Only the stored K neighbors are known; every other entry is 0.
+        """
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        out = np.zeros((len(movie_indices), self.n_items), dtype=np.float32)
+        np.put_along_axis(out, np.asarray(self.indices[movie_indices], dtype=np.int64),
+                          self._scores(movie_indices), axis=1)
+        return out
+
+    def pairwise(self, movie_indices):
+        """
+        Similarities among a few movies, (C, C).
+
+        Exact when an `exact` backend is available; otherwise gathered from
+        the stored neighbor lists, where pairs outside each other's top-K are 0.
+        """
+        if self.exact is not None:
+            return self.exact.pairwise(movie_indices)
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        order = np.argsort(movie_indices)
+        ordered = movie_indices[order]
+        ids = np.asarray(self.indices[movie_indices], dtype=np.int64)
+        pos = np.minimum(np.searchsorted(ordered, ids), len(ordered) - 1)
+        rows, cols = np.nonzero(ordered[pos] == ids)
+        out = np.zeros((len(movie_indices), len(movie_indices)), dtype=np.float32)
+        out[rows, order[pos[rows, cols]]] = self._scores(movie_indices)[rows, cols]
+        return np.maximum(out, out.T)
+
+    def query_batch(self, movie_indices, k, mask=None):
+        """
+        Top-k neighbors of many movies in one gather, each excluding itself.
+
+        Returns (B, k) indices and scores; rows are padded with -1 / -inf when
+        fewer than k neighbors are available.
+        """
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        # A filter can drop any stored neighbor, so it needs the whole stored row
+        width = min(k + 1, self.k) if mask is None else self.k
+        ids = np.asarray(self.indices[movie_indices, :width], dtype=np.int64)
+        scores = self._scores(movie_indices, width)
+        # Push a row's own movie (if present) and filtered-out movies to the end, keeping the rest in order
+        dropped = ids == movie_indices[:, None]
+        if mask is not None:
+            dropped |= ~mask[ids]
+        order = np.argsort(dropped, axis=1, kind='stable')
+        ids = np.take_along_axis(ids, order, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+        dropped = np.take_along_axis(dropped, order, axis=1)
+        ids[dropped] = -1
+        scores[dropped] = -np.inf
+        ids, scores = _pad(ids[:, :k], scores[:, :k], k)
+
+        if mask is not None and self.exact is not None:
+            short = np.flatnonzero(ids[:, -1] < 0)
+            if len(short):
+                ids[short], scores[short] = self.exact.query_batch(movie_indices[short], k, mask=mask)
+        return ids, scores
+
+
+class SparseSimilarity:
+    """
+    On-demand cosine similarity over an L2-normalized sparse TF-IDF matrix.
+
+    The N x N similarity matrix is never materialized: one query's row is a
+    single sparse mat-vec, `X @ x_q`, so memory and time grow with the number
+    of nonzeros rather than with N².
+
+    `column_scale` weights each term on the query side and `row_scale` each
+    movie, `r_q * r * (X @ (c * x_q))`, which re-weights the fields of a
+    field-weighted matrix (see field_scale).
+    """
+
+    def __init__(self, matrix, column_scale=None, row_scale=None):
+        self.matrix = sparse.csr_matrix(matrix)
+        self.column_scale = column_scale
+        self.row_scale = row_scale
+
+    @property
+    def n_items(self):
+        return self.matrix.shape[0]
+
+    def row(self, movie_index):
+        """Cosine similarity of one movie against the whole catalog."""
+        query = self.matrix[movie_index].toarray().ravel()
+        if self.column_scale is not None:
+            query *= self.column_scale * self.row_scale[movie_index]
+            return (self.matrix @ query) * self.row_scale
+        return self.matrix @ query
+
+    def rows(self, movie_indices):
+        """Similarity rows of several movies as one sparse mat-mat product, (B, N) dense."""
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        queries = self.matrix[movie_indices]
+        if self.column_scale is not None:
+            queries = queries.multiply(self.column_scale).multiply(self.row_scale[movie_indices, None]).tocsr()
+            return (queries @ self.matrix.T).toarray() * self.row_scale
+        return (queries @ self.matrix.T).toarray()
+
+    def pairwise(self, movie_indices):
+        """
+        Similarities among a few movies, (C, C).
+
+        The movies' nonzeros are gathered straight from the CSR arrays in one
+        fancy index into a dense block over just the terms they use, which
+        is much cheaper than a sparse product for a handful of rows.
+        """
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        indptr = self.matrix.indptr
+        starts, lengths = indptr[movie_indices], indptr[movie_indices + 1] - indptr[movie_indices]
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        nonzeros = offsets + np.arange(offsets.shape[0])
+        terms = self.matrix.indices[nonzeros]
+        used = np.zeros(self.matrix.shape[1], dtype=bool)
+        used[terms] = True
+        column_of = np.cumsum(used, dtype=np.int32) - 1
+        block = np.zeros((len(movie_indices), int(column_of[-1]) + 1), dtype=np.float32)
+        block[np.repeat(np.arange(len(movie_indices)), lengths), column_of[terms]] = self.matrix.data[nonzeros]
+        if self.column_scale is not None:
+            row_scale = self.row_scale[movie_indices]
+            return (block * self.column_scale[used]) @ block.T * np.outer(row_scale, row_scale)
+        return block @ block.T
+
+    def query(self, movie_index, k, exclude=None, mask=None):
+        """Return the k best (indices, scores) for one movie, skipping `exclude` and unmasked movies."""
+        return top_k(self.row(movie_index), k, exclude=exclude, mask=mask)
+
+    def query_batch(self, movie_indices, k, mask=None):
+        """Top-k of many movies in one vectorized pass, each excluding itself."""
+        movie_indices = np.asarray(movie_indices, dtype=np.int64)
+        rows = self.rows(movie_indices)
+        if mask is not None:
+            rows[:, ~mask] = -np.inf
+        ids, scores = top_k_rows(rows, k, exclude=movie_indices)
+        scores = scores.astype(np.float32)
+        ids[np.isneginf(scores)] = -1
+        return _pad(ids, scores, k)
+
+
+class AnnIndex:
+    """
+    Approximate nearest-neighbor search with an inverted-file (IVF) index.
+
+    Movies are embedded with truncated SVD of the TF-IDF matrix and grouped
+    into clusters around k-means centroids. A query only scores the movies
+    in its `nprobe` closest clusters, so the work per request is roughly
+    N * nprobe / n_lists instead of N.
+
+    `nprobe` is the recall-vs-latency knob: more probed clusters find more
+    of the true neighbors at a proportionally higher cost. When the exact
+    sparse TF-IDF matrix is available, candidates are re-scored with it so
+    the returned scores are true cosine similarities.
+    """
+
+    def __init__(self, embeddings, centroids, list_offsets, list_items, nprobe=8, exact=None):
+        self.embeddings = embeddings
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_items = list_items
+        self.nprobe = nprobe
+        self.exact = exact
+
+    @property
+    def n_items(self):
+        return self.embeddings.shape[0]
+
+    @property
+    def n_lists(self):
+        return self.centroids.shape[0]
+
+    def candidates(self, movie_index):
+        """Movies in the `nprobe` clusters closest to the query."""
+        query = np.asarray(self.embeddings[movie_index], dtype=np.float32)
+        nprobe = min(self.nprobe, self.n_lists)
+        probe, _ = top_k(self.centroids @ query, nprobe)
+        starts, stops = self.list_offsets[probe], self.list_offsets[probe + 1]
+        return np.concatenate([self.list_items[a:b] for a, b in zip(starts, stops)]).astype(np.int64)
+
+    def query(self, movie_index, k, exclude=None, mask=None):
+        """
+        Return the approximate k best (indices, scores) for one movie, skipping `exclude` and unmasked movies.
+
+        A narrow `mask` can leave fewer than k movies in the probed clusters;
+        the query then searches every masked movie (exactly when possible).
+        """
+        candidates = self.candidates(movie_index)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if exclude is not None:
+            candidates = candidates[~np.isin(candidates, exclude)]
+        if mask is not None and len(candidates) < k:
+            if self.exact is not None:
+                return self.exact.query(movie_index, k, exclude=exclude, mask=mask)
+            candidates = np.flatnonzero(mask)
+            if exclude is not None:
+                candidates = candidates[~np.isin(candidates, exclude)]
+        if self.exact is not None:
+            query = self.exact.matrix[movie_index].toarray().ravel()
+            scores = self.exact.matrix[candidates] @ query
+        else:
+            scores = self.embeddings[candidates] @ np.asarray(self.embeddings[movie_index])
+        top, top_scores = top_k(scores, k)
+        return candidates[top], top_scores
+
+    def rows(self, movie_indices, depth=100):
+        """
+        Approximate similarity rows, (B, N) dense.
+
+        Only each movie's `depth` best candidates are filled in; every other
+        entry is 0.
+        """
+        out = np.zeros((len(movie_indices), self.n_items), dtype=np.float32)
+        for row, movie_index in enumerate(movie_indices):
+            top, top_scores = self.query(movie_index, depth)
+            out[row, top] = top_scores
+        return out
+
+    def pairwise(self, movie_indices):
+        """Similarities among a few movies, (C, C): exact if possible, else in embedding space."""
+        if self.exact is not None:
+            return self.exact.pairwise(movie_indices)
+        block = np.asarray(self.embeddings[np.asarray(movie_indices, dtype=np.int64)], dtype=np.float32)
+        return block @ block.T
+
+    def query_batch(self, movie_indices, k, mask=None):
+        """Top-k of many movies; candidate sets differ per query, so this loops."""
+        ids = np.full((len(movie_indices), k), -1, dtype=np.int64)
+        scores = np.full((len(movie_indices), k), -np.inf, dtype=np.float32)
+        for row, movie_index in enumerate(movie_indices):
+            top, top_scores = self.query(movie_index, k, exclude=movie_index, mask=mask)
+            ids[row, :len(top)] = top
+            scores[row, :len(top)] = top_scores
+        return ids, scores
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# FIELD WEIGHTS
+# ─────────────────────────────────────────────────────────────────────────────
+def field_norms(matrix, fields):
+    """Squared norm of every field block of every row, (N, F) float32."""
+    matrix = sparse.csr_matrix(matrix)
+    n_rows, n_fields = matrix.shape[0], len(fields)
+    field_of = np.repeat(np.arange(n_fields), [field['stop'] - field['start'] for field in fields])
+    rows = np.repeat(np.arange(n_rows), np.diff(matrix.indptr))
+    norms = np.bincount(rows * n_fields + field_of[matrix.indices],
+                        weights=np.square(matrix.data, dtype=np.float64), minlength=n_rows * n_fields)
+    return norms.reshape(n_rows, n_fields).astype(np.float32)
+
+
+def field_scale(fields, weights, norms):
+    """
+    Query-time scales that re-weight the fields of a field-weighted matrix.
+
+    A field-weighted matrix stacks one L2-normalized block per field, scaled
+    by the square root of the field's build weight, so a similarity is a sum
+    of per-field partial scores `w_f * cos_f` (over the row norms). Scaling
+    the query's terms of field f by `c_f = w'_f / w_f` turns the partial
+    scores into `w'_f * cos_f`. The row norms depend on which fields a movie
+    has, so each movie is rescaled by `1 / sqrt(sum_f c_f * n_f)` of its
+    stored field norms. The scores are then exactly the cosine similarities
+    of a rebuild with the new weights. Weights are relative: both sets are
+    normalized to sum to 1.
+
+    Parameters:
+    -----------
+    fields : list of dict
+        `name`, column range `start`/`stop` and build `weight` of each field,
+        as recorded in the model manifest.
+    weights : dict
+        New weight per field name; fields left out keep their build weight.
+    norms : (N, F) array
+        Squared field norms of the rows (see field_norms).
+
+    Returns:
+    --------
+    column_scale : (V,) float32 array, or None if the weights leave the scores unchanged
+    row_scale : (N,) float32 array, or None
+    """
+    unknown = set(weights) - {field['name'] for field in fields}
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    built = np.array([field['weight'] for field in fields], dtype=np.float64)
+    wanted = np.array([weights.get(field['name'], field['weight']) for field in fields], dtype=np.float64)
+    with np.errstate(over='ignore'):
+        if not np.isfinite(wanted.sum()):  # also overflows of finite weights
+            raise ValueError("Field weights must be finite numbers")
+    if (wanted < 0).any() or wanted.sum() <= 0:
+        raise ValueError("Field weights must be non-negative and not all zero")
+    factors = (wanted / wanted.sum()) / np.where(built > 0, built / built.sum(), np.inf)
+    if np.allclose(factors[built > 0], 1.0):
+        return None, None
+    column_scale = np.ones(fields[-1]['stop'], dtype=np.float32)
+    for field, factor in zip(fields, factors):
+        column_scale[field['start']:field['stop']] = factor
+    # Movies left with no weighted field score 0 instead of dividing by zero
+    squared = np.asarray(norms, dtype=np.float64) @ factors
+    row_scale = np.divide(1.0, np.sqrt(squared), out=np.zeros_like(squared), where=squared > 0)
+    return column_scale, row_scale.astype(np.float32)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# MULTI-SEED AGGREGATION
+# ─────────────────────────────────────────────────────────────────────────────
+AGGREGATIONS = ('sum', 'max', 'rrf')
+
+# Reciprocal-rank fusion constant: a movie at rank r contributes w / (RRF_K + r)
+RRF_K = 60
+
+
+def aggregate(backend, seeds, k, weights=None, negatives=None, negative_weights=None,
+              method='sum', exclude=None, rrf_depth=100, mask=None):
+    """
+    Recommend from several seed movies in one vectorized pass.
+
+    The similarity rows of all seeds and negative seeds are fetched in one
+    backend call and combined:
+
+    - `sum`: weighted mean of the seed rows
+    - `max`: best weighted similarity to any seed
+    - `rrf`: reciprocal-rank fusion of each seed's top `rrf_depth` list
+
+    Negative seeds are combined the same way and subtracted. Seeds,
+    negatives and `exclude` (e.g. movies already seen) are never returned,
+    nor is anything without a positive score or outside `mask`.
+
+    Returns:
+    --------
+    (indices, scores) of the top k, best first. Scores are scaled to [0, 1]
+    for a perfect match with every seed.
+    """
+    if method not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation: {method} (expected one of {AGGREGATIONS})")
+
+    seeds = np.asarray(seeds, dtype=np.int64)
+    negatives = np.asarray(negatives if negatives is not None else [], dtype=np.int64)
+    weights = np.ones(len(seeds), dtype=np.float32) if weights is None \
+        else np.asarray(weights, dtype=np.float32)
+    negative_weights = np.ones(len(negatives), dtype=np.float32) if negative_weights is None \
+        else np.asarray(negative_weights, dtype=np.float32)
+    if len(weights) != len(seeds) or len(negative_weights) != len(negatives):
+        raise ValueError("Need exactly one weight per seed")
+
+    rows = backend.rows(np.concatenate([seeds, negatives]))
+    n_seeds = len(seeds)
+
+    if method == 'rrf':
+        depth = min(rrf_depth, rows.shape[1] - 1)
+        top, top_scores = top_k_rows(rows, depth, exclude=np.concatenate([seeds, negatives]))
+        fused = np.zeros_like(rows)
+        np.put_along_axis(fused, top, np.where(top_scores > 0, 1.0 / (RRF_K + 1 + np.arange(depth)), 0), axis=1)
+        rows = fused * (RRF_K + 1)
+
+    if method == 'max':
+        positive = (rows[:n_seeds] * weights[:, None]).max(axis=0)
+        negative = (rows[n_seeds:] * negative_weights[:, None]).max(axis=0) if len(negatives) else 0
+        scores = (positive - negative) / max(weights.max(), 1e-12)
+    else:
+        signed = np.concatenate([weights, -negative_weights])
+        scores = (signed @ rows) / max(weights.sum(), 1e-12)
+
+    excluded = np.concatenate([seeds, negatives, np.asarray(exclude if exclude is not None else [],
+                                                            dtype=np.int64)])
+    scores = np.asarray(scores, dtype=np.float32)
+    scores[excluded] = -np.inf
+    top, top_scores = top_k(scores, k, mask=mask)
+    positive = top_scores > 0
+    return top[positive], top_scores[positive]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# DIVERSITY RE-RANKING
+# ─────────────────────────────────────────────────────────────────────────────
+# Candidates re-ranked for diversity (the best neighbors by relevance)
+DIVERSITY_POOL = 50
+
+# MMR trade-off used when diversity is simply switched on
+MMR_DEFAULT_LAMBDA = 0.7
+
+
+def mmr(relevance, similarity, k, mmr_lambda=MMR_DEFAULT_LAMBDA):
+    """
+    Maximal Marginal Relevance order of a candidate pool.
+
+    Greedily picks the candidate maximizing
+    `mmr_lambda * relevance - (1 - mmr_lambda) * max similarity to the picks
+    so far`, so near-duplicates of an already chosen movie (e.g. sequels)
+    drop down. `mmr_lambda=1` keeps the relevance order.
+
+    Parameters:
+    -----------
+    relevance : (C,) array
+        Relevance of each candidate to the query.
+    similarity : (C, C) array
+        Pairwise similarities among the candidates.
+
+    Returns:
+    --------
+    1-D int64 array of up to k positions into the pool, in pick order.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = np.asarray(similarity, dtype=np.float32)
+    k = min(k, len(relevance))
+    picks = np.empty(k, dtype=np.int64)
+    redundancy = np.zeros(len(relevance), dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+    for i in range(k):
+        gain = np.where(available, mmr_lambda * relevance - (1 - mmr_lambda) * redundancy, -np.inf)
+        pick = int(np.argmax(gain))
+        picks[i] = pick
+        available[pick] = False
+        np.maximum(redundancy, similarity[pick], out=redundancy)
+    return picks
+
+
+def diversify(backend, ids, scores, k, mmr_lambda=MMR_DEFAULT_LAMBDA):
+    """
+    Re-rank a candidate pool from `query`/`aggregate` for diversity (MMR).
+
+    The pool's pairwise similarities are gathered in one backend call.
+    Returns the k chosen (indices, scores), scores still being relevance.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    valid = ids >= 0
+    ids, scores = ids[valid], np.asarray(scores)[valid]
+    if len(ids) <= 1 or mmr_lambda >= 1:
+        return ids[:k], scores[:k]
+    picks = mmr(scores, backend.pairwise(ids), k, mmr_lambda)
+    return ids[picks], scores[picks]
@@ -0,0 +1,290 @@
+"""
+TF-IDF Hyperparameter Sweep
+
+Fits a grid of vectorizer settings (vocabulary size, n-gram range, document
+frequency bounds, sublinear TF) on the catalog and scores each one with the
+offline evaluation metrics of `evaluate.py`, against the settings the builder
+currently uses (`build_improved_model.TFIDF_PARAMS`).
+
+Tokenizing the tags and counting n-grams is the expensive part of a fit and
+does not depend on any of the swept settings. It runs once, for the longest
+n-gram in the grid, and the counts are cached on disk per catalog. Every
+config then only selects its vocabulary from those counts and recomputes the
+weighting (TF, IDF, L2 norm), the same transform TfidfVectorizer applies.
+
+Configs run in parallel worker processes. Each computes the exact top-K list
+of every movie and returns only those (N, k) ids; no similarity matrix or
+TF-IDF matrix is kept. The lists are saved per config next to the results.
+
+Usage:
+    python sweep.py --max-features 2000 5000 10000 --ngram-max 1 2 --min-df 1 2 5
+    python sweep.py --max-df 0.5 0.8 1.0 --no-sublinear-tf --jobs 4 --output-dir sweep
+    python build_improved_model.py --max-features 10000 --min-df 1     # adopt a config
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+import evaluate
+from build_improved_model import TFIDF_PARAMS, document_frequency
+from recommender import SparseSimilarity
+
+# Fix Windows console encoding
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+DEFAULT_CATALOG = os.path.join('models', 'movies_dict.pkl')
+DEFAULT_CACHE_DIR = os.path.join('models', 'sweep_cache')
+DEFAULT_OUTPUT_DIR = 'sweep'
+
+# Tokenization shared by every config (the builder's TfidfVectorizer settings)
+STOP_WORDS = 'english'
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# CACHED FEATURIZATION
+# ─────────────────────────────────────────────────────────────────────────────
+def count_terms(tags, max_ngram):
+    """
+    Raw term counts of every 1..max_ngram-gram of the tags.
+
+    Returns:
+    --------
+    counts : (N, V) CSR int32 matrix
+    orders : (V,) int8 array, the n-gram length of each column
+    """
+    counter = CountVectorizer(ngram_range=(1, max_ngram), stop_words=STOP_WORDS, dtype=np.int32)
+    counts = counter.fit_transform(tags)
+    terms = sorted(counter.vocabulary_, key=counter.vocabulary_.get)
+    orders = np.array([term.count(' ') + 1 for term in terms], dtype=np.int8)
+    return counts.tocsr(), orders
+
+
+def cached_counts(tags, max_ngram, cache_dir=DEFAULT_CACHE_DIR):
+    """Path of the term counts of `tags`, counting and caching them if they are not cached yet."""
+    digest = hashlib.sha256()
+    digest.update(f'{max_ngram}\0{STOP_WORDS}\0'.encode('utf-8'))
+    for tag in tags:
+        digest.update(tag.encode('utf-8') + b'\0')
+    path = os.path.join(cache_dir, f'counts-{digest.hexdigest()[:16]}.npz')
+    if os.path.exists(path):
+        print(f"    Reusing cached term counts: {path}")
+        return path
+
+    started = time.perf_counter()
+    counts, orders = count_terms(tags, max_ngram)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        np.savez(f, data=counts.data, indices=counts.indices, indptr=counts.indptr,
+                 shape=np.array(counts.shape), orders=orders)
+    os.replace(path + '.tmp', path)
+    print(f"    Counted {counts.shape[1]:,} terms in {time.perf_counter() - started:.1f}s -> {path}")
+    return path
+
+
+class TermCounts:
+    """Cached term counts plus the per-term statistics every config selects its vocabulary by."""
+
+    def __init__(self, path):
+        with np.load(path) as f:
+            self.counts = sparse.csr_matrix((f['data'], f['indices'], f['indptr']), shape=tuple(f['shape']))
+            self.orders = f['orders']
+        self.n_docs = self.counts.shape[0]
+        self.document_frequency = np.bincount(self.counts.indices, minlength=self.counts.shape[1])
+        self.term_frequency = np.asarray(self.counts.sum(axis=0)).ravel()
+
+    def _doc_count(self, value):
+        return value if isinstance(value, (int, np.integer)) else value * self.n_docs
+
+    def vocabulary(self, max_features=None, ngram_range=(1, 1), min_df=1, max_df=1.0):
+        """Columns of the terms TfidfVectorizer would keep with these settings."""
+        df = self.document_frequency
+        keep = ((self.orders >= ngram_range[0]) & (self.orders <= ngram_range[1])
+                & (df >= self._doc_count(min_df)) & (df <= self._doc_count(max_df)))
+        columns = np.flatnonzero(keep)
+        if max_features is not None and len(columns) > max_features:
+            # Most frequent terms over the whole catalog; columns are in vocabulary order like
+            # TfidfVectorizer's, so the same (unstable) argsort breaks ties the same way
+            order = (-self.term_frequency[columns]).argsort()[:max_features]
+            columns = np.sort(columns[order])
+        if not len(columns):
+            raise ValueError("After pruning, no terms remain. Try a lower min_df or a higher max_df.")
+        return columns
+
+    def tfidf(self, max_features=None, ngram_range=(1, 1), min_df=1, max_df=1.0, sublinear_tf=False):
+        """The L2-normalized float32 TF-IDF matrix of one config (smooth IDF, as TfidfVectorizer)."""
+        columns = self.vocabulary(max_features, ngram_range, min_df, max_df)
+        matrix = self.counts[:, columns].astype(np.float64)
+        if sublinear_tf:
+            np.log(matrix.data, out=matrix.data)
+            matrix.data += 1
+        idf = np.log((1 + self.n_docs) / (1 + self.document_frequency[columns])) + 1
+        matrix.data *= idf[matrix.indices]
+        return normalize(matrix, norm='l2').astype(np.float32)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# PARALLEL SWEEP
+# ─────────────────────────────────────────────────────────────────────────────
+_COUNTS = None
+
+
+def _init_sweep_worker(counts):
+    global _COUNTS
+    _COUNTS = counts
+
+
+def run_config(config_id, config, k):
+    """Top-k lists of every movie under one config: (config_id, (N, k) int32 ids, n_features, seconds)."""
+    started = time.perf_counter()
+    matrix = _COUNTS.tfidf(**config)
+    ids = evaluate.top_k_lists(SparseSimilarity(matrix), matrix.shape[0], k, n_jobs=1)
+    return config_id, ids.astype(np.int32), matrix.shape[1], time.perf_counter() - started
+
+
+def config_grid(max_features, ngram_max, min_df, max_df, sublinear_tf):
+    """Every combination of the swept values, as build_tfidf_model keyword arguments."""
+    return [
+        {'max_features': features, 'ngram_range': (1, ngram), 'min_df': low, 'max_df': high, 'sublinear_tf': sublinear}
+        for features, ngram, low, high, sublinear in itertools.product(max_features, ngram_max, min_df, max_df,
+                                                                        sublinear_tf)
+    ]
+
+
+def sweep(tags, configs, k=evaluate.DEFAULT_K, n_jobs=None, cache_dir=DEFAULT_CACHE_DIR, popularity=None,
+          output_dir=DEFAULT_OUTPUT_DIR):
+    """
+    Run every config and score it against the builder's current settings.
+
+    The baseline (TFIDF_PARAMS) is always run; it also provides the TF-IDF
+    matrix intra-list diversity is measured with, so all configs share one
+    yardstick. Returns one result dict per config, baseline first.
+    """
+    baseline = dict(TFIDF_PARAMS)
+    configs = [baseline] + [config for config in configs if config != baseline]
+    max_ngram = max(config['ngram_range'][1] for config in configs)
+    counts = TermCounts(cached_counts(tags, max_ngram, cache_dir))
+    reference = counts.tfidf(**baseline)
+    n_items = len(tags)
+    os.makedirs(output_dir, exist_ok=True)
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    lists, results = {}, [None] * len(configs)
+
+    def collect(result):
+        config_id, ids, n_features, seconds = result
+        np.save(os.path.join(output_dir, f'topk-{config_id:03d}.npy'), ids)
+        lists[config_id] = ids
+        results[config_id] = {'id': config_id, 'config': {**configs[config_id],
+                                                          'ngram_range': list(configs[config_id]['ngram_range'])},
+                              'n_features': int(n_features), 'seconds': round(seconds, 2)}
+        print(f"    [{len(lists)}/{len(configs)}] config {config_id}: {n_features:,} features, {seconds:.1f}s")
+
+    print(f"\n[*] Running {len(configs)} configs on {min(n_jobs, len(configs))} workers...")
+    if n_jobs == 1:
+        _init_sweep_worker(counts)
+        for config_id, config in enumerate(configs):
+            collect(run_config(config_id, config, k))
+    else:
+        with ProcessPoolExecutor(max_workers=min(n_jobs, len(configs)), initializer=_init_sweep_worker,
+                                 initargs=(counts,)) as pool:
+            futures = [pool.submit(run_config, config_id, config, k) for config_id, config in enumerate(configs)]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    print("\n[*] Scoring...")
+    for config_id, result in enumerate(results):
+        overlap, jaccard, spearman = evaluate.catalog_agreement(lists[0], lists[config_id])
+        result['vs_baseline'] = {'overlap_at_k': evaluate.summarize(overlap),
+                                 'jaccard': evaluate.summarize(jaccard),
+                                 'spearman': evaluate.summarize(spearman)}
+        result.update(evaluate.list_metrics(lists[config_id], n_items, reference, popularity))
+    return results
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# REPORT
+# ─────────────────────────────────────────────────────────────────────────────
+def print_results(results):
+    print(f"\n    {'id':>3} {'features':>8} {'ngram':>5} {'min_df':>6} {'max_df':>6} {'sublin':>6} "
+          f"{'overlap':>7} {'cover':>6} {'gini':>6} {'pop':>6} {'ILD':>6}")
+    for result in results:
+        config = result['config']
+        popularity, diversity = result.get('popularity_percentile'), result['intra_list_diversity']
+        print(f"    {result['id']:>3} {config['max_features']:>8} {config['ngram_range'][1]:>5} "
+              f"{config['min_df']:>6} {config['max_df']:>6} {str(config['sublinear_tf']):>6} "
+              f"{result['vs_baseline']['overlap_at_k']['mean']:>7.3f} {result['coverage']:>6.3f} "
+              f"{result['exposure_gini']:>6.3f} {'-' if popularity is None else f'{popularity:.3f}':>6} "
+              f"{'-' if diversity is None else f'{diversity:.3f}':>6}")
+    print("\n    Config 0 is the baseline (current build settings); overlap is measured against it.")
+
+
+def _flag(value):
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep TF-IDF settings and score each with offline metrics.")
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG,
+                        help=f"catalog to fit on (default: {DEFAULT_CATALOG})")
+    parser.add_argument('--max-features', type=int, nargs='+', default=[TFIDF_PARAMS['max_features']],
+                        help="vocabulary sizes to try")
+    parser.add_argument('--ngram-max', type=int, nargs='+', default=[TFIDF_PARAMS['ngram_range'][1]],
+                        help="longest n-grams to try")
+    parser.add_argument('--min-df', type=document_frequency, nargs='+', default=[TFIDF_PARAMS['min_df']],
+                        help="minimum document frequencies to try (count, or fraction if it has a '.')")
+    parser.add_argument('--max-df', type=document_frequency, nargs='+', default=[TFIDF_PARAMS['max_df']],
+                        help="maximum document frequencies to try (count, or fraction if it has a '.')")
+    parser.add_argument('--sublinear-tf', type=_flag, nargs='+', default=[TFIDF_PARAMS['sublinear_tf']],
+                        help="sublinear TF settings to try (true/false)")
+    parser.add_argument('--k', type=int, default=evaluate.DEFAULT_K,
+                        help=f"list length evaluated (default: {evaluate.DEFAULT_K})")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f"where term counts are cached (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                        help=f"results.json and per-config top-K lists (default: {DEFAULT_OUTPUT_DIR})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print("=" * 60)
+    print("TF-IDF HYPERPARAMETER SWEEP")
+    print("=" * 60)
+
+    with open(args.catalog, 'rb') as f:
+        df = pd.DataFrame(pickle.load(f))
+    print(f"\n[*] Loaded {len(df):,} movies from {args.catalog}")
+    popularity = df['vote_count'].to_numpy() if 'vote_count' in df else None
+
+    configs = config_grid(args.max_features, args.ngram_max, args.min_df, args.max_df, args.sublinear_tf)
+    started = time.perf_counter()
+    results = sweep(df['tags'].tolist(), configs, k=args.k, n_jobs=args.jobs, cache_dir=args.cache_dir,
+                    popularity=popularity, output_dir=args.output_dir)
+    print_results(results)
+
+    path = os.path.join(args.output_dir, 'results.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'k': args.k, 'n_items': len(df), 'seconds': round(time.perf_counter() - started, 2),
+                   'results': results}, f, indent=2, allow_nan=False)
+    print(f"\n[OK] Wrote {path} and {len(results)} top-{args.k} lists to {args.output_dir}/")
+
+
+if __name__ == '__main__':
+    main()
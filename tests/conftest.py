@@ -0,0 +1,146 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_store  # noqa: E402
+
+
+@pytest.fixture
+def catalog():
+    """A small catalog with every facet column."""
+    return pd.DataFrame({
+        'movie_id': [11, 12, 13, 14, 15, 16],
+        'title': ['Heat', 'Airplane!', 'Amelie', 'Halloween', 'Big', 'Speed'],
+        'genres': ['Crime|Drama', 'Comedy', 'Comedy|Romance', 'Horror', 'Comedy|Drama', 'Action'],
+        'release_date': ['1995-12-15', '1980-07-02', '2001-04-25', '1978-10-25', '1988-06-03', '1994-06-10'],
+        'original_language': ['en', 'en', 'fr', 'en', 'en', 'en'],
+        'vote_average': [7.9, 7.2, 7.9, 7.5, 6.6, 7.1],
+    })
+
+
+@pytest.fixture
+def store(tmp_path, catalog):
+    """A versioned model store holding `catalog` and a neighbor index, but no TF-IDF matrix."""
+    n = len(catalog)
+    indices = np.array([[(row + step) % n for step in range(1, n)] for row in range(n)], dtype=np.int32)
+    scores = np.tile(np.linspace(0.9, 0.1, n - 1, dtype=np.float32), (n, 1))
+    model_dir = str(tmp_path / 'model')
+    with model_store.new_version(model_dir) as version_dir:
+        model_store.write_model(version_dir, catalog, neighbors=(indices, scores))
+    return model_dir
+
+
+def synthetic_movies(n_movies, seed=0, first_id=1):
+    """
+    Random movies with tags and the fields of a field-weighted build.
+
+    Field values come from small vocabularies so most terms pass min_df;
+    some movies lack their keywords or crew.
+    """
+    rng = np.random.default_rng(seed)
+    words = [f'word{i}' for i in range(60)]
+    genres = ['Action', 'Comedy', 'Drama', 'Horror', 'Romance', 'Thriller']
+    keywords = [f'keyword {i}' for i in range(25)]
+    people = [f'Person {i}' for i in range(40)]
+
+    def pick(values, low, high):
+        return [str(value) for value in rng.choice(values, rng.integers(low, high + 1), replace=False)]
+
+    rows = []
+    for i in range(n_movies):
+        movie = {
+            'genres': pick(genres, 1, 3),
+            'keywords': pick(keywords, 0, 4) if i % 7 else [],
+            'cast': pick(people, 2, 4),
+            'crew': pick(people, 1, 2) if i % 5 else [],
+            'overview': pick(words, 8, 15),
+        }
+        rows.append({
+            'movie_id': first_id + i,
+            'title': f'Movie {first_id + i}',
+            'tags': ' '.join(movie['overview'] + [name.replace(' ', '') for field in
+                                                  ('genres', 'keywords', 'cast', 'crew') for name in movie[field]]),
+            'genres': '|'.join(movie['genres']),
+            'keywords': '|'.join(movie['keywords']),
+            'cast': '|'.join(movie['cast']),
+            'crew': '|'.join(movie['crew']),
+            'overview': ' '.join(movie['overview']),
+        })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def field_catalog():
+    """A 60-movie catalog with the fields of a field-weighted build."""
+    return synthetic_movies(60)
+
+
+@pytest.fixture
+def field_store(tmp_path, field_catalog):
+    """A versioned store holding a field-weighted TF-IDF matrix of `field_catalog`."""
+    from build_improved_model import build_field_model
+
+    tfidf_matrix, fields = build_field_model(field_catalog)
+    model_dir = str(tmp_path / 'fields')
+    with model_store.new_version(model_dir) as version_dir:
+        model_store.write_model(version_dir, field_catalog[['movie_id', 'title']],
+                                tfidf_matrix=tfidf_matrix, fields=fields)
+    return model_dir
+
+
+class FakeTMDB:
+    """
+    A local HTTP server standing in for the TMDB API.
+
+    `routes` maps a path such as '/3/movie/11' to (status, body); a dict
+    body is sent as JSON, a string as HTML. Unknown paths get a 404.
+    Every requested path is appended to `requests`.
+    """
+
+    def __init__(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        fake = self
+        self.routes = {}
+        self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                fake.requests.append(path)
+                status, body = fake.routes.get(path, (404, {'status_message': 'Not found'}))
+                if isinstance(body, dict):
+                    data, content_type = json.dumps(body).encode(), 'application/json'
+                else:
+                    data, content_type = body.encode(), 'text/html'
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}/3'
+        self._thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def tmdb_server():
+    server = FakeTMDB()
+    yield server
+    server.close()
@@ -0,0 +1,52 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+
+@pytest.fixture
+def client(monkeypatch, store):
+    monkeypatch.setenv('MODEL_DIR', store)
+    monkeypatch.delenv('RECOMMENDER_BACKEND', raising=False)
+    with TestClient(api.app) as client:
+        yield client
+
+
+def test_recommend(client):
+    response = client.get('/recommend', params={'movie_id': 11, 'k': 3})
+    assert response.status_code == 200
+    assert [item['movie_id'] for item in response.json()['results']] == [12, 13, 14]
+
+
+def test_field_weights_without_fields_is_rejected(client):
+    response = client.get('/recommend', params={'movie_id': 11, 'field_weights': 'crew:2'})
+    assert response.status_code == 422
+    assert 'per-field weights' in response.json()['detail']
+
+    response = client.post('/recommend/batch', json={'movie_ids': [11, 12], 'field_weights': {'crew': 2}})
+    assert response.status_code == 422
+
+
+@pytest.fixture
+def field_client(monkeypatch, field_store):
+    monkeypatch.setenv('MODEL_DIR', field_store)
+    monkeypatch.setenv('RECOMMENDER_BACKEND', 'sparse')
+    with TestClient(api.app) as client:
+        yield client
+
+
+def test_field_weights(field_client):
+    response = field_client.get('/recommend', params={'movie_id': 1, 'k': 5, 'field_weights': 'crew:2,overview:0'})
+    assert response.status_code == 200
+    assert len(response.json()['results']) == 5
+
+
+@pytest.mark.parametrize('weight, literal', [('nan', 'NaN'), ('inf', 'Infinity'), ('-inf', '-Infinity')])
+def test_non_finite_field_weights_are_rejected(field_client, weight, literal):
+    response = field_client.get('/recommend', params={'movie_id': 1, 'field_weights': f'crew:{weight}'})
+    assert response.status_code == 422
+
+    # Python's JSON parser accepts these non-standard literals
+    body = '{"movie_ids": [1, 2], "field_weights": {"crew": %s}}' % literal
+    response = field_client.post('/recommend/batch', content=body, headers={'Content-Type': 'application/json'})
+    assert response.status_code == 422
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import benchmark
+
+CHILD = """
+import sys
+import numpy as np
+block = np.ones(200 * 1024 * 1024 // 8)  # 200 MB, touched
+print('ready', flush=True)
+sys.stdin.read()
+"""
+
+
+def test_process_tree_rss_includes_children():
+    if benchmark.tree_rss_bytes(os.getpid()) is None:
+        pytest.skip("process tree RSS is not readable on this platform")
+    with benchmark.ProcessTreeRss() as rss:
+        alone = benchmark.tree_rss_bytes(os.getpid())
+        child = subprocess.Popen([sys.executable, '-c', CHILD], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        try:
+            assert child.stdout.readline().strip() == b'ready'
+            with_child = benchmark.tree_rss_bytes(os.getpid())
+            time.sleep(10 * rss.interval)  # let the sampler see it
+        finally:
+            child.communicate()
+    assert with_child - alone > 150 * 1024 * 1024
+    assert rss.peak - alone > 150 * 1024 * 1024
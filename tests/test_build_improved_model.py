@@ -0,0 +1,148 @@
+import os
+
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+import build_improved_model as builder
+import model_store
+from recommender import dequantize_scores
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A working directory with a models/ folder, as the builder expects."""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('models')
+    return tmp_path
+
+
+def test_add_to_field_model_rebuilds_it_with_its_settings(workdir, field_catalog):
+    builder.save_catalog(field_catalog[:50])
+    builder.main(['--fields', '--field-weight', 'crew=2', '--field-weight', 'overview=0',
+                  '--top-k', '7', '--score-dtype', 'int8', '--jobs', '1', '--model-dir', 'models/store'])
+    field_catalog[50:].to_csv('new.csv', index=False)
+    builder.main(['--add', 'new.csv', '--jobs', '1', '--model-dir', 'models/store'])
+
+    model = model_store.load_model('models/store')
+    assert model.n_items == 60
+    assert {field['name']: field['weight'] for field in model.fields} == {
+        'genres': 1.0, 'keywords': 1.0, 'cast': 1.0, 'crew': 2.0}
+    assert model.arrays['neighbors.indices'].shape[1] == 7
+    assert model.has('neighbors.scale')  # int8 scores
+    assert model.manifest['metadata']['build']['field_weights']['overview'] == 0
+
+
+def test_stored_build_settings_of_older_models(field_store, store):
+    settings = builder.stored_build_settings(field_store)
+    assert settings['field_weights'] == dict.fromkeys(builder.FIELD_WEIGHTS, 1.0)
+    assert settings['sparse_only'] and settings['ann'] is None
+    with pytest.raises(ValueError):
+        builder.stored_build_settings(store)  # neither recorded settings nor fields
+    assert builder.stored_build_settings('missing') is None
+
+
+def test_add_refuses_to_guess_build_settings(workdir, field_catalog):
+    builder.save_catalog(field_catalog[:50])
+    with model_store.new_version('models/store') as version_dir:
+        model_store.write_model(version_dir, field_catalog[['movie_id', 'title']][:50],
+                                metadata={'source': 'tfidf'})
+    field_catalog[50:].to_csv('new.csv', index=False)
+    with pytest.raises(SystemExit) as exit_info:
+        builder.main(['--add', 'new.csv', '--model-dir', 'models/store'])
+    assert exit_info.value.code == 1
+    assert len(builder.load_current_model()) == 60  # the catalog keeps the new movies
+
+
+def test_add_extends_the_ann_index_without_retraining(workdir, field_catalog, monkeypatch):
+    builder.save_catalog(field_catalog[:55])
+    builder.main(['--sparse-only', '--ann', '--ann-components', '16', '--model-dir', 'models/store'])
+    before = model_store.load_model('models/store', mmap=False)
+
+    def retrain(*args, **kwargs):
+        raise AssertionError("the ANN index was retrained")
+    monkeypatch.setattr(builder, 'build_ann_index', retrain)
+    field_catalog[55:].to_csv('new.csv', index=False)
+    builder.main(['--add', 'new.csv', '--model-dir', 'models/store'])
+
+    model = model_store.load_model('models/store')
+    assert model.n_items == 60
+    arrays = model.arrays
+    np.testing.assert_array_equal(arrays['ann.centroids'], before.arrays['ann.centroids'])
+    np.testing.assert_array_equal(arrays['ann.embeddings'][:55], before.arrays['ann.embeddings'])
+    expected = normalize(model.tfidf_matrix()[55:] @ arrays['ann.components'].T)
+    np.testing.assert_allclose(arrays['ann.embeddings'][55:], expected, atol=1e-6)
+    # Every movie is in exactly one list: the new ones in their nearest centroid's
+    assert sorted(arrays['ann.list_items']) == list(range(60))
+    lists = np.repeat(np.arange(len(arrays['ann.centroids'])), np.diff(arrays['ann.list_offsets']))
+    list_of = dict(zip(arrays['ann.list_items'].tolist(), lists.tolist()))
+    nearest = np.argmax(expected @ arrays['ann.centroids'].T, axis=1)
+    assert [list_of[i] for i in range(55, 60)] == nearest.tolist()
+    assert model.ann_index().query(57, 5, exclude=57)[0].size == 5
+
+
+def full_neighbors(tfidf_matrix, k):
+    (indices, scores), _ = builder.compute_neighbor_index_blockwise(tfidf_matrix, k=k, n_jobs=1)
+    return indices, scores
+
+
+def test_serial_neighbor_build_releases_the_block_matrix():
+    matrix = normalize(sparse.random(30, 20, density=0.3, random_state=5, dtype=np.float32)).tocsr()
+    full_neighbors(matrix, 4)
+    assert builder._BLOCK_MATRIX is None and builder._BLOCK_MATRIX_T is None
+
+
+def test_splice_neighbors_matches_a_full_recompute():
+    matrix = normalize(sparse.random(80, 40, density=0.2, random_state=3, dtype=np.float32)).tocsr()
+    old, new = matrix[:65], matrix[65:]
+    indices, scores = full_neighbors(old, 8)
+
+    (spliced, spliced_scores), affected = builder.splice_neighbors(indices, scores, old, new, block_size=4)
+    expected, expected_scores = full_neighbors(matrix, 8)
+    np.testing.assert_array_equal(spliced, expected)
+    np.testing.assert_allclose(spliced_scores, expected_scores, atol=1e-6)
+    assert affected == int((expected[:65] != indices).any(axis=1).sum())
+    assert affected > 0
+
+
+@pytest.fixture
+def tfidf_store(workdir, field_catalog):
+    """A tags model of the first 55 movies of `field_catalog`, neighbors as int8 codes."""
+    builder.save_catalog(field_catalog[:55])
+    builder.main(['--top-k', '8', '--score-dtype', 'int8', '--jobs', '1', '--model-dir', 'models/store'])
+    return 'models/store'
+
+
+def test_update_model_incremental_splices_int8_neighbors(tfidf_store, field_catalog):
+    assert builder.update_model_incremental(tfidf_store, field_catalog, 5)
+
+    model = model_store.load_model(tfidf_store)
+    assert model.n_items == 60
+    assert model.manifest['metadata']['incremental_items'] == 5
+    assert model.arrays['neighbors.scores'].dtype == np.uint8 and model.has('neighbors.scale')
+    expected, expected_scores = full_neighbors(model.tfidf_matrix(), 8)
+    scores = dequantize_scores(model.arrays['neighbors.scores'], model.arrays['neighbors.scale'])
+    # Within half a quantization step, plus another for spliced rows that were re-encoded
+    step = model.arrays['neighbors.scale'][:, None]
+    assert (np.abs(scores - expected_scores) <= step + 1e-6).all()
+    assert (model.arrays['neighbors.indices'] == expected).mean() > 0.95  # only near-ties may swap
+
+
+def test_update_model_incremental_refuses_what_needs_a_rebuild(tfidf_store, field_catalog, capsys):
+    version = model_store.current_version(tfidf_store)
+
+    drifted = field_catalog.copy()
+    drifted.loc[55:, 'tags'] = 'brandnew unheardof neologism ' * 3
+    assert not builder.update_model_incremental(tfidf_store, drifted, 5)
+    assert 'Drift exceeds' in capsys.readouterr().out
+
+    assert not builder.update_model_incremental(tfidf_store, field_catalog, 5, max_growth=0.05)
+    assert 'Catalog grew 9%' in capsys.readouterr().out
+
+    renumbered = field_catalog.copy()
+    renumbered.loc[0, 'movie_id'] = 999
+    assert not builder.update_model_incremental(tfidf_store, renumbered, 5)
+    assert 'does not match the current catalog' in capsys.readouterr().out
+
+    assert model_store.current_version(tfidf_store) == version  # the model is untouched
@@ -0,0 +1,19 @@
+import json
+
+import numpy as np
+from scipy import sparse
+
+from evaluate import list_metrics
+
+
+def test_list_metrics_without_defined_values_are_null():
+    # Lists of one movie have no pairs to compare, and padding ids (-1) have no popularity.
+    matrix = sparse.identity(4, format='csr')
+    ids = np.array([[1, -1], [-1, -1]])
+    metrics = list_metrics(ids, 4, matrix, popularity=np.zeros(4))
+    assert metrics['intra_list_diversity'] is None
+    json.dumps(metrics, allow_nan=False)
+
+    metrics = list_metrics(np.full((3, 2), -1), 4, matrix, popularity=np.arange(4.0))
+    assert metrics['popularity_percentile'] is None
+    json.dumps(metrics, allow_nan=False)
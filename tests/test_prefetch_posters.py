@@ -0,0 +1,135 @@
+import threading
+
+import numpy as np
+import pytest
+
+import model_store
+import prefetch_posters
+from tmdb_client import TMDBError
+
+
+def tmdb_movie(poster_path, genres, release_date='2000-01-01'):
+    return {
+        'poster_path': poster_path,
+        'release_date': release_date,
+        'original_language': 'en',
+        'genres': [{'name': name} for name in genres],
+        'vote_average': 8.0,
+        'vote_count': 100,
+        'runtime': 120,
+    }
+
+
+class StubClient:
+    """Stands in for TMDBClient: serves `movies`, 404s unknown ids, fails `failing` ids."""
+
+    def __init__(self, movies, failing=(), interrupt_at=None):
+        self.movies = movies
+        self.failing = set(failing)
+        self.interrupt_at = interrupt_at
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_movie(self, movie_id):
+        with self._lock:
+            self.calls.append(movie_id)
+        if movie_id == self.interrupt_at:
+            raise KeyboardInterrupt
+        if movie_id in self.failing:
+            raise TMDBError(f"GET /movie/{movie_id} failed with HTTP 503")
+        return self.movies.get(movie_id)
+
+
+def facet_masks(model_dir, exprs):
+    facets = model_store.load_model(model_dir).facet_index()
+    return [np.flatnonzero(facets.mask(expr)).tolist() for expr in exprs]
+
+
+FACET_EXPRS = ['genre:Drama', 'genre:Comedy', 'language:fr', 'year>=1990', 'rating>=7.5']
+
+
+def test_enrich_keeps_catalog_values_of_failed_lookups(store, catalog):
+    before = facet_masks(store, FACET_EXPRS)
+    movie_ids = catalog['movie_id'].tolist()
+    # 11 was fetched, 12 failed (not in the checkpoint), 13 was a 404
+    fields_by_id = {
+        11: prefetch_posters.display_fields(tmdb_movie('/heat.jpg', ['Crime', 'Drama'], '1995-12-15')),
+        13: prefetch_posters.display_fields(None),
+    }
+    prefetch_posters.enrich_model(store, movie_ids, fields_by_id)
+
+    assert facet_masks(store, FACET_EXPRS) == before
+    movies = model_store.load_model(store).movies
+    assert movies['poster_path'].tolist() == ['/heat.jpg', '', '', '', '', '']
+    assert movies['genres'].tolist() == catalog['genres'].tolist()
+    assert movies['original_language'].tolist() == catalog['original_language'].tolist()
+    assert movies['runtime'].tolist() == [120, 0, 0, 0, 0, 0]
+
+
+def test_prefetch_resumes_and_retries_only_failures(tmp_path, store, catalog):
+    checkpoint = str(tmp_path / 'checkpoint.jsonl')
+    movie_ids = catalog['movie_id'].tolist()
+    # 13 is unknown to TMDB (404); 12 fails on the first run only
+    movies = {movie_id: tmdb_movie(f'/{movie_id}.jpg', ['Drama'])
+              for movie_id in movie_ids if movie_id != 13}
+
+    # First run is interrupted while fetching 16
+    first = StubClient(movies, failing={12}, interrupt_at=16)
+    with pytest.raises(KeyboardInterrupt):
+        prefetch_posters.prefetch(first, movie_ids, checkpoint, workers=1)
+    with open(checkpoint, 'a', encoding='utf-8') as f:
+        f.write('{"movie_id": 15, "fie')  # torn last line
+    done = prefetch_posters.load_checkpoint(checkpoint)
+    assert {11, 13, 14} <= set(done)
+    assert 12 not in done and 16 not in done
+    assert done[13]['poster_path'] == '' and done[13]['genres'] == ''  # 404 recorded
+    resumed = set(done)
+
+    # Second run fetches only what the first did not checkpoint
+    second = StubClient(movies)
+    done = prefetch_posters.prefetch(second, movie_ids, checkpoint, workers=2)
+    assert sorted(second.calls) == sorted(set(movie_ids) - resumed)
+    assert 12 in second.calls and 13 not in second.calls
+    assert set(done) == set(movie_ids)
+
+    # The 404 is terminal: a third run has nothing left to fetch
+    third = StubClient(movies)
+    done = prefetch_posters.prefetch(third, movie_ids, checkpoint, workers=2)
+    assert third.calls == []
+
+    prefetch_posters.enrich_model(store, movie_ids, done)
+    enriched = model_store.load_model(store).movies
+    assert set(prefetch_posters.DISPLAY_FIELDS) <= set(enriched.columns)
+    assert enriched['poster_path'].tolist() == ['/11.jpg', '/12.jpg', '', '/14.jpg', '/15.jpg', '/16.jpg']
+    assert enriched['runtime'].tolist() == [120, 120, 0, 120, 120, 120]
+    # The 404 keeps its catalog facet values
+    assert enriched['genres'][2] == catalog['genres'][2]
+    assert enriched['release_date'][2] == catalog['release_date'][2]
+    assert enriched['vote_average'][2] == np.float32(catalog['vote_average'][2])
+
+
+def test_prefetch_main_against_fake_tmdb_server(tmp_path, store, catalog, tmdb_server):
+    checkpoint = str(tmp_path / 'checkpoint.jsonl')
+    argv = ['--model-dir', store, '--checkpoint', checkpoint, '--api-key', 'key',
+            '--api-base', tmdb_server.base_url, '--workers', '2', '--rate', '1000']
+    for movie_id in (11, 15, 16):
+        tmdb_server.routes[f'/3/movie/{movie_id}'] = (200, tmdb_movie(f'/{movie_id}.jpg', ['Drama']))
+    # 12 gets a captive-portal page, 14 a malformed genre; 13 is unknown (404)
+    tmdb_server.routes['/3/movie/12'] = (200, '<html>Sign in to the network</html>')
+    tmdb_server.routes['/3/movie/14'] = (200, {**tmdb_movie('/14.jpg', []), 'genres': [{'id': 27}]})
+
+    prefetch_posters.main(argv)
+    assert set(prefetch_posters.load_checkpoint(checkpoint)) == {11, 13, 15, 16}
+
+    # The next run retries only the failures; the 404 is not requested again
+    tmdb_server.routes['/3/movie/12'] = (200, tmdb_movie('/12.jpg', ['Comedy']))
+    tmdb_server.routes['/3/movie/14'] = (200, tmdb_movie('/14.jpg', ['Horror']))
+    tmdb_server.requests.clear()
+    prefetch_posters.main(argv)
+    assert sorted(tmdb_server.requests) == ['/3/movie/12', '/3/movie/14']
+    assert set(prefetch_posters.load_checkpoint(checkpoint)) == {11, 12, 13, 14, 15, 16}
+
+    movies = model_store.load_model(store).movies
+    assert movies['poster_path'].tolist() == ['/11.jpg', '/12.jpg', '', '/14.jpg', '/15.jpg', '/16.jpg']
+    assert movies['genres'].tolist() == ['Drama', 'Comedy', catalog['genres'][2], 'Horror', 'Drama', 'Drama']
+    assert movies['original_language'][2] == catalog['original_language'][2]
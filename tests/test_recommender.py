@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+import model_store
+from build_improved_model import FIELD_WEIGHTS, build_field_model
+from recommender import AnnIndex, SparseSimilarity, field_scale, top_k
+
+
+def ivf_index(exact):
+    """Two IVF lists over 20 random unit vectors, probing only the closest one."""
+    rng = np.random.default_rng(7)
+    embeddings = rng.normal(size=(20, 4)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    centroids = embeddings[[0, 1]]
+    lists = np.argmax(embeddings @ centroids.T, axis=1)
+    list_items = np.argsort(lists, kind='stable').astype(np.int32)
+    list_offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=2))]).astype(np.int64)
+    similarity = SparseSimilarity(sparse.csr_matrix(embeddings)) if exact else None
+    return AnnIndex(embeddings, centroids, list_offsets, list_items, nprobe=1, exact=similarity), lists
+
+
+@pytest.mark.parametrize('exact', [True, False])
+def test_ann_query_with_narrow_mask_searches_all_masked_movies(exact):
+    index, lists = ivf_index(exact)
+    query = 0
+    # One masked movie in the probed list, three in the other one
+    own = [i for i in np.flatnonzero(lists == lists[query]) if i != query][:1]
+    other = np.flatnonzero(lists != lists[query])[:3].tolist()
+    mask = np.zeros(index.n_items, dtype=bool)
+    mask[own + other] = True
+
+    expected, _ = top_k(index.embeddings @ index.embeddings[query], 3, exclude=query, mask=mask)
+    ids, scores = index.query(query, 3, exclude=query, mask=mask)
+    assert ids.tolist() == expected.tolist()
+
+    ids, _ = index.query_batch(np.array([query]), 3, mask=mask)
+    assert ids[0].tolist() == expected.tolist()
+
+    # Fewer masked movies than k: every one of them, no padding ids
+    ids, _ = index.query(query, 10, exclude=query, mask=mask)
+    assert sorted(ids.tolist()) == sorted(own + other)
+
+
+FIELDS = [{'name': 'a', 'start': 0, 'stop': 2, 'weight': 1.0}, {'name': 'b', 'start': 2, 'stop': 3, 'weight': 1.0}]
+
+
+@pytest.mark.parametrize('weight', [float('nan'), float('inf'), -float('inf'), 1e308])
+def test_field_scale_rejects_non_finite_weights(weight):
+    norms = np.full((3, 2), 0.5, dtype=np.float32)
+    with pytest.raises(ValueError):
+        field_scale(FIELDS, {'a': weight, 'b': 1e308}, norms)
+
+
+@pytest.mark.parametrize('weights', [
+    {'crew': 3.0, 'genres': 0.5},
+    {'overview': 0.0, 'cast': 2.0},  # a dropped field
+    {'keywords': 0.0, 'crew': 0.0},  # fields some movies lack, so their rows renormalize
+])
+def test_field_reweighting_equals_a_rebuild(field_store, field_catalog, weights):
+    rebuilt, _ = build_field_model(field_catalog, {**FIELD_WEIGHTS, **weights})
+    expected = (rebuilt @ rebuilt.T).toarray()
+    similarity = model_store.load_model(field_store).sparse_similarity(weights)
+    assert similarity.column_scale is not None
+
+    n = len(field_catalog)
+    np.testing.assert_allclose(similarity.rows(np.arange(n)), expected, atol=1e-5)
+    np.testing.assert_allclose(similarity.pairwise([0, 5, 9]), expected[np.ix_([0, 5, 9], [0, 5, 9])], atol=1e-5)
+    ids, scores = similarity.query(3, 10, exclude=3)
+    np.testing.assert_allclose(scores, np.sort(np.delete(expected[3], 3))[::-1][:10], atol=1e-5)
@@ -0,0 +1,37 @@
+import sqlite3
+
+import pytest
+
+from metadata_cache import MemoryCache
+from tmdb_client import TMDBClient, TMDBError
+
+
+def client_for(server, **kwargs):
+    return TMDBClient('key', base_url=server.base_url, max_retries=1, backoff=0, rate=1000, burst=1000, **kwargs)
+
+
+def test_get_movie(tmdb_server):
+    tmdb_server.routes['/3/movie/11'] = (200, {'id': 11, 'title': 'Heat'})
+    client = client_for(tmdb_server)
+    assert client.get_movie(11) == {'id': 11, 'title': 'Heat'}
+    assert client.get_movie(12) is None  # 404
+
+
+def test_invalid_json_raises_tmdb_error(tmdb_server):
+    tmdb_server.routes['/3/movie/11'] = (200, '<html>Please log in to the network</html>')
+    with pytest.raises(TMDBError, match='invalid JSON'):
+        client_for(tmdb_server).get_movie(11)
+
+
+class BrokenCache(MemoryCache):
+    def get(self, key):
+        raise sqlite3.OperationalError('database is locked')
+
+    def set(self, key, value):
+        raise sqlite3.OperationalError('database is locked')
+
+
+def test_cache_failures_do_not_fail_the_lookup(tmdb_server):
+    tmdb_server.routes['/3/movie/11'] = (200, {'id': 11, 'title': 'Heat'})
+    client = client_for(tmdb_server, cache=BrokenCache())
+    assert client.get_movie(11) == {'id': 11, 'title': 'Heat'}
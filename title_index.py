@@ -0,0 +1,180 @@
+"""
+Title Index - exact and typo-tolerant title lookup
+
+Resolving a title used to be a boolean scan over the whole title column on
+every request, and the UI shipped the full catalog to the browser so it
+could be searched client-side. The index is built once per process and
+answers both questions without touching the DataFrame:
+
+1. Exact lookup: a dict keyed by normalized title (case, accents and
+   punctuation folded) -> row indices. Duplicate titles are disambiguated
+   by release year or movie id, and `label` renders them as
+   "Title (2009)" so they can be told apart in a list.
+2. Search: a sorted array of normalized titles for prefix matches (binary
+   search) plus a trigram inverted index for substring and typo-tolerant
+   matches. Trigram overlaps of all titles are counted in one vectorized
+   `np.bincount` over the posting lists of the query's trigrams.
+
+Usage:
+    index = TitleIndex(movies_df['title'], movies_df['movie_id'], years)
+    index.lookup('The Dark Knight')          # -> row index or None
+    index.search('dark nite', limit=10)      # -> best matching row indices
+"""
+
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+
+from recommender import top_k
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+_LABEL_SUFFIX = re.compile(r'^(.*?)\s*\((\d{4}|#\d+)\)$')
+
+# Trigram matches scoring below this Jaccard similarity are dropped
+MIN_TRIGRAM_SCORE = 0.2
+
+
+def normalize_title(title):
+    """Fold case, accents and punctuation: 'Amélie!' -> 'amelie'."""
+    title = str(title)
+    if not title.isascii():
+        title = unicodedata.normalize('NFKD', title)
+        title = ''.join(ch for ch in title if not unicodedata.combining(ch))
+    return _NON_WORD.sub(' ', title.casefold()).strip()
+
+
+def trigrams(normalized):
+    """Character trigrams of each word of a normalized title, padded so short words count."""
+    grams = set()
+    for word in normalized.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def release_years(movies_df):
+    """Release year per movie from a `release_date` column, or None if there is none."""
+    if 'release_date' not in movies_df:
+        return None
+    return [int(date[:4]) if str(date)[:4].isdigit() else None for date in movies_df['release_date']]
+
+
+class TitleIndex:
+    """
+    Exact and fuzzy title lookup over a movie catalog.
+
+    Parameters:
+    -----------
+    titles : sequence of str
+        Titles in catalog (row) order.
+    movie_ids : sequence of int
+        Movie ids in the same order, used to disambiguate duplicate titles.
+    years : sequence of int or None, optional
+        Release years in the same order.
+    """
+
+    def __init__(self, titles, movie_ids, years=None):
+        self.titles = [str(title) for title in titles]
+        self.movie_ids = [int(movie_id) for movie_id in movie_ids]
+        self.years = list(years) if years is not None else [None] * len(self.titles)
+        normalized = [normalize_title(title) for title in self.titles]
+
+        self.exact = {}
+        for idx, key in enumerate(normalized):
+            self.exact.setdefault(key, []).append(idx)
+
+        order = sorted(range(len(normalized)), key=normalized.__getitem__)
+        self._sorted_keys = [normalized[idx] for idx in order]
+        self._sorted_rows = np.array(order, dtype=np.int64)
+
+        # Trigram postings in CSR layout: rows of trigram g are
+        # _posting_rows[_posting_offsets[g]:_posting_offsets[g + 1]]
+        grams = [trigrams(key) for key in normalized]
+        self._trigram_counts = np.array([len(g) for g in grams], dtype=np.float32)
+        self._gram_ids = {}
+        gram_ids = np.fromiter(
+            (self._gram_ids.setdefault(gram, len(self._gram_ids)) for g in grams for gram in g),
+            dtype=np.int64, count=int(self._trigram_counts.sum()),
+        )
+        owners = np.repeat(np.arange(len(grams), dtype=np.int32), self._trigram_counts.astype(np.int64))
+        self._posting_rows = owners[np.argsort(gram_ids, kind='stable')]
+        self._posting_offsets = np.zeros(len(self._gram_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(gram_ids, minlength=len(self._gram_ids)), out=self._posting_offsets[1:])
+
+    def __len__(self):
+        return len(self.titles)
+
+    def is_duplicate(self, idx):
+        return len(self.exact[normalize_title(self.titles[idx])]) > 1
+
+    def label(self, idx):
+        """Display title; duplicates get their year (or movie id) appended."""
+        title = self.titles[idx]
+        if not self.is_duplicate(idx):
+            return title
+        year = self.years[idx]
+        return f'{title} ({year})' if year else f'{title} (#{self.movie_ids[idx]})'
+
+    def candidates(self, title):
+        """Row indices of every movie with this (normalized) title."""
+        return self.exact.get(normalize_title(title), [])
+
+    def lookup(self, title, year=None, movie_id=None):
+        """
+        Row index of a title, or None if it is unknown.
+
+        Duplicate titles are narrowed down by `year` or `movie_id`; a label
+        such as "Title (2009)" or "Title (#123)" from `label` also resolves.
+        Without either, the first movie in catalog order wins.
+        """
+        rows = self.candidates(title)
+        if not rows:
+            match = _LABEL_SUFFIX.match(str(title))
+            if match is None:
+                return None
+            suffix = match.group(2)
+            if suffix.startswith('#'):
+                movie_id = int(suffix[1:])
+            else:
+                year = int(suffix)
+            rows = self.candidates(match.group(1))
+        if movie_id is not None:
+            rows = [idx for idx in rows if self.movie_ids[idx] == int(movie_id)]
+        if year is not None:
+            rows = [idx for idx in rows if self.years[idx] == int(year)]
+        return rows[0] if rows else None
+
+    def prefix(self, query, limit=10):
+        """Row indices of titles starting with `query`, shortest first."""
+        query = normalize_title(query)
+        if not query:
+            return []
+        start = bisect_left(self._sorted_keys, query)
+        stop = bisect_left(self._sorted_keys, query + '\uffff', lo=start)
+        rows = self._sorted_rows[start:stop]
+        if len(rows) > limit:
+            lengths = np.array([len(key) for key in self._sorted_keys[start:stop]])
+            rows = rows[np.argsort(lengths, kind='stable')[:limit]]
+        return rows.tolist()
+
+    def fuzzy(self, query, limit=10, min_score=MIN_TRIGRAM_SCORE):
+        """Row indices of the titles with the most trigrams in common (Jaccard)."""
+        grams = trigrams(normalize_title(query))
+        ids = [self._gram_ids[gram] for gram in grams if gram in self._gram_ids]
+        postings = [self._posting_rows[self._posting_offsets[i]:self._posting_offsets[i + 1]] for i in ids]
+        if not postings:
+            return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.titles)).astype(np.float32)
+        scores = shared / (len(grams) + self._trigram_counts - shared)
+        rows, row_scores = top_k(scores, limit)
+        return rows[row_scores >= min_score].tolist()
+
+    def search(self, query, limit=10):
+        """Prefix matches first, then the best fuzzy matches, without repeats."""
+        rows = self.prefix(query, limit)
+        if len(rows) < limit:
+            seen = set(rows)
+            rows += [idx for idx in self.fuzzy(query, limit) if idx not in seen][:limit - len(rows)]
+        return rows
@@ -0,0 +1,218 @@
+"""
+TMDB API Client
+
+A small shared client for all calls to the TMDB API:
+
+1. One pooled `requests.Session` - connections to api.themoviedb.org are
+   kept alive and reused instead of paying a TCP + TLS handshake per movie
+2. Bounded retries with exponential backoff and full jitter on 429 and 5xx
+   responses (honouring `Retry-After`), and on connection errors/timeouts
+3. A client-side token-bucket rate limiter, so bursts stay under the TMDB
+   request quota instead of turning into 429s
+4. In-flight request coalescing: concurrent callers asking for the same
+   movie share a single outbound request
+5. An optional persistent metadata cache (see metadata_cache.py) consulted
+   before any request is made
+
+Request latency, retries, errors and timeouts are recorded in `metrics`.
+
+The client is thread-safe and meant to be shared by every session of the app.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+TMDB_API_BASE = 'https://api.themoviedb.org/3'
+POSTER_BASE_URL = 'https://image.tmdb.org/t/p/w500'
+
+# Responses worth retrying: rate limited or a transient server-side failure
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TMDBError(Exception):
+    """Raised when a TMDB request fails after all retries."""
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket.
+
+    Allows bursts of up to `burst` requests and refills at `rate` requests
+    per second; `acquire` blocks until a token is available.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class TMDBClient:
+    """
+    Pooled, retrying, rate-limited TMDB client.
+
+    Parameters:
+    -----------
+    api_key : str
+        TMDB v3 API key.
+    base_url : str
+        API root; override to point at a local fake TMDB server.
+    timeout : float
+        Per-attempt request timeout in seconds.
+    max_retries : int
+        Retries after the first attempt for 429/5xx and network errors.
+    backoff : float
+        Base delay in seconds; attempt n waits up to backoff * 2**n (full jitter).
+    rate, burst : float
+        Client-side rate limit (requests per second and bucket size).
+    pool_size : int
+        Maximum number of kept-alive connections.
+    cache : metadata_cache.CacheBackend, optional
+        Persistent cache for movie payloads.
+    """
+
+    def __init__(self, api_key, base_url=TMDB_API_BASE, timeout=10, max_retries=3,
+                 backoff=0.5, max_backoff=8.0, rate=20.0, burst=40, pool_size=16, cache=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.limiter = RateLimiter(rate, burst)
+        self.cache = cache
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _retry_delay(self, attempt, response=None):
+        """Delay before the next attempt: Retry-After if given, else jittered backoff."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.max_backoff)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get(self, path, **params):
+        """
+        GET an API path and return the decoded JSON.
+
+        Returns None for 404 (the movie does not exist on TMDB); raises
+        TMDBError once the retries are exhausted.
+        """
+        url = f'{self.base_url}/{path.lstrip("/")}'
+        params = {'api_key': self.api_key, **params}
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                with metrics.span('tmdb_request'):
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                kind = 'timeout' if isinstance(e, requests.Timeout) else 'connection'
+                metrics.inc('tmdb_errors_total', kind=kind)
+                if attempt == self.max_retries:
+                    raise TMDBError(f"GET {path} failed: {e}") from e
+                metrics.inc('tmdb_retries_total')
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            metrics.inc('tmdb_responses_total', status=response.status_code)
+            if response.status_code == 404:
+                return None
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                metrics.inc('tmdb_retries_total')
+                time.sleep(self._retry_delay(attempt, response))
+                continue
+            if response.status_code >= 400:
+                metrics.inc('tmdb_errors_total', kind='http')
+                raise TMDBError(f"GET {path} failed with HTTP {response.status_code}")
+            try:
+                return response.json()
+            except ValueError as e:  # e.g. an HTML page from a proxy or captive portal
+                metrics.inc('tmdb_errors_total', kind='invalid_json')
+                raise TMDBError(f"GET {path} returned invalid JSON") from e
+
+    def get_movie(self, movie_id, language='en-US'):
+        """
+        Movie details from `/movie/{id}` (None if TMDB does not know the movie).
+
+        Served from the persistent cache when possible. Concurrent misses for
+        the same movie are coalesced: the first caller performs the request
+        and the others wait for its result (or error). A failing cache (e.g.
+        a locked SQLite file) is counted in `tmdb_cache_errors_total` and
+        otherwise ignored.
+        """
+        key = (int(movie_id), language)
+        cache_key = f'movie:{key[0]}:{language}'
+        if self.cache is not None:
+            try:
+                cached = self.cache.get(cache_key)
+            except Exception:
+                metrics.inc('tmdb_cache_errors_total', op='get')
+                cached = None
+            if cached is not None:
+                # An empty payload records that TMDB does not know the movie
+                return cached or None
+        
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            movie = self.get(f'movie/{key[0]}', language=language)
+            if self.cache is not None:
+                try:
+                    self.cache.set(cache_key, movie or {})
+                except Exception:
+                    metrics.inc('tmdb_cache_errors_total', op='set')
+            future.set_result(movie)
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        return future.result()
+
+    def close(self):
+        self.session.close()
+
+
+def poster_url(movie):
+    """Full poster URL for a TMDB movie payload, or None."""
+    if movie and movie.get('poster_path'):
+        return f"{POSTER_BASE_URL}{movie['poster_path']}"
+    return None